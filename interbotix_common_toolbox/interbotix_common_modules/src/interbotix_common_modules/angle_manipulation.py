@@ -44,6 +44,26 @@ def rotationMatrixToEulerAngles(R):
     """
     return list(euler_from_matrix(R, axes="sxyz"))
 
+def rotationMatrixToQuaternion(R):
+    """Calculates the quaternion equivalent to a rotation matrix without going through euler angles
+
+    :param R: 3x3 rotation matrix
+    :return: list of the quaternion's [x, y, z, w] components
+    """
+    trace = R[0][0] + R[1][1] + R[2][2]
+    if trace > 0:
+        s = 2.0 * math.sqrt(trace + 1.0)
+        return [(R[2][1] - R[1][2]) / s, (R[0][2] - R[2][0]) / s, (R[1][0] - R[0][1]) / s, 0.25 * s]
+    elif R[0][0] > R[1][1] and R[0][0] > R[2][2]:
+        s = 2.0 * math.sqrt(1.0 + R[0][0] - R[1][1] - R[2][2])
+        return [0.25 * s, (R[0][1] + R[1][0]) / s, (R[0][2] + R[2][0]) / s, (R[2][1] - R[1][2]) / s]
+    elif R[1][1] > R[2][2]:
+        s = 2.0 * math.sqrt(1.0 + R[1][1] - R[0][0] - R[2][2])
+        return [(R[0][1] + R[1][0]) / s, 0.25 * s, (R[1][2] + R[2][1]) / s, (R[0][2] - R[2][0]) / s]
+    else:
+        s = 2.0 * math.sqrt(1.0 + R[2][2] - R[0][0] - R[1][1])
+        return [(R[0][2] + R[2][0]) / s, (R[1][2] + R[2][1]) / s, 0.25 * s, (R[1][0] - R[0][1]) / s]
+
 def quaternion_is_valid(quat, tol=10e-3):
     """Tests if a quaternion is valid
     
@@ -0,0 +1,118 @@
+"""
+A process-wide TF buffer that returns transforms as 4x4 matrices and caches the ones made up only of static transforms
+"""
+
+import threading
+import numpy as np
+import rospy
+import tf2_ros
+from tf2_msgs.msg import TFMessage
+from tf.transformations import quaternion_matrix
+
+_shared_buffer = None
+_shared_buffer_lock = threading.Lock()
+
+def getSharedBuffer():
+    """Gets the TF buffer shared by every module in this process, creating it on the first call
+
+    :return: the shared TransformCache
+    """
+    global _shared_buffer
+    with _shared_buffer_lock:
+        if _shared_buffer is None:
+            _shared_buffer = TransformCache()
+        return _shared_buffer
+
+def transformToMatrix(transform):
+    """Converts a Transform message into a homogeneous transformation matrix
+
+    :param transform: geometry_msgs/Transform message
+    :return: 4x4 numpy transformation matrix
+    """
+    q = transform.rotation
+    T = quaternion_matrix([q.x, q.y, q.z, q.w])
+    T[:3, 3] = [transform.translation.x, transform.translation.y, transform.translation.z]
+    return T
+
+class TransformCache(object):
+    """A TF buffer and listener that live as long as the process, so lookups don't wait for a new buffer to fill
+
+    Lookups of the latest transform between two frames connected only by static transforms are cached;
+    the cache is cleared whenever a new message arrives on '/tf_static'. Use 'getSharedBuffer' instead
+    of creating instances directly.
+    """
+
+    def __init__(self):
+        self.buffer = tf2_ros.Buffer()
+        self.listener = tf2_ros.TransformListener(self.buffer)
+        self.mutex = threading.Lock()
+        self.static_parents = {}                                                # Maps each child frame published on '/tf_static' to its parent frame
+        self.static_cache = {}                                                  # Maps (target_frame, source_frame) to a cached 4x4 matrix
+        self.static_version = 0                                                 # Incremented every time the cache is cleared
+        self.sub_tf_static = rospy.Subscriber("/tf_static", TFMessage, self.tf_static_cb)
+
+    def tf_static_cb(self, msg):
+        """ROS Subscriber Callback function to keep track of the static transforms and invalidate the cache
+
+        :param msg: TFMessage published on '/tf_static'
+        """
+        with self.mutex:
+            for trans in msg.transforms:
+                self.static_parents[trans.child_frame_id.lstrip("/")] = trans.header.frame_id.lstrip("/")
+            self.static_cache.clear()
+            self.static_version += 1
+
+    def get_static_ancestors(self, frame):
+        """Gets the frames reachable from a frame by only following static transforms towards the root
+
+        Must be called with 'self.mutex' held.
+
+        :param frame: frame to start from
+        :return: list of frames starting with 'frame' itself
+        """
+        ancestors = [frame]
+        while ancestors[-1] in self.static_parents and len(ancestors) <= len(self.static_parents):
+            ancestors.append(self.static_parents[ancestors[-1]])
+        return ancestors
+
+    def is_static(self, target_frame, source_frame):
+        """Checks whether two frames are connected only by static transforms
+
+        Must be called with 'self.mutex' held.
+
+        :param target_frame: the frame to which data should be transformed
+        :param source_frame: the frame where the data originated
+        :return: `True` if both frames reach a common frame through static transforms alone
+        """
+        target_ancestors = set(self.get_static_ancestors(target_frame))
+        return any(frame in target_ancestors for frame in self.get_static_ancestors(source_frame))
+
+    def lookup_transform(self, target_frame, source_frame, stamp=None, timeout=4.0):
+        """Looks up a transform and converts it into a 4x4 transformation matrix
+
+        :param target_frame: the frame to which data should be transformed
+        :param source_frame: the frame where the data originated
+        :param stamp: rospy.Time at which to get the transform; `None` for the latest one (which may be cached)
+        :param timeout: max time [sec] to wait for the transform to become available
+        :return: T_TargetSource - 4x4 numpy transformation matrix; `None` if the lookup failed
+        """
+        target_frame, source_frame = target_frame.lstrip("/"), source_frame.lstrip("/")
+        if target_frame == source_frame:
+            return np.identity(4)
+        key = (target_frame, source_frame)
+        if stamp is None:
+            with self.mutex:
+                if key in self.static_cache:
+                    return self.static_cache[key].copy()
+                version = self.static_version
+        try:
+            trans = self.buffer.lookup_transform(target_frame, source_frame, rospy.Time(0) if stamp is None else stamp, rospy.Duration(timeout))
+        except (tf2_ros.LookupException, tf2_ros.ConnectivityException, tf2_ros.ExtrapolationException):
+            return None
+        T_TargetSource = transformToMatrix(trans.transform)
+        if stamp is None:
+            with self.mutex:
+                # don't cache a result that may predate a change to the static transforms
+                if self.static_version == version and self.is_static(target_frame, source_frame):
+                    self.static_cache[key] = T_TargetSource.copy()
+        return T_TargetSource
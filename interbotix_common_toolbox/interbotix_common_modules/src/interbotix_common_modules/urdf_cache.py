@@ -0,0 +1,89 @@
+"""
+A small library to extract joint parameters from a robot description and cache them on disk
+"""
+
+import os
+import json
+import time
+import hashlib
+import rospy
+import xml.etree.ElementTree as ET
+
+def getCacheDirectory():
+    """Gets the directory in which extracted URDF parameters are cached
+
+    :return: '$ROS_HOME/interbotix_urdf_cache' (defaults to '~/.ros/interbotix_urdf_cache')
+    """
+    ros_home = os.environ.get("ROS_HOME", os.path.join(os.path.expanduser("~"), ".ros"))
+    return os.path.join(ros_home, "interbotix_urdf_cache")
+
+def getRobotDescription(robot_name, poll_period=0.05):
+    """Waits for a robot description to be loaded on the parameter server and returns it
+
+    :param robot_name: namespace of the 'robot_description' parameter
+    :param poll_period: time [sec] to wait between checks for the parameter
+    :return: the robot description as an XML string; None if ROS shut down before it was loaded
+    """
+    full_rd_name = "/" + robot_name + "/robot_description"
+    while not rospy.has_param(full_rd_name):
+        if rospy.is_shutdown(): return None
+        time.sleep(poll_period)
+    return rospy.get_param(full_rd_name)
+
+def getJointTable(robot_description):
+    """Parses the joints in a robot description into a dictionary indexed by joint name
+
+    :param robot_description: the robot description as an XML string
+    :return: dictionary mapping each joint name to its 'type', origin 'xyz' and 'rpy' lists, and
+        'lower' and 'upper' limits (None if the joint has no limits)
+    """
+    joint_table = {}
+    for joint in ET.fromstring(robot_description).findall("joint"):
+        origin = joint.find("origin")
+        limit = joint.find("limit")
+        entry = {"type" : joint.get("type"), "xyz" : [0.0, 0.0, 0.0], "rpy" : [0.0, 0.0, 0.0], "lower" : None, "upper" : None}
+        if origin is not None:
+            entry["xyz"] = [float(v) for v in origin.get("xyz", "0 0 0").split()]
+            entry["rpy"] = [float(v) for v in origin.get("rpy", "0 0 0").split()]
+        if limit is not None:
+            entry["lower"] = float(limit.get("lower", 0))
+            entry["upper"] = float(limit.get("upper", 0))
+        joint_table[joint.get("name")] = entry
+    return joint_table
+
+def loadURDFParameters(robot_name, key, extractor):
+    """Gets parameters derived from a robot description, reusing the ones cached by a previous run if the description didn't change
+
+    :param robot_name: namespace of the 'robot_description' parameter
+    :param key: name under which the extracted parameters are cached (ex. 'hexapod_kinematics')
+    :param extractor: function that takes the joint table returned by 'getJointTable' and returns the
+        desired parameters; the result must be JSON serializable
+    :return: the extracted parameters; None if ROS shut down before the robot description was loaded
+    """
+    robot_description = getRobotDescription(robot_name)
+    if robot_description is None: return None
+    if not isinstance(robot_description, bytes):
+        robot_description = robot_description.encode("utf-8")
+    cache_file = os.path.join(getCacheDirectory(), hashlib.sha1(robot_description).hexdigest() + ".json")
+
+    cache = {}
+    try:
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+    except (IOError, OSError, ValueError):
+        pass
+    if key in cache:
+        return cache[key]
+
+    params = extractor(getJointTable(robot_description))
+    cache[key] = params
+    try:
+        if not os.path.isdir(getCacheDirectory()):
+            os.makedirs(getCacheDirectory())
+        tmp_file = "%s.%d.tmp" % (cache_file, os.getpid())
+        with open(tmp_file, "w") as f:
+            json.dump(cache, f)
+        os.rename(tmp_file, cache_file)
+    except (IOError, OSError):
+        rospy.logwarn("Could not write the URDF parameter cache to '%s'." % cache_file)
+    return params
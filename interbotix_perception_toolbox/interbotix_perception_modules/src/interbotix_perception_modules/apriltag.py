@@ -1,7 +1,11 @@
+import genpy
 import rospy
+import threading
+import collections
 from sensor_msgs.msg import CameraInfo
 from geometry_msgs.msg import TransformStamped, Pose
-from interbotix_perception_modules.srv import SnapPicture
+from interbotix_perception_modules.srv import SnapPicture, PublishPicture
+from apriltag_ros.msg import AprilTagDetectionArray
 from apriltag_ros.srv import AnalyzeSingleImage, AnalyzeSingleImageRequest
 
 class InterbotixAprilTagInterface(object):
@@ -13,15 +17,24 @@ class InterbotixAprilTagInterface(object):
         `False` if a node was already initalized somwhere else
     :param full_img_get_path: absolute path to image file load location
     :param full_img_save_path: absolute path to image file save location
+    :param in_memory: whether to pass pictures to the AprilTag continuous detector in
+        memory instead of through image files; falls back to image files if the
+        picture_snapper node wasn't started with its 'in_memory_detection' parameter
+        set (and so doesn't advertise the 'publish_picture' service)
+    :param detection_timeout: max time [sec] to wait for the detections of a picture
+        passed in memory
     """
     valid_tags = [5, 413, 820, 875, 1050]
     v = False
     def __init__(self, apriltag_ns="apriltag", init_node=False, 
                 full_img_get_path="/tmp/get_image.png",
                 full_img_save_path="/tmp/save_image.png",
-                verbose=False):
+                verbose=False, in_memory=True, detection_timeout=2.0):
         
         self.v = verbose
+        self.detection_timeout = detection_timeout
+        self.detections = collections.deque(maxlen=10)                          # Latest AprilTagDetectionArray messages from the continuous detector
+        self.detections_cv = threading.Condition()
 
         # start apriltag interface node
         if (init_node):
@@ -42,6 +55,18 @@ class InterbotixAprilTagInterface(object):
         self.request.full_path_where_to_save_image = full_img_save_path
         self.srv_analyze_image = rospy.ServiceProxy("/" + apriltag_ns + "/single_image_tag_detection", AnalyzeSingleImage)
         self.pub_transforms = rospy.Publisher("/static_transforms", TransformStamped, queue_size=50)
+        self.srv_publish_picture = None
+        # the picture_snapper node advertises 'publish_picture' before 'snap_picture', so
+        # there's no need to wait long for it if its 'in_memory_detection' parameter is set
+        if in_memory and not rospy.get_param("/" + apriltag_ns + "/picture_snapper/in_memory_detection", default=False):
+            rospy.loginfo("In-memory detection isn't enabled in the picture_snapper node; tags will be detected through image files instead.")
+        elif in_memory:
+            try:
+                rospy.wait_for_service("/" + apriltag_ns + "/publish_picture", timeout=1.0)
+                self.sub_detections = rospy.Subscriber("/" + apriltag_ns + "/tag_detections", AprilTagDetectionArray, self.tag_detections_cb)
+                self.srv_publish_picture = rospy.ServiceProxy("/" + apriltag_ns + "/publish_picture", PublishPicture)
+            except rospy.ROSException:
+                rospy.logwarn("The 'publish_picture' service isn't available; tags will be detected through image files instead.")
         
         rospy.sleep(0.5)
         
@@ -60,6 +85,15 @@ class InterbotixAprilTagInterface(object):
         self.request.camera_info = msg
         self.sub_camera_info.unregister()
 
+    def tag_detections_cb(self, msg):
+        """ROS Subscriber Callback to get the tag detections of pictures passed in memory
+
+        :param msg: AprilTagDetectionArray message stamped with the time of its picture
+        """
+        with self.detections_cv:
+            self.detections.append(msg)
+            self.detections_cv.notify_all()
+
     def find_pose(self, ar_tag_name="ar_tag", publish_tf=False):
         """Calculates the AprilTag pose w.r.t. the camera color image frame
 
@@ -106,8 +140,72 @@ class InterbotixAprilTagInterface(object):
         :return: list of tag detections
         :rtype: apriltag_ros/AprilTagDetectionArray
         """
-        self.srv_snap_picture(self.request.full_path_where_to_get_image)
-        return self.srv_analyze_image(self.request).tag_detections
+        return self.detect_tags(self.snap_image())
+
+    def snap_image(self, filepath=None):
+        """Grabs the latest camera image without waiting for tag detection
+
+        :param filepath: absolute path to which the image should be saved; `None` to
+            pass the image to the continuous detector in memory instead (if available,
+            falling back to `full_img_get_path` otherwise)
+        :return: absolute path of the saved image or, if passed in memory, the rospy.Time
+            stamp of the image; `None` if the image could not be grabbed
+        :details: splitting the snap from the detection lets a caller (like
+            `InterbotixTurretXSInterface.scan`) move the camera to its next pose
+            while tags are being detected in the previous image
+        """
+        if filepath is None and self.srv_publish_picture is not None:
+            res = self.srv_publish_picture()
+            if res.success:
+                return res.stamp
+            if self.v:
+                rospy.logwarn("Could not pass the image in memory. Saving it to a file instead.")
+        if filepath is None:
+            filepath = self.request.full_path_where_to_get_image
+        res = self.srv_snap_picture(filepath)
+        if not res.success:
+            return None
+        return res.filepath
+
+    def detect_tags(self, snapshot):
+        """Gets the tag detections of a previously grabbed image
+
+        :param snapshot: value returned by `snap_image` (either the absolute path to
+            the image or the stamp of an image passed in memory)
+        :return: list of tag detections (empty if the image could not be grabbed or
+            its detections didn't arrive in time)
+        :rtype: apriltag_ros/AprilTagDetectionArray
+        """
+        if snapshot is None:
+            return AprilTagDetectionArray()
+        # stamps deserialized from a service response are genpy.Time (the parent class of rospy.Time)
+        if isinstance(snapshot, genpy.Time):
+            return self.wait_for_detections(snapshot)
+        request = AnalyzeSingleImageRequest()
+        request.camera_info = self.request.camera_info
+        request.full_path_where_to_get_image = snapshot
+        request.full_path_where_to_save_image = self.request.full_path_where_to_save_image
+        return self.srv_analyze_image(request).tag_detections
+
+    def wait_for_detections(self, stamp):
+        """Waits for the continuous detector to publish the detections of an image passed in memory
+
+        :param stamp: rospy.Time stamp of the image (as returned by `snap_image`)
+        :return: list of tag detections (empty if they didn't arrive within `detection_timeout`)
+        :rtype: apriltag_ros/AprilTagDetectionArray
+        """
+        time_end = rospy.get_time() + self.detection_timeout
+        with self.detections_cv:
+            while not rospy.is_shutdown():
+                for msg in self.detections:
+                    if msg.header.stamp == stamp:
+                        return msg
+                remaining = time_end - rospy.get_time()
+                if remaining <= 0:
+                    break
+                self.detections_cv.wait(min(remaining, 0.1))
+        rospy.logwarn("Timed out waiting for the tag detections of the image stamped %.3f." % stamp.to_sec())
+        return AprilTagDetectionArray()
 
     def set_valid_tags(self, ids):
         """Setter for list of valid tags
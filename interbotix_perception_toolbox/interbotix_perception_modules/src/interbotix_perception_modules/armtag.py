@@ -1,10 +1,10 @@
 import rospy
 import numpy as np
-import tf2_ros
 from geometry_msgs.msg import TransformStamped, Quaternion, Point, Pose
 from tf.transformations import euler_from_quaternion, quaternion_from_euler
 from interbotix_perception_modules.apriltag import InterbotixAprilTagInterface
 from interbotix_common_modules import angle_manipulation as ang
+from interbotix_common_modules import tf_cache
 
 ### @brief A module to find an arm's base link frame relative to some reference frame (using the help of the AprilTag on the arm)
 ### @param armtag_ns - namespace where the ROS parameters needed by the module are located
@@ -23,6 +23,7 @@ class InterbotixArmTagInterface(object):
         self.trans.transform.rotation.w = 1.0
         self.rpy = [0,0,0]
         self.apriltag = InterbotixAprilTagInterface(apriltag_ns, False, verbose=True)
+        self.tf_buffer = tf_cache.getSharedBuffer()
         print("Initialized InterbotixArmTagInterface!\n")
 
     ### @brief Snaps an image of the AprilTag, then computes the transform of the robot's base_link frame w.r.t. the desired reference frame
@@ -57,24 +58,21 @@ class InterbotixArmTagInterface(object):
             rpy[2] += rpy_sample[2] / float(num_samples)
         T_CamTag = ang.poseToTransformationMatrix([point.x, point.y, point.z, rpy[0], rpy[1], rpy[2]])
 
-        tfBuffer = tf2_ros.Buffer()
-        listener = tf2_ros.TransformListener(tfBuffer)
-
         # If position_only, set the orientation of the found AR tag to be equivalent to the orientation of the arm's AR tag as dictated by the URDF
         if (position_only):
-            T_CamActualTag = self.get_transform(tfBuffer, self.apriltag.image_frame_id, self.arm_tag_frame)
+            T_CamActualTag = self.get_transform(self.apriltag.image_frame_id, self.arm_tag_frame)
             T_CamTag[:3,:3] = T_CamActualTag[:3,:3]
 
         # Now, get a snapshot of the pose of arm's base_link frame w.r.t. the AR tag link (as defined in the URDF - not the one found by the algorithm)
         # We can't publish the AR tag pose found using the AprilTag algorithm to the /tf tree since ROS forbids a link to have multiple parents
-        T_TagBase = self.get_transform(tfBuffer, self.arm_tag_frame, arm_base_frame)
+        T_TagBase = self.get_transform(self.arm_tag_frame, arm_base_frame)
 
         # Now, lets find the transform of the arm's base_link frame w.r.t. the reference frame
         T_CamBase = np.dot(T_CamTag, T_TagBase)
         if ref_frame == self.apriltag.image_frame_id:
             T_RefBase = T_CamBase
         else:
-            T_RefCam = self.get_transform(tfBuffer, ref_frame, self.apriltag.image_frame_id)
+            T_RefCam = self.get_transform(ref_frame, self.apriltag.image_frame_id)
             T_RefBase = np.dot(T_RefCam, T_CamBase)
 
         # Now, we can publish the transform from the reference link to the arm's base_link legally as the arm's base_link has no parent
@@ -93,24 +91,15 @@ class InterbotixArmTagInterface(object):
 
         return True
 
-    ### @brief Helper function to lookup a transform and convert it into a 4x4 transformation matrix
-    ### @param tfBuffer - tf2_ros buffer instance from which to lookup transforms from the 'tf' tree
+    ### @brief Helper function to lookup a transform (from the process-wide TF buffer) as a 4x4 transformation matrix
     ### @param target_frame - the frame to which data should be transformed
     ### @param source_frame - the frame where the data originated
     ### @return T_TargetSource - desired 4x4 numpy transformation matrix
-    def get_transform(self, tfBuffer, target_frame, source_frame):
-        try:
-            trans = tfBuffer.lookup_transform(target_frame, source_frame, rospy.Time(0), rospy.Duration(4.0))
-        except (tf2_ros.LookupException, tf2_ros.ConnectivityException, tf2_ros.ExtrapolationException):
+    def get_transform(self, target_frame, source_frame):
+        T_TargetSource = self.tf_buffer.lookup_transform(target_frame, source_frame)
+        if T_TargetSource is None:
             rospy.logerr("Failed to look up the transform from '%s' to '%s'." % (target_frame, source_frame))
             return np.identity(4)
-        x = trans.transform.translation.x
-        y = trans.transform.translation.y
-        z = trans.transform.translation.z
-        quat = trans.transform.rotation
-        quat_list = [quat.x, quat.y, quat.z, quat.w]
-        rpy = euler_from_quaternion(quat_list)
-        T_TargetSource = ang.poseToTransformationMatrix([x, y, z, rpy[0], rpy[1], rpy[2]])
         return T_TargetSource
 
     ### @brief Get the 'x' component of T_RefBase
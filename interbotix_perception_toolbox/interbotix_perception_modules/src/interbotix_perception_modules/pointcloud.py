@@ -1,13 +1,158 @@
 import yaml
 import rospy
 import tf2_ros
+import time
+import threading
+import contextlib
+import collections
 import numpy as np
 from std_srvs.srv import SetBool
-from tf.transformations import euler_from_quaternion
+from tf.transformations import quaternion_from_euler
 from geometry_msgs.msg import TransformStamped, Quaternion
 from interbotix_perception_modules.srv import *
-from interbotix_perception_modules.msg import ClusterInfo
-from interbotix_common_modules import angle_manipulation as ang
+from interbotix_perception_modules.msg import ClusterInfoList
+from interbotix_common_modules import tf_cache
+
+# Fields of the structured array returned by 'get_cluster_positions' when 'as_array' is True; they match the
+# keys of the dictionaries it returns otherwise
+CLUSTER_DTYPE = np.dtype([
+    ("name", "U32"),
+    ("position", "f8", (3,)),
+    ("yaw", "f8"),
+    ("color", "f8", (3,)),
+    ("num_points", "f8"),
+])
+
+### @brief Packs the numeric fields of ClusterInfo messages into an array
+### @param clusters - list of ClusterInfo messages
+### @return <array> - Nx16 array with rows of [x, y, z, r, g, b, min_z_x, min_z_y, min_z_z, num_points, cov_xx, cov_xy, cov_xz, cov_yy, cov_yz, cov_zz]
+def clusters_to_array(clusters):
+    data = np.zeros((len(clusters), 16))
+    for indx, cluster in enumerate(clusters):
+        data[indx,:10] = [cluster.position.x, cluster.position.y, cluster.position.z,
+                          cluster.color.r, cluster.color.g, cluster.color.b,
+                          cluster.min_z_point.x, cluster.min_z_point.y, cluster.min_z_point.z,
+                          cluster.num_points]
+        data[indx,10:] = cluster.covariance
+    return data
+
+### @brief Estimate the yaw of clusters from the covariance of their points (i.e. PCA)
+### @param covariances - Nx6 array of the upper triangles [xx, xy, xz, yy, yz, zz] of the clusters' covariances w.r.t. the cluster frame
+### @param R_rc - 3x3 rotation matrix from the reference frame to the cluster frame
+### @return <array> - yaw [rad] of each cluster's major axis in the reference frame's 'x-y' plane, in the range [-pi/2, pi/2)
+### @details - the covariances are rotated into the reference frame all at once; the major axis of the 'x-y' block of each
+###            covariance is then found in closed form instead of with an eigen decomposition
+def covariance_to_yaw(covariances, R_rc):
+    C = np.empty((len(covariances), 3, 3))
+    C[:,0,0], C[:,0,1], C[:,0,2] = covariances[:,0], covariances[:,1], covariances[:,2]
+    C[:,1,0], C[:,1,1], C[:,1,2] = covariances[:,1], covariances[:,3], covariances[:,4]
+    C[:,2,0], C[:,2,1], C[:,2,2] = covariances[:,2], covariances[:,4], covariances[:,5]
+    C_r = np.einsum("ij,njk,lk->nil", R_rc, C, R_rc)
+    yaw = 0.5 * np.arctan2(2 * C_r[:,0,1], C_r[:,0,0] - C_r[:,1,1])
+    return (yaw + np.pi / 2) % np.pi - np.pi / 2
+
+### @brief Matches the clusters in a sample to reference clusters
+### @param ref_positions - Mx3 array of the reference clusters' positions
+### @param positions - Nx3 array of the sample's cluster positions
+### @param tol - max distance [m] along any axis for two clusters to be considered the same
+### @return ref_indices, indices - arrays of equal length such that cluster 'indices[k]' in the sample
+###                                matches reference cluster 'ref_indices[k]'
+### @details - the distance between two clusters is the largest difference along any axis; pairs are
+###            assigned greedily from the closest one up while both clusters are still unassigned
+def match_clusters(ref_positions, positions, tol):
+    dist = np.abs(ref_positions[:,np.newaxis,:] - positions[np.newaxis,:,:]).max(axis=2)
+    ref_candidates, candidates = np.nonzero(dist < tol)
+    order = np.argsort(dist[ref_candidates, candidates], kind="mergesort")
+    ref_used = np.zeros(len(ref_positions), dtype=bool)
+    used = np.zeros(len(positions), dtype=bool)
+    ref_indices, indices = [], []
+    for ref_indx, indx in zip(ref_candidates[order], candidates[order]):
+        if not ref_used[ref_indx] and not used[indx]:
+            ref_used[ref_indx] = used[indx] = True
+            ref_indices.append(ref_indx)
+            indices.append(indx)
+    return np.array(ref_indices, dtype=int), np.array(indices, dtype=int)
+
+### @brief Tracks clusters over consecutive pointclouds so that each object keeps the same ID
+### @param gate - max distance [m] along any axis between a track's predicted position and a cluster for them to be matched
+### @param alpha - gain (0 - 1] that corrects a track's state towards its matched cluster; lower values smooth more
+### @param beta - gain that corrects a track's velocity by the position error
+### @param min_hits - number of times a new track must be matched before it's confirmed
+### @param max_misses - number of consecutive pointclouds a confirmed track may go unmatched before it's deleted
+### @details - each track runs an alpha-beta filter on its position (the cluster's other values are smoothed
+###            with 'alpha'); unconfirmed tracks are deleted as soon as they go unmatched
+class ClusterTracker(object):
+    def __init__(self, gate=0.03, alpha=0.5, beta=0.1, min_hits=3, max_misses=5):
+        self.gate = gate
+        self.alpha = alpha
+        self.beta = beta
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.mutex = threading.Lock()
+        self.next_id = 1
+        self.reset()
+
+    ### @brief Deletes every track (IDs keep increasing so that old IDs are never reused)
+    def reset(self):
+        with self.mutex:
+            self.ids = np.zeros(0, dtype=int)
+            self.states = np.zeros((0, 16))                                     # Rows like the ones returned by 'clusters_to_array'
+            self.velocities = np.zeros((0, 3))                                  # [m/s] w.r.t. 'self.frame_id'
+            self.hits = np.zeros(0, dtype=int)
+            self.misses = np.zeros(0, dtype=int)
+            self.frame_id = None
+            self.stamp = None
+
+    ### @brief Update the tracks with the clusters found in a new pointcloud
+    ### @param clusters - list of ClusterInfo messages
+    ### @param stamp - time [sec] at which the pointcloud was captured
+    def update(self, clusters, stamp):
+        measurements = clusters_to_array(clusters)
+        with self.mutex:
+            dt = 0.0 if self.stamp is None else max(0.0, stamp - self.stamp)
+            self.stamp = stamp
+            if len(clusters) > 0:
+                self.frame_id = clusters[0].frame_id
+
+            # Predict where each track is now, then correct the matched ones
+            predicted = self.states.copy()
+            predicted[:,0:3] += self.velocities * dt
+            predicted[:,6:9] += self.velocities * dt
+            track_indices, indices = match_clusters(predicted[:,:3], measurements[:,:3], self.gate)
+            errors = measurements[indices] - predicted[track_indices]
+            self.states = predicted
+            self.states[track_indices] += self.alpha * errors
+            if dt > 0:
+                self.velocities[track_indices] += self.beta * errors[:,:3] / dt
+            is_matched = np.zeros(len(self.ids), dtype=bool)
+            is_matched[track_indices] = True
+            self.hits[is_matched] += 1
+            self.misses[is_matched] = 0
+            self.misses[~is_matched] += 1
+
+            # Delete the tracks that were lost and start tracks for the clusters that weren't matched
+            is_confirmed = self.hits >= self.min_hits
+            keep = (self.misses == 0) | (is_confirmed & (self.misses <= self.max_misses))
+            is_new = np.ones(len(measurements), dtype=bool)
+            is_new[indices] = False
+            num_new = np.count_nonzero(is_new)
+            self.ids = np.concatenate((self.ids[keep], np.arange(self.next_id, self.next_id + num_new)))
+            self.states = np.vstack((self.states[keep], measurements[is_new]))
+            self.velocities = np.vstack((self.velocities[keep], np.zeros((num_new, 3))))
+            self.hits = np.concatenate((self.hits[keep], np.ones(num_new, dtype=int)))
+            self.misses = np.concatenate((self.misses[keep], np.zeros(num_new, dtype=int)))
+            self.next_id += num_new
+
+    ### @brief Get the tracked objects
+    ### @param confirmed_only - True to leave out the tracks that haven't been matched 'min_hits' times yet
+    ### @return frame_id, ids, states, velocities - frame the tracks are expressed in (None before any cluster was seen),
+    ###                                             array of track IDs, Nx16 array of the tracks' smoothed cluster values
+    ###                                             (see 'clusters_to_array'), and Nx3 array of their velocities [m/s]
+    def get_tracks(self, confirmed_only=True):
+        with self.mutex:
+            mask = self.hits >= (self.min_hits if confirmed_only else 0)
+            return self.frame_id, self.ids[mask], self.states[mask], self.velocities[mask]
+
 
 ### @brief Python API to tune filter parameters to get accurate position estimates of objects seen by the camera
 ### @param filter_ns - namespace where the ROS parameters needed by the module are located
@@ -17,7 +162,8 @@ class InterbotixPointCloudInterface(object):
     def __init__(self, filter_ns="pc_filter", init_node=False):
         if (init_node):
             rospy.init_node(filter_ns.strip("/") + "_interface")
-        self.params = FilterParamsRequest()
+        self.filter_ns = filter_ns
+        self.filter_params = FilterParamsRequest()
         self.param_filepath = rospy.get_param("/" + filter_ns + "/filter_params")
         self.load_params_from_param_server(filter_ns)
         rospy.wait_for_service("/" + filter_ns + "/set_filter_params")
@@ -26,201 +172,254 @@ class InterbotixPointCloudInterface(object):
         self.srv_set_params = rospy.ServiceProxy("/" + filter_ns + "/set_filter_params", FilterParams)
         self.srv_enable_pipeline = rospy.ServiceProxy("/" + filter_ns + "/enable_pipeline", SetBool)
         self.srv_get_cluster_positions = rospy.ServiceProxy("/" + filter_ns + "/get_cluster_positions", ClusterInfoArray)
+        self.committed_params = self.get_params()                               # Filter parameters the pipeline was last configured with
+        self.batch_depth = 0                                                    # Number of nested 'params' blocks currently open
+        self.commit_latency = None
         self.br = tf2_ros.TransformBroadcaster()
+        self.tf_buffer = tf_cache.getSharedBuffer()
+        self.sub_clusters = None
+        self.cluster_window = collections.deque()                               # (receipt time [sec], list of ClusterInfo messages) for each pointcloud in the stream window
+        self.cluster_condition = threading.Condition()
+        self.stream_window = 0.5
+        self.stream_timeout = 2.0
+        self.tracker = None
         print("Initialized InterbotixPointCloudInterface\n")
 
+    ### @brief Context manager to change several filter parameters with just one reconfiguration of the pipeline
+    ### @return <InterbotixPointCloudInterface> - this interface; its 'set_*' functions only stage changes inside the block
+    ### @details - the staged parameters are sent once when the outermost block exits (and only if they changed);
+    ###            if the block raises an exception, the staged changes are discarded instead. Usage:
+    ###                with pcl.params() as p:
+    ###                    p.set_x_filter_min(-0.1)
+    ###                    p.set_cluster_tol(0.02)
+    @contextlib.contextmanager
+    def params(self):
+        if self.batch_depth == 0:
+            snapshot = self.get_params()
+        self.batch_depth += 1
+        try:
+            yield self
+        except Exception:
+            if self.batch_depth == 1:
+                self.set_params(snapshot)
+            raise
+        finally:
+            self.batch_depth -= 1
+        self.commit_params()
+
+    ### @brief Sends the filter parameters to the pipeline if they changed since they were last sent
+    ### @param force - True to send them even if they didn't change
+    ### @return <bool> - True if the parameters were sent; False if there was nothing to send or a 'params' block is open
+    def commit_params(self, force=False):
+        if self.batch_depth > 0:
+            return False
+        param_dict = self.get_params()
+        if not force and param_dict == self.committed_params:
+            return False
+        time_start = time.time()
+        self.srv_set_params(self.filter_params)
+        self.commit_latency = time.time() - time_start
+        self.committed_params = param_dict
+        rospy.logdebug("Reconfigured the perception pipeline in %.1f ms." % (self.commit_latency * 1000))
+        return True
+
+    ### @brief Get how long the last reconfiguration of the pipeline took
+    ### @return commit_latency - time [sec] the 'set_filter_params' service call took; None if the parameters were never sent
+    def get_commit_latency(self):
+        return self.commit_latency
+
     ### @brief Helper function to convert from a Python dictionary to a FilterParams Service message
     ### @param param_dict - Python Dictionary to convert to a FilterParams message
     def set_params(self, param_dict):
-        self.params.x_filter_min = param_dict["x_filter_min"]
-        self.params.x_filter_max = param_dict["x_filter_max"]
-        self.params.y_filter_min = param_dict["y_filter_min"]
-        self.params.y_filter_max = param_dict["y_filter_max"]
-        self.params.z_filter_min = param_dict["z_filter_min"]
-        self.params.z_filter_max = param_dict["z_filter_max"]
-        self.params.voxel_leaf_size = param_dict["voxel_leaf_size"]
-        self.params.plane_max_iter = int(param_dict["plane_max_iter"])
-        self.params.plane_dist_thresh = param_dict["plane_dist_thresh"]
-        self.params.ror_radius_search = param_dict["ror_radius_search"]
-        self.params.ror_min_neighbors = int(param_dict["ror_min_neighbors"])
-        self.params.cluster_tol = param_dict["cluster_tol"]
-        self.params.cluster_min_size = int(param_dict["cluster_min_size"])
-        self.params.cluster_max_size = int(param_dict["cluster_max_size"])
+        self.filter_params.x_filter_min = param_dict["x_filter_min"]
+        self.filter_params.x_filter_max = param_dict["x_filter_max"]
+        self.filter_params.y_filter_min = param_dict["y_filter_min"]
+        self.filter_params.y_filter_max = param_dict["y_filter_max"]
+        self.filter_params.z_filter_min = param_dict["z_filter_min"]
+        self.filter_params.z_filter_max = param_dict["z_filter_max"]
+        self.filter_params.voxel_leaf_size = param_dict["voxel_leaf_size"]
+        self.filter_params.plane_max_iter = int(param_dict["plane_max_iter"])
+        self.filter_params.plane_dist_thresh = param_dict["plane_dist_thresh"]
+        self.filter_params.ror_radius_search = param_dict["ror_radius_search"]
+        self.filter_params.ror_min_neighbors = int(param_dict["ror_min_neighbors"])
+        self.filter_params.cluster_tol = param_dict["cluster_tol"]
+        self.filter_params.cluster_min_size = int(param_dict["cluster_min_size"])
+        self.filter_params.cluster_max_size = int(param_dict["cluster_max_size"])
 
     ### @brief Filters out any data point in a pointcloud with an 'x' value less than 'x_filter_min'
     ### @param x_filter_min - desired minimum 'x' value [m]
     def set_x_filter_min(self, x_filter_min):
-        self.params.x_filter_min = x_filter_min
-        self.srv_set_params(self.params)
+        self.filter_params.x_filter_min = x_filter_min
+        self.commit_params()
 
     ### @brief Filters out any data point in a pointcloud with an 'x' value more than 'x_filter_max'
     ### @param x_filter_max - desired maximum 'x' value [m]
     def set_x_filter_max(self, x_filter_max):
-        self.params.x_filter_max = x_filter_max
-        self.srv_set_params(self.params)
+        self.filter_params.x_filter_max = x_filter_max
+        self.commit_params()
 
     ### @brief Filters out any data point in a pointcloud with a 'y' value less than 'y_filter_min'
     ### @param y_filter_min - desired minimum 'y' value [m]
     def set_y_filter_min(self, y_filter_min):
-        self.params.y_filter_min = y_filter_min
-        self.srv_set_params(self.params)
+        self.filter_params.y_filter_min = y_filter_min
+        self.commit_params()
 
     ### @brief Filters out any data point in a pointcloud with a 'y' value more than 'y_filter_max'
     ### @param y_filter_max - desired maximum 'y' value [m]
     def set_y_filter_max(self, y_filter_max):
-        self.params.y_filter_max = y_filter_max
-        self.srv_set_params(self.params)
+        self.filter_params.y_filter_max = y_filter_max
+        self.commit_params()
 
     ### @brief Filters out any data point in a pointcloud with a 'z' value less than 'z_filter_min'
     ### @param z_filter_min - desired minimum 'z' value [m]
     def set_z_filter_min(self, z_filter_min):
-        self.params.z_filter_min = z_filter_min
-        self.srv_set_params(self.params)
+        self.filter_params.z_filter_min = z_filter_min
+        self.commit_params()
 
     ### @brief Filters out any data point in a pointcloud with a 'z' value more than 'z_filter_max'
     ### @param z_filter_max - desired maximum 'z' value [m]
     def set_z_filter_max(self, z_filter_max):
-        self.params.z_filter_max = z_filter_max
-        self.srv_set_params(self.params)
+        self.filter_params.z_filter_max = z_filter_max
+        self.commit_params()
 
     ### @brief Sets the voxel leaf size
     ### @param voxel_leaf_size - desired voxel size [m] that applies to the x, y, and z dimensions
     def set_voxel_leaf_size(self, voxel_leaf_size):
-        self.params.voxel_leaf_size = voxel_leaf_size
-        self.srv_set_params(self.params)
+        self.filter_params.voxel_leaf_size = voxel_leaf_size
+        self.commit_params()
 
     ### @brief Set the maximum number of iterations the sample consensus method should run
     ### @param plane_max_iter - desired max iterations (default is 50)
     def set_plane_max_iter(self, plane_max_iter):
-        self.params.plane_max_iter = int(plane_max_iter)
-        self.srv_set_params(self.params)
+        self.filter_params.plane_max_iter = int(plane_max_iter)
+        self.commit_params()
 
     ### @brief Set the max distance perpendicular from the calculated 'plane' in which a point should be considerd part of the plane
     ### @param plane_dist_thresh - desired max distance [m] (default is about 0.01 meters)
     def set_plane_dist_thresh(self, plane_dist_thresh):
-        self.params.plane_dist_thresh = plane_dist_thresh
-        self.srv_set_params(self.params)
+        self.filter_params.plane_dist_thresh = plane_dist_thresh
+        self.commit_params()
 
     ### @brief Set the radius around any given point to search for neighbors
     ### @param ror_radius_search - desired radius [m] (default is about 0.01 meters)
     def set_ror_radius_search(self, ror_radius_search):
-        self.params.ror_radius_search = ror_radius_search
-        self.srv_set_params(self.params)
+        self.filter_params.ror_radius_search = ror_radius_search
+        self.commit_params()
 
     ### @brief Set the minimum number of neighbors (within the radius set above)
     ###        that any given point should have to remain in the pointcloud
     def set_ror_min_neighbors(self, ror_min_neighbors):
-        self.params.ror_min_neighbors = int(ror_min_neighbors)
-        self.srv_set_params(self.params)
+        self.filter_params.ror_min_neighbors = int(ror_min_neighbors)
+        self.commit_params()
 
     ### @brief Set the cluster tolerance - all points that are within 'cluster_tol'
     ###        of each other are considered to be part of the same cluster
     ### @param cluster_tol - desired cluster tolerance [m] (default is about 0.02 meters)
     def set_cluster_tol(self, cluster_tol):
-        self.params.cluster_tol = cluster_tol
-        self.srv_set_params(self.params)
+        self.filter_params.cluster_tol = cluster_tol
+        self.commit_params()
 
     ### @brief Set the minimum size that a cluster must be to be considered a cluster
     ### @param cluster_min_size - desired minimum size [number of points in a cluster's pointcloud]
     def set_cluster_min_size(self, cluster_min_size):
-        self.params.cluster_min_size = int(cluster_min_size)
-        self.srv_set_params(self.params)
+        self.filter_params.cluster_min_size = int(cluster_min_size)
+        self.commit_params()
 
     ### @brief Set the maximum size that a cluster can be to be considered a cluster
     ### @param cluster_max_size - desired maximum size [number of points in a cluster's pointcloud]
     def set_cluster_max_size(self, cluster_max_size):
-        self.params.cluster_max_size = int(cluster_max_size)
-        self.srv_set_params(self.params)
+        self.filter_params.cluster_max_size = int(cluster_max_size)
+        self.commit_params()
 
     ### @brief Helper function to convert from a FilterParams Service type to a Python Dictionary
     ### @return param_dict - python dictionary containing the data from the FilterParams service message
     def get_params(self):
         param_dict = {}
-        param_dict["x_filter_min"] = self.params.x_filter_min
-        param_dict["x_filter_max"] = self.params.x_filter_max
-        param_dict["y_filter_min"] = self.params.y_filter_min
-        param_dict["y_filter_max"] = self.params.y_filter_max
-        param_dict["z_filter_min"] = self.params.z_filter_min
-        param_dict["z_filter_max"] = self.params.z_filter_max
-        param_dict["voxel_leaf_size"] = self.params.voxel_leaf_size
-        param_dict["plane_max_iter"] = self.params.plane_max_iter
-        param_dict["plane_dist_thresh"] = self.params.plane_dist_thresh
-        param_dict["ror_radius_search"] = self.params.ror_radius_search
-        param_dict["ror_min_neighbors"] = self.params.ror_min_neighbors
-        param_dict["cluster_tol"] = self.params.cluster_tol
-        param_dict["cluster_min_size"] = self.params.cluster_min_size
-        param_dict["cluster_max_size"] = self.params.cluster_max_size
+        param_dict["x_filter_min"] = self.filter_params.x_filter_min
+        param_dict["x_filter_max"] = self.filter_params.x_filter_max
+        param_dict["y_filter_min"] = self.filter_params.y_filter_min
+        param_dict["y_filter_max"] = self.filter_params.y_filter_max
+        param_dict["z_filter_min"] = self.filter_params.z_filter_min
+        param_dict["z_filter_max"] = self.filter_params.z_filter_max
+        param_dict["voxel_leaf_size"] = self.filter_params.voxel_leaf_size
+        param_dict["plane_max_iter"] = self.filter_params.plane_max_iter
+        param_dict["plane_dist_thresh"] = self.filter_params.plane_dist_thresh
+        param_dict["ror_radius_search"] = self.filter_params.ror_radius_search
+        param_dict["ror_min_neighbors"] = self.filter_params.ror_min_neighbors
+        param_dict["cluster_tol"] = self.filter_params.cluster_tol
+        param_dict["cluster_min_size"] = self.filter_params.cluster_min_size
+        param_dict["cluster_max_size"] = self.filter_params.cluster_max_size
         return param_dict
 
     ### @brief Gets the current minimum 'x' value
     ### @return x_filter_min [m]
     def get_x_filter_min(self):
-        return self.params.x_filter_min
+        return self.filter_params.x_filter_min
 
     ### @brief Gets the current maximum 'x' value
     ### @return x_filter_max [m]
     def get_x_filter_max(self):
-        return self.params.x_filter_max
+        return self.filter_params.x_filter_max
 
     ### @brief Gets the current minimum 'y' value
     ### @return y_filter_min [m]
     def get_y_filter_min(self):
-        return self.params.y_filter_min
+        return self.filter_params.y_filter_min
 
     ### @brief Gets the current maximum 'y' value
     ### @return y_filter_max [m]
     def get_y_filter_max(self):
-        return self.params.y_filter_max
+        return self.filter_params.y_filter_max
 
     ### @brief Gets the current minimum 'z' value
     ### @return z_filter_min [m]
     def get_z_filter_min(self):
-        return self.params.z_filter_min
+        return self.filter_params.z_filter_min
 
     ### @brief Gets the current maximum 'z' value
     ### @return z_filter_max [m]
     def get_z_filter_max(self):
-        return self.params.z_filter_max
+        return self.filter_params.z_filter_max
 
     ### @brief Gets the current voxel size
     ### @return voxel_leaf_size [m]
     def get_voxel_leaf_size(self):
-        return self.params.voxel_leaf_size
+        return self.filter_params.voxel_leaf_size
 
     ### @brief Gets the current max number of iterations for the planar segmentation algorithm
     ### @return plane_max_iter
     def get_plane_max_iter(self):
-        return self.params.plane_max_iter
+        return self.filter_params.plane_max_iter
 
     ### @brief Gets the current max distance from the plane model to be considered part of the plane
     ### @return plane_dist_thresh [m]
     def get_plane_dist_thresh(self):
-        return self.params.plane_dist_thresh
+        return self.filter_params.plane_dist_thresh
 
     ### @brief Gets the current radius used when searching for nearest neighbor points
     ### @return ror_radius_search [m]
     def get_ror_radius_search(self):
-        return self.params.ror_radius_search
+        return self.filter_params.ror_radius_search
 
     ### @brief Gets the current minimum number of neighbors to search for for a point not to be removed
     ### @return ror_min_neighbors
     def get_ror_min_neighbors(self):
-        return self.params.ror_min_neighbors
+        return self.filter_params.ror_min_neighbors
 
     ### @brief Gets the current cluster tolerance
     ### @return cluster_tol [m]
     def get_cluster_tol(self):
-        return self.params.cluster_tol
+        return self.filter_params.cluster_tol
 
     ### @brief Gets the current minimum cluster size
     ### @return cluster_min_size [number of points in the pointcloud cluster]
     def get_cluster_min_size(self):
-        return self.params.cluster_min_size
+        return self.filter_params.cluster_min_size
 
     ### @brief Gets the current maximum cluster size
     ### @return cluster_max_size [number of points in the pointcloud cluster]
     def get_cluster_max_size(self):
-        return self.params.cluster_max_size
+        return self.filter_params.cluster_max_size
 
     ### @brief Get the absolute filepath to the config file containing all the filter parameters
     ### @return param_filepath - string with the absolute filepath
@@ -232,141 +431,243 @@ class InterbotixPointCloudInterface(object):
     def enable_pipeline(self, enable):
         self.srv_enable_pipeline(enable)
 
+    ### @brief Start consuming the cluster positions that the pipeline publishes for every pointcloud
+    ### @param window - length [sec] of the sliding window of recent results that 'get_cluster_positions' averages over; the
+    ###        newest 'num_samples' + 1 results are always kept regardless of their age, so slow pipelines still fill the window
+    ### @param max_samples - max number of results to keep in the window
+    ### @param timeout - max time [sec] 'get_cluster_positions' waits for the window to hold enough results
+    ### @details - the pipeline is enabled so that it runs continuously; while streaming, 'get_cluster_positions'
+    ###            returns as soon as the window holds 'num_samples' + 1 results instead of calling the service
+    ###            and sleeping between samples
+    def start_cluster_stream(self, window=0.5, max_samples=30, timeout=2.0):
+        self.stop_cluster_stream()
+        with self.cluster_condition:
+            self.stream_window = window
+            self.stream_timeout = timeout
+            self.cluster_window = collections.deque(maxlen=max_samples)
+        self.enable_pipeline(True)
+        self.sub_clusters = rospy.Subscriber("/" + self.filter_ns + "/clusters", ClusterInfoList, self.cluster_list_cb)
+
+    ### @brief Stop consuming the streamed cluster positions; 'get_cluster_positions' goes back to calling the service
+    ### @details - the pipeline is left enabled; call 'enable_pipeline(False)' to save processing power
+    def stop_cluster_stream(self):
+        if self.sub_clusters is not None:
+            self.sub_clusters.unregister()
+            self.sub_clusters = None
+        with self.cluster_condition:
+            self.cluster_window.clear()
+
+    ### @brief Start tracking the streamed clusters so that each object keeps the same ID across pointclouds
+    ### @param gate - max distance [m] along any axis between a track and a cluster for them to be matched
+    ### @param alpha - gain (0 - 1] that corrects a track towards its matched cluster; lower values smooth more
+    ### @param beta - gain that corrects a track's velocity
+    ### @param min_hits - number of pointclouds a new object must be seen in before it's reported
+    ### @param max_misses - number of consecutive pointclouds an object may be missing from before it's forgotten
+    ### @details - starts the cluster stream (with default settings) if it isn't already running; see 'ClusterTracker'
+    def start_cluster_tracking(self, gate=0.03, alpha=0.5, beta=0.1, min_hits=3, max_misses=5):
+        self.tracker = ClusterTracker(gate, alpha, beta, min_hits, max_misses)
+        if not self.is_streaming():
+            self.start_cluster_stream()
+
+    ### @brief Stop tracking the streamed clusters (the stream itself keeps running)
+    def stop_cluster_tracking(self):
+        self.tracker = None
+
+    ### @brief Get the objects currently tracked, without waiting for new pointclouds
+    ### @param ref_frame - the desired reference frame the positions should be transformed into; if unspecified, the camera's depth frame is used
+    ### @param is_parallel - see 'get_cluster_positions'
+    ### @param confirmed_only - True to only include objects seen in at least 'min_hits' pointclouds
+    ### @return <bool>, objects - True if the tracker is running and the transform was found or False otherwise; a list of dictionaries
+    ###                           like the ones returned by 'get_cluster_positions' (sorted by ID) with extra 'id' and 'velocity' [m/s]
+    ###                           keys, and with 'name' set to 'object_<id>'
+    def get_tracked_clusters(self, ref_frame=None, is_parallel=True, confirmed_only=True):
+        tracker = self.tracker
+        if tracker is None:
+            rospy.logwarn("Cluster tracking isn't running. Call 'start_cluster_tracking' first.")
+            return False, []
+        frame_id, ids, states, velocities = tracker.get_tracks(confirmed_only)
+        if len(ids) == 0:
+            return True, []
+        if ref_frame is None:
+            ref_frame = frame_id
+        T_rc = self.tf_buffer.lookup_transform(ref_frame, frame_id)
+        if T_rc is None:
+            rospy.logerr("Failed to look up the transform from '%s' to '%s'." % (ref_frame, frame_id))
+            return False, []
+        positions = np.dot(states[:,0:3], T_rc[:3,:3].T) + T_rc[:3,3]
+        velocities = np.dot(velocities, T_rc[:3,:3].T)
+        yaws = covariance_to_yaw(states[:,10:16], T_rc[:3,:3])
+        if is_parallel:
+            positions[:,2] = np.dot(states[:,6:9], T_rc[2,:3]) + T_rc[2,3]
+        order = np.argsort(ids)
+        objects = []
+        for indx in order:
+            objects.append({"name" : "object_" + str(ids[indx]), "id" : int(ids[indx]), "position" : positions[indx].tolist(), "yaw" : yaws[indx],
+                            "color" : states[indx,3:6].tolist(), "num_points" : states[indx,9], "velocity" : velocities[indx].tolist()})
+        return True, objects
+
+    ### @brief Check whether the cluster positions are being streamed
+    ### @return <bool> - True if 'start_cluster_stream' was called (and 'stop_cluster_stream' wasn't)
+    def is_streaming(self):
+        return self.sub_clusters is not None
+
+    ### @brief ROS Subscriber Callback function to add the latest cluster positions to the stream window
+    ### @param msg - ClusterInfoList message
+    def cluster_list_cb(self, msg):
+        time_now = rospy.get_time()
+        tracker = self.tracker
+        if tracker is not None:
+            tracker.update(msg.clusters, msg.header.stamp.to_sec())
+        with self.cluster_condition:
+            self.cluster_window.append((time_now, msg.clusters))
+            self.cluster_condition.notify_all()
+
+    ### @brief Removes results older than the stream window, but never the newest 'min_samples' results; must be called
+    ###        with 'self.cluster_condition' held
+    ### @param time_now - current time [sec]
+    ### @param min_samples - number of the newest results to keep regardless of their age
+    def prune_cluster_window(self, time_now, min_samples):
+        while len(self.cluster_window) > min_samples and time_now - self.cluster_window[0][0] > self.stream_window:
+            self.cluster_window.popleft()
+
+    ### @brief Get several sets of cluster positions to average over
+    ### @param num_samples - min number of sets to get
+    ### @param period - number of seconds to wait between service calls (unused while streaming)
+    ### @return samples - list of lists of ClusterInfo messages (oldest first); None if streaming and the window
+    ###                   didn't hold 'num_samples' sets within the timeout
+    ### @details - while streaming, every set in the window is returned (which may be more than 'num_samples'); the newest
+    ###            'num_samples' sets are returned even if they're older than the stream window
+    def get_cluster_samples(self, num_samples, period):
+        if not self.is_streaming():
+            samples = []
+            for x in range(num_samples):
+                if x > 0:
+                    rospy.sleep(period)
+                samples.append(self.srv_get_cluster_positions().clusters)
+            return samples
+
+        time_end = rospy.get_time() + self.stream_timeout
+        with self.cluster_condition:
+            if num_samples > self.cluster_window.maxlen:
+                rospy.logwarn("The stream window holds at most %d cluster samples; using that many instead of %d." % (self.cluster_window.maxlen, num_samples))
+                num_samples = self.cluster_window.maxlen
+            while not rospy.is_shutdown():
+                time_now = rospy.get_time()
+                self.prune_cluster_window(time_now, num_samples)
+                if len(self.cluster_window) >= num_samples:
+                    return [clusters for stamp, clusters in self.cluster_window]
+                if time_now > time_end:
+                    break
+                self.cluster_condition.wait(min(0.1, time_end - time_now))
+        rospy.logwarn("Only got %d of %d cluster samples within %.1f seconds. Is the pipeline running?" % (len(self.cluster_window), num_samples, self.stream_timeout))
+        return None
+
     ### @brief Get the estimated positions of all pointcloud clusters
-    ### @param num_samples - number of times to run the pipeline to get the cluster positions; these samples are then averaged together to get a more accurate result
-    ### @param period - number of seconds to wait between sampling (give time for the backend to get updated with a new pointcloud)
+    ### @param num_samples - number of times to run the pipeline to get the cluster positions; these samples are then averaged together to get a more accurate result;
+    ###                      while streaming (see 'start_cluster_stream'), this is the min number of samples the window must hold, and all the samples in it are averaged
+    ### @param period - number of seconds to wait between sampling (give time for the backend to get updated with a new pointcloud); unused while streaming
     ### @param ref_frame - the desired reference frame the cluster positions should be transformed into; if unspecified, the camera's depth frame is used
     ### @param sort_axis - the axis of the 'ref_frame' by which to sort the cluster positions when returning them to the user
     ### @param reverse - if False, cluster positions are sorted in ascending order along the axis specified by 'sort_axis'; if True, the positions are sorted in descending order
     ### @param is_parallel - if False, the cluster positions returned to the user represent the centroids of each cluster w.r.t. the 'ref_frame';
     ###                      if True, the cluster positions returned to the user represent the centroids of each cluster, but positioned at the top of each cluster w.r.t. the 'ref_frame';
     ###                      set this to True if the 'ref_frame' is parallel to the surface that the objects are on
+    ### @param min_valid_ratio - fraction of the samples (besides the newest one) that a cluster must be matched in to be returned; clusters
+    ###                          are matched to the ones found in the newest sample
+    ### @param as_array - if True, the clusters are returned as a structured array (see CLUSTER_DTYPE) instead of a list of dictionaries
     ### @return <bool>, final_clusters - True if the algorithm succeeded or False otherwise. If False, the 'final_clusters' list is empty, but if True, a list of
-    ###                                  dictionaries representing each cluster is returned to the user
-    def get_cluster_positions(self, num_samples=5, period=0.1, ref_frame=None, sort_axis="y", reverse=False, is_parallel=True):
-        root_clusters = self.srv_get_cluster_positions().clusters
+    ###                                  dictionaries (or a structured array if 'as_array' is True) representing each cluster is returned to the user
+    ### @details - each cluster's 'yaw' is the angle of the major axis of its points (found via PCA) in the 'ref_frame' x-y plane,
+    ###            in the range [-pi/2, pi/2); it is only meaningful if the 'ref_frame' z-axis points up from the surface
+    def get_cluster_positions(self, num_samples=5, period=0.1, ref_frame=None, sort_axis="y", reverse=False, is_parallel=True, min_valid_ratio=0.5, as_array=False):
+        samples = self.get_cluster_samples(num_samples + 1, period)
+        if samples is None:
+            return False, []
+        root_clusters = samples[-1]
         num_clusters = len(root_clusters)
         if num_clusters == 0:
             rospy.logwarn("No clusters found...")
             return False, []
         cluster_frame = root_clusters[0].frame_id
 
-        # Calculate the average for each cluster based on 'num_samples' samples
-        avg_clusters = [ClusterInfo() for i in range(num_clusters)]
-        for x in range(num_samples):
-            clusters = self.srv_get_cluster_positions().clusters
-            if len(clusters) != num_clusters:
-                rospy.logwarn("Found %d clusters instead of %d clusters..." % (len(clusters), num_clusters))
-                return False, []
-            valid_indices = list(range(num_clusters))
-            for cluster in clusters:
-                for indx in valid_indices:
-                    if (abs(root_clusters[indx].position.x - cluster.position.x) < self.params.cluster_tol and
-                       abs(root_clusters[indx].position.y - cluster.position.y) < self.params.cluster_tol and
-                       abs(root_clusters[indx].position.z - cluster.position.z) < self.params.cluster_tol):
-                       avg_clusters[indx].position.x += cluster.position.x / num_samples
-                       avg_clusters[indx].position.y += cluster.position.y / num_samples
-                       avg_clusters[indx].position.z += cluster.position.z /num_samples
-                       avg_clusters[indx].color.r += cluster.color.r / num_samples
-                       avg_clusters[indx].color.g += cluster.color.g / num_samples
-                       avg_clusters[indx].color.b += cluster.color.b / num_samples
-                       avg_clusters[indx].min_z_point.x += cluster.min_z_point.x / num_samples
-                       avg_clusters[indx].min_z_point.y += cluster.min_z_point.y / num_samples
-                       avg_clusters[indx].min_z_point.z += cluster.min_z_point.z / num_samples
-                       avg_clusters[indx].num_points += cluster.num_points / float(num_samples)
-                       valid_indices.remove(indx)
-                       break
-                    elif (indx == num_clusters - 1):
-                        rospy.logwarn("Could not match the cluster. Please tune the filter parameters such that all spherical 'object markers' are constant in their respective clusters and do not flicker.")
-                        return False, []
-            rospy.sleep(period)
+        # Calculate the average for each cluster based on the samples taken before the root (newest) one; clusters
+        # missing from (or not matched in) some of the samples are averaged over the samples they were found in
+        root_data = clusters_to_array(root_clusters)
+        sums = np.zeros(root_data.shape)
+        valid_counts = np.zeros(num_clusters, dtype=int)
+        for clusters in samples[:-1]:
+            if len(clusters) == 0:
+                continue
+            data = clusters_to_array(clusters)
+            root_indices, indices = match_clusters(root_data[:,:3], data[:,:3], self.filter_params.cluster_tol)
+            sums[root_indices] += data[indices]
+            valid_counts[root_indices] += 1
+
+        # Only keep the clusters that were found in enough of the samples
+        num_samples = len(samples) - 1
+        is_valid = valid_counts >= max(1, min_valid_ratio * num_samples)
+        if not np.all(is_valid):
+            rospy.logwarn("Dropping %d of %d clusters found in less than %d%% of the samples. If they are objects, tune the filter parameters such that all spherical 'object markers' are constant in their respective clusters and do not flicker." % (num_clusters - np.count_nonzero(is_valid), num_clusters, 100 * min_valid_ratio))
+        if not np.any(is_valid):
+            return False, []
+        avg_data = sums[is_valid] / valid_counts[is_valid][:,np.newaxis]
+        num_clusters = len(avg_data)
 
         # Get the transform from the 'ref_frame' to the cluster frame (i.e. the camera's depth frame) - known as T_rc
-        tfBuffer = tf2_ros.Buffer()
-        listener = tf2_ros.TransformListener(tfBuffer)
-        try:
-            trans = tfBuffer.lookup_transform(ref_frame, cluster_frame, rospy.Time(0), rospy.Duration(4.0))
-        except (tf2_ros.LookupException, tf2_ros.ConnectivityException, tf2_ros.ExtrapolationException):
+        if ref_frame is None:
+            ref_frame = cluster_frame
+        T_rc = self.tf_buffer.lookup_transform(ref_frame, cluster_frame)
+        if T_rc is None:
             rospy.logerr("Failed to look up the transform from '%s' to '%s'." % (ref_frame, cluster_frame))
             return False, []
-        x = trans.transform.translation.x
-        y = trans.transform.translation.y
-        z = trans.transform.translation.z
-        quat = trans.transform.rotation
-        q = [quat.x, quat.y, quat.z, quat.w]
-        rpy = euler_from_quaternion(q)
-        T_rc = ang.poseToTransformationMatrix([x, y, z, rpy[0], rpy[1], rpy[2]])
-
-        # Sort the clusters from left to right w.r.t. the camera's depth frame
-        sorted_cam_clusters = sorted(avg_clusters, key=lambda cluster : cluster.position.x)
-
-        # TO DO...
-        # if is_parallel is True...
-        # find 'yaw' of each cluster relative to a virtual frame located at 'cluster_frame' (with the 'x' axis
-        # pointed in the same direction, but with the 'z' axis pointing straight up) using OpenCV (order is left to right)
-        # set this 'yaw' to the yaw variable in each cluster; it will be added to the yaw part of T_rc before the transform is published
-
-        # Transform the clusters to be w.r.t. the 'ref_frame' instead of the camera's depth frame
-        for cluster in sorted_cam_clusters:
-            # p_co is the cluster's position w.r.t. the camera's depth frame
-            # p_ro is the cluster's position w.r.t. the desired reference frame
-            p_co = [cluster.position.x, cluster.position.y, cluster.position.z, 1]
-            p_ro = np.dot(T_rc, p_co)
-            if (is_parallel):
-                # p_comin is the minimum point of the cluster (in the 'z' direction) w.r.t. the camera's depth frame;
-                # it is assumed that this point lies at the top or very near the top of the cluster
-                # p_romin is the same point w.r.t. the desired reference frame; the 'z' element of this point replaces
-                # the 'z' element in p_ro; thus, a tf frame published at this point should appear at the 'top-center' of the cluster
-                p_comin = [cluster.min_z_point.x, cluster.min_z_point.y, cluster.min_z_point.z, 1]
-                p_romin = np.dot(T_rc, p_comin)
-                p_ro[2] = p_romin[2]
-            cluster.position.x = p_ro[0]
-            cluster.position.y = p_ro[1]
-            cluster.position.z = p_ro[2]
-
-        # Sort the clusters based on user input
-        if sort_axis == "x":
-            key = lambda cluster : cluster.position.x
-        elif sort_axis == "y":
-            key = lambda cluster : cluster.position.y
-        elif sort_axis == "z":
-            key = lambda cluster : cluster.position.z
-        else:
-            key = lambda cluster : cluster.position.y
+
+        # Transform the clusters to be w.r.t. the 'ref_frame' instead of the camera's depth frame (all at once)
+        # p_co are the clusters' positions w.r.t. the camera's depth frame; p_ro are the same w.r.t. the desired reference frame
+        p_co = np.hstack((avg_data[:,0:3], np.ones((num_clusters, 1))))
+        p_ro = np.dot(p_co, T_rc.T)
+        if (is_parallel):
+            # p_comin are the minimum points of the clusters (in the 'z' direction) w.r.t. the camera's depth frame;
+            # it is assumed that these points lie at the top or very near the top of the clusters
+            # p_romin are the same points w.r.t. the desired reference frame; their 'z' elements replace
+            # the 'z' elements in p_ro; thus, a tf frame published at these points should appear at the 'top-center' of each cluster
+            p_comin = np.hstack((avg_data[:,6:9], np.ones((num_clusters, 1))))
+            p_ro[:,2] = np.dot(p_comin, T_rc[2])
+
+        # Sort the clusters based on user input; clusters at the same position along 'sort_axis' are ordered from
+        # left to right w.r.t. the camera's depth frame
+        if sort_axis not in ("x", "y", "z"):
             rospy.logwarn("'%s' is not a valid sorting axis. Set the 'sort_axis' argument to 'x', 'y', or 'z'. Defaulting to 'y'." % sort_axis)
-        sorted_ref_clusters = sorted(sorted_cam_clusters, key=key, reverse=reverse)
+            sort_axis = "y"
+        key = p_ro[:,"xyz".index(sort_axis)]
+        order = np.lexsort((avg_data[:,0], -key if reverse else key))
+
+        final_clusters = np.zeros(num_clusters, dtype=CLUSTER_DTYPE)
+        final_clusters["name"] = ["cluster_" + str(indx + 1) for indx in range(num_clusters)]
+        final_clusters["position"] = p_ro[order,:3]
+        final_clusters["yaw"] = covariance_to_yaw(avg_data[order,10:16], T_rc[:3,:3])
+        final_clusters["color"] = avg_data[order,3:6]
+        final_clusters["num_points"] = avg_data[order,9]
 
         # publish transforms to the /tf tree for debugging purposes (only once)
         final_trans = []
-        cluster_num = 1
         time_now = rospy.Time.now()
-        for cluster in sorted_ref_clusters:
+        for cluster in final_clusters:
             trans = TransformStamped()
             trans.header.frame_id = ref_frame
             trans.header.stamp = time_now
-            trans.child_frame_id = "cluster_" + str(cluster_num)
-            trans.transform.translation.x = cluster.position.x
-            trans.transform.translation.y = cluster.position.y
-            trans.transform.translation.z = cluster.position.z
-            trans.transform.rotation = Quaternion(0, 0, 0, 1)
+            trans.child_frame_id = str(cluster["name"])
+            trans.transform.translation.x, trans.transform.translation.y, trans.transform.translation.z = cluster["position"]
+            quat = quaternion_from_euler(0, 0, cluster["yaw"])
+            trans.transform.rotation = Quaternion(quat[0], quat[1], quat[2], quat[3])
             final_trans.append(trans)
-            cluster_num += 1
         self.br.sendTransform(final_trans)
 
+        if as_array:
+            return True, final_clusters
+
         # create a list of Python dictionaries to return to the user
-        final_clusters = []
-        for indx in range(num_clusters):
-            name = final_trans[indx].child_frame_id
-            x = final_trans[indx].transform.translation.x
-            y = final_trans[indx].transform.translation.y
-            z = final_trans[indx].transform.translation.z
-            yaw = 0
-            r = sorted_ref_clusters[indx].color.r
-            g = sorted_ref_clusters[indx].color.g
-            b = sorted_ref_clusters[indx].color.b
-            num_points = sorted_ref_clusters[indx].num_points
-            cluster = {"name" : name, "position" : [x, y, z], "yaw" : yaw, "color" : [r, g, b], "num_points" : num_points}
-            final_clusters.append(cluster)
+        final_clusters = [{"name" : str(cluster["name"]), "position" : cluster["position"].tolist(), "yaw" : float(cluster["yaw"]),
+                           "color" : cluster["color"].tolist(), "num_points" : float(cluster["num_points"])} for cluster in final_clusters]
         return True, final_clusters
 
     ### @brief Get params from the specified filepath
@@ -379,20 +680,20 @@ class InterbotixPointCloudInterface(object):
         self.set_params(param_dict)
 
     def load_params_from_param_server(self, filter_ns):
-        self.params.x_filter_min = rospy.get_param("/" + filter_ns + "/x_filter_min")
-        self.params.x_filter_max = rospy.get_param("/" + filter_ns + "/x_filter_max")
-        self.params.y_filter_min = rospy.get_param("/" + filter_ns + "/y_filter_min")
-        self.params.y_filter_max = rospy.get_param("/" + filter_ns + "/y_filter_max")
-        self.params.z_filter_min = rospy.get_param("/" + filter_ns + "/z_filter_min")
-        self.params.z_filter_max = rospy.get_param("/" + filter_ns + "/z_filter_max")
-        self.params.voxel_leaf_size = rospy.get_param("/" + filter_ns + "/voxel_leaf_size")
-        self.params.plane_max_iter = int(rospy.get_param("/" + filter_ns + "/plane_max_iter"))
-        self.params.plane_dist_thresh = rospy.get_param("/" + filter_ns + "/plane_dist_thresh")
-        self.params.ror_radius_search = rospy.get_param("/" + filter_ns + "/ror_radius_search")
-        self.params.ror_min_neighbors = int(rospy.get_param("/" + filter_ns + "/ror_min_neighbors"))
-        self.params.cluster_tol = rospy.get_param("/" + filter_ns + "/cluster_tol")
-        self.params.cluster_min_size = int(rospy.get_param("/" + filter_ns + "/cluster_min_size"))
-        self.params.cluster_max_size = int(rospy.get_param("/" + filter_ns + "/cluster_max_size"))
+        self.filter_params.x_filter_min = rospy.get_param("/" + filter_ns + "/x_filter_min")
+        self.filter_params.x_filter_max = rospy.get_param("/" + filter_ns + "/x_filter_max")
+        self.filter_params.y_filter_min = rospy.get_param("/" + filter_ns + "/y_filter_min")
+        self.filter_params.y_filter_max = rospy.get_param("/" + filter_ns + "/y_filter_max")
+        self.filter_params.z_filter_min = rospy.get_param("/" + filter_ns + "/z_filter_min")
+        self.filter_params.z_filter_max = rospy.get_param("/" + filter_ns + "/z_filter_max")
+        self.filter_params.voxel_leaf_size = rospy.get_param("/" + filter_ns + "/voxel_leaf_size")
+        self.filter_params.plane_max_iter = int(rospy.get_param("/" + filter_ns + "/plane_max_iter"))
+        self.filter_params.plane_dist_thresh = rospy.get_param("/" + filter_ns + "/plane_dist_thresh")
+        self.filter_params.ror_radius_search = rospy.get_param("/" + filter_ns + "/ror_radius_search")
+        self.filter_params.ror_min_neighbors = int(rospy.get_param("/" + filter_ns + "/ror_min_neighbors"))
+        self.filter_params.cluster_tol = rospy.get_param("/" + filter_ns + "/cluster_tol")
+        self.filter_params.cluster_min_size = int(rospy.get_param("/" + filter_ns + "/cluster_min_size"))
+        self.filter_params.cluster_max_size = int(rospy.get_param("/" + filter_ns + "/cluster_max_size"))
 
     ### @brief Save params to the specified filepath
     ### @param filepath - YAML config file to save the params; if None, the default filepath specified by the 'filter_params' ROS parameter is used
@@ -0,0 +1,300 @@
+import numpy as np
+from timeit import default_timer
+from sensor_msgs.msg import PointField
+from interbotix_perception_modules.srv import FilterParamsRequest
+from interbotix_perception_modules.msg import ClusterInfo
+
+# NumPy types of the PointField datatypes
+POINT_FIELD_TYPES = {
+    PointField.INT8 : "i1",
+    PointField.UINT8 : "u1",
+    PointField.INT16 : "i2",
+    PointField.UINT16 : "u2",
+    PointField.INT32 : "i4",
+    PointField.UINT32 : "u4",
+    PointField.FLOAT32 : "f4",
+    PointField.FLOAT64 : "f8",
+}
+
+### @brief View the data of a PointCloud2 message as a structured NumPy array without copying it
+### @param msg - ROS PointCloud2 message
+### @return cloud - read-only 'height' x 'width' structured array with one field per PointField (ex. 'x', 'y', 'z', 'rgb')
+### @details - padding between points and between rows is skipped through the array's strides
+def pointcloud2_to_array(msg):
+    byte_order = ">" if msg.is_bigendian else "<"
+    names, formats, offsets = [], [], []
+    for field in msg.fields:
+        if field.name == "" or field.datatype not in POINT_FIELD_TYPES: continue
+        fmt = byte_order + POINT_FIELD_TYPES[field.datatype]
+        names.append(field.name)
+        formats.append(fmt if field.count <= 1 else (fmt, field.count))
+        offsets.append(field.offset)
+    dtype = np.dtype({"names" : names, "formats" : formats, "offsets" : offsets, "itemsize" : msg.point_step})
+    return np.ndarray(shape=(msg.height, msg.width), dtype=dtype, buffer=msg.data, strides=(msg.row_step, msg.point_step))
+
+### @brief Get the positions and colors of the valid points in a structured pointcloud array
+### @param cloud - structured array returned by 'pointcloud2_to_array'
+### @return points, colors - Nx3 arrays of the 'x', 'y', 'z' positions [m] and 'r', 'g', 'b' values (0 - 255) of
+###                          every point with a finite position; colors are 0 if the cloud has no color field
+def get_points_and_colors(cloud):
+    cloud = cloud.reshape(-1)
+    points = np.empty((len(cloud), 3))
+    points[:,0], points[:,1], points[:,2] = cloud["x"], cloud["y"], cloud["z"]
+    colors = np.zeros((len(cloud), 3))
+    for name in ("rgb", "rgba"):
+        if name in cloud.dtype.names:
+            packed = cloud[name].view(cloud.dtype.fields[name][0].str.replace("f", "u"))  # colors are packed into the bytes of one 4-byte field
+            colors[:,0], colors[:,1], colors[:,2] = (packed >> 16) & 255, (packed >> 8) & 255, packed & 255
+            break
+    valid = np.isfinite(points).all(axis=1)
+    return points[valid], colors[valid]
+
+### @brief Get a mask of the points inside an axis-aligned box (bounds included)
+### @param points - Nx3 array of positions [m]
+### @param min_point - [x, y, z] lower corner of the box [m]
+### @param max_point - [x, y, z] upper corner of the box [m]
+### @return <array> - boolean mask of length N
+def crop_box(points, min_point, max_point):
+    return np.all((points >= min_point) & (points <= max_point), axis=1)
+
+### @brief Downsample points by replacing the points in each cubic voxel by their centroid
+### @param points - Nx3 array of positions [m]
+### @param colors - Nx3 array of colors (averaged the same way as the positions)
+### @param leaf_size - edge length [m] of each voxel
+### @return points, colors - Mx3 arrays with one row per occupied voxel
+### @details - voxels are found by hashing each point's integer voxel coordinates into one key
+def voxel_downsample(points, colors, leaf_size):
+    cells = np.floor(points / leaf_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+    dims = cells.max(axis=0) + 1
+    keys = cells[:,0] + dims[0] * (cells[:,1] + dims[1] * cells[:,2])
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse).astype(float)
+    data = np.hstack((points, colors))
+    sums = np.zeros((len(unique_keys), 6))
+    for col in range(6):
+        sums[:,col] = np.bincount(inverse, weights=data[:,col])
+    averages = sums / counts[:,np.newaxis]
+    return averages[:,:3], averages[:,3:]
+
+### @brief Find the largest plane in a set of points using RANSAC
+### @param points - Nx3 array of positions [m]
+### @param max_iter - number of plane hypotheses to try
+### @param dist_thresh - max distance [m] from the plane for a point to be considered part of it
+### @param rng - np.random.RandomState used to pick the hypotheses; None to use a new unseeded one
+### @param optimize - True to refit the best plane to its inliers with least squares
+### @return <array> - boolean mask of length N that is True for the points on the plane
+### @details - every hypothesis is built and scored at once; the scoring is split into chunks so that the
+###            point-to-plane distance matrix stays small
+def segment_plane(points, max_iter, dist_thresh, rng=None, optimize=True):
+    num_points = len(points)
+    if num_points < 3 or max_iter < 1:
+        return np.zeros(num_points, dtype=bool)
+    if rng is None:
+        rng = np.random.RandomState()
+    samples = rng.randint(0, num_points, size=(max_iter, 3))
+    p0, p1, p2 = points[samples[:,0]], points[samples[:,1]], points[samples[:,2]]
+    normals = np.cross(p1 - p0, p2 - p0)
+    norms = np.linalg.norm(normals, axis=1)
+    valid = norms > 1e-12
+    if not np.any(valid):
+        return np.zeros(num_points, dtype=bool)
+    normals = normals[valid] / norms[valid,np.newaxis]
+    offsets = -np.einsum("ij,ij->i", normals, p0[valid])
+
+    best_count, best_indx = -1, 0
+    chunk_size = max(1, int(4e6 // num_points))
+    for start in range(0, len(normals), chunk_size):
+        dist = np.abs(np.dot(points, normals[start:start + chunk_size].T) + offsets[start:start + chunk_size])
+        counts = np.count_nonzero(dist <= dist_thresh, axis=0)
+        indx = np.argmax(counts)
+        if counts[indx] > best_count:
+            best_count, best_indx = counts[indx], start + indx
+    normal, offset = normals[best_indx], offsets[best_indx]
+    inliers = np.abs(np.dot(points, normal) + offset) <= dist_thresh
+
+    if optimize and np.count_nonzero(inliers) >= 3:
+        centroid = points[inliers].mean(axis=0)
+        normal = np.linalg.svd(points[inliers] - centroid, full_matrices=False)[2][2]
+        inliers = np.abs(np.dot(points - centroid, normal)) <= dist_thresh
+    return inliers
+
+### @brief Find every pair of points within a given distance of each other
+### @param points - Nx3 array of positions [m]
+### @param radius - max distance [m] between the points of a pair
+### @return i, j - index arrays such that points 'i[k]' and 'j[k]' are neighbors; each pair shows up in both orders
+###                and a point is never paired with itself
+### @details - points are binned into a grid of cubic cells with an edge length of 'radius' so that only the
+###            points in the 27 cells around each point need to be checked
+def radius_neighbors(points, radius):
+    num_points = len(points)
+    if num_points == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    cells = np.floor(points / radius).astype(np.int64)
+    cells -= cells.min(axis=0) - 1                                              # leave an empty cell on each side so neighboring keys don't wrap around
+    dims = cells.max(axis=0) + 2
+    keys = cells[:,0] + dims[0] * (cells[:,1] + dims[1] * cells[:,2])
+    order = np.argsort(keys, kind="mergesort")
+    sorted_keys = keys[order]
+    all_i, all_j = [], []
+    for dz in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                neighbor_keys = keys + dx + dims[0] * (dy + dims[1] * dz)
+                start = np.searchsorted(sorted_keys, neighbor_keys, side="left")
+                counts = np.searchsorted(sorted_keys, neighbor_keys, side="right") - start
+                total = counts.sum()
+                if total == 0: continue
+                i = np.repeat(np.arange(num_points), counts)
+                run_offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                j = order[np.repeat(start, counts) + run_offsets]
+                keep = (i != j) & (np.sum((points[i] - points[j]) ** 2, axis=1) <= radius * radius)
+                all_i.append(i[keep])
+                all_j.append(j[keep])
+    if len(all_i) == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    return np.concatenate(all_i), np.concatenate(all_j)
+
+### @brief Get a mask of the points with enough neighbors within a radius
+### @param points - Nx3 array of positions [m]
+### @param radius - search radius [m]
+### @param min_neighbors - min number of other points within 'radius' for a point to be kept
+### @return <array> - boolean mask of length N
+def radius_outlier_removal(points, radius, min_neighbors):
+    i, j = radius_neighbors(points, radius)
+    return np.bincount(i, minlength=len(points)) >= min_neighbors
+
+### @brief Group points into clusters such that points within 'tolerance' of each other share a cluster
+### @param points - Nx3 array of positions [m]
+### @param tolerance - max distance [m] between neighboring points of a cluster
+### @param min_size - min number of points in a cluster
+### @param max_size - max number of points in a cluster
+### @return labels, cluster_ids - array of length N with each point's cluster label, and the labels of the clusters
+###                               whose size is within bounds, largest cluster first
+### @details - labels are propagated along the neighbor pairs (taking the smallest label) with pointer jumping until
+###            they settle, which gives the connected components of the neighbor graph
+def euclidean_clusters(points, tolerance, min_size, max_size):
+    num_points = len(points)
+    i, j = radius_neighbors(points, tolerance)
+    labels = np.arange(num_points)
+    while True:
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, i, labels[j])
+        new_labels = new_labels[new_labels]
+        if np.array_equal(new_labels, labels): break
+        labels = new_labels
+    sizes = np.bincount(labels, minlength=num_points)
+    cluster_ids = np.nonzero((sizes >= max(min_size, 1)) & (sizes <= max_size))[0]
+    cluster_ids = cluster_ids[np.argsort(-sizes[cluster_ids], kind="mergesort")]
+    return labels, cluster_ids
+
+### @brief Pure-NumPy version of the perception_pipeline node's filters that runs in the calling process
+### @param params - FilterParamsRequest or dictionary (ex. from a filter parameter YAML file) with the filter settings
+### @param seed - seed for the plane segmentation's random sampling; None for a random seed
+### @details - the stages (crop box, voxel grid, plane segmentation, radius outlier removal, and Euclidean clustering)
+###            match the ones in the node so that the same filter parameters can be used; this can be used on a live
+###            pointcloud topic or on recorded pointclouds
+class PointCloudPipeline(object):
+    def __init__(self, params=None, seed=None):
+        self.params = FilterParamsRequest()
+        self.rng = np.random.RandomState(seed)
+        self.stage_sizes = {}                                                   # Number of points left after each stage of the last run
+        self.stage_times = {}                                                   # Time [sec] each stage of the last run took
+        if params is not None:
+            self.set_params(params)
+
+    ### @brief Set the filter parameters
+    ### @param params - FilterParamsRequest or dictionary with any of its fields
+    def set_params(self, params):
+        if isinstance(params, dict):
+            for name, value in params.items():
+                setattr(self.params, name, value)
+        else:
+            for name in FilterParamsRequest.__slots__:
+                setattr(self.params, name, getattr(params, name))
+
+    ### @brief Get the positions and colors of the points left after every filter (i.e. the points on the objects)
+    ### @param msg - ROS PointCloud2 message
+    ### @return points, colors - Nx3 arrays (see 'get_points_and_colors'); empty if a stage removed every point
+    def filter(self, msg):
+        p = self.params
+        self.stage_sizes = {}
+        self.stage_times = {}
+        time_start = default_timer()
+        points, colors = get_points_and_colors(pointcloud2_to_array(msg))
+        time_start = self.end_stage("raw", len(points), time_start)
+        empty = (np.zeros((0, 3)), np.zeros((0, 3)))
+
+        mask = crop_box(points, [p.x_filter_min, p.y_filter_min, p.z_filter_min], [p.x_filter_max, p.y_filter_max, p.z_filter_max])
+        points, colors = points[mask], colors[mask]
+        time_start = self.end_stage("cropped", len(points), time_start)
+        if len(points) == 0: return empty
+
+        points, colors = voxel_downsample(points, colors, p.voxel_leaf_size)
+        time_start = self.end_stage("downsampled", len(points), time_start)
+        if len(points) < 4: return empty
+
+        mask = ~segment_plane(points, p.plane_max_iter, p.plane_dist_thresh, self.rng)
+        points, colors = points[mask], colors[mask]
+        time_start = self.end_stage("no_plane", len(points), time_start)
+        if len(points) == 0: return empty
+
+        mask = radius_outlier_removal(points, p.ror_radius_search, p.ror_min_neighbors)
+        points, colors = points[mask], colors[mask]
+        self.end_stage("no_noise", len(points), time_start)
+        return points, colors
+
+    ### @brief Records the size and runtime of a stage
+    ### @param name - name of the stage
+    ### @param size - number of points (or clusters) left after the stage
+    ### @param time_start - time [sec] (from 'default_timer') at which the stage started
+    ### @return <float> - the current time [sec], at which the next stage starts
+    def end_stage(self, name, size, time_start):
+        time_now = default_timer()
+        self.stage_sizes[name] = size
+        self.stage_times[name] = time_now - time_start
+        return time_now
+
+    ### @brief Run every stage of the pipeline on a pointcloud
+    ### @param msg - ROS PointCloud2 message
+    ### @return clusters - list of ClusterInfo messages (largest cluster first), as returned by the node's 'get_cluster_positions' service
+    def process(self, msg):
+        points, colors = self.filter(msg)
+        if len(points) == 0:
+            return []
+        p = self.params
+        time_start = default_timer()
+        labels, cluster_ids = euclidean_clusters(points, p.cluster_tol, p.cluster_min_size, p.cluster_max_size)
+        if len(cluster_ids) == 0:
+            self.end_stage("clusters", 0, time_start)
+            return []
+
+        # Compute the centroid and average color of each cluster, and find its point with the min 'z' value
+        # (assumed to be at the top of the cluster)
+        counts = np.bincount(labels, minlength=len(points)).astype(float)
+        data = np.hstack((points, colors))
+        averages = np.zeros((len(cluster_ids), 6))
+        for col in range(6):
+            averages[:,col] = np.bincount(labels, weights=data[:,col], minlength=len(points))[cluster_ids] / counts[cluster_ids]
+        order = np.lexsort((points[:,2], labels))
+        first = np.searchsorted(labels[order], cluster_ids)
+        min_z_points = points[order[first]]
+
+        # Compute the covariance of each cluster's points (as E[ab] - E[a]E[b]) for the orientation estimate
+        covariances = np.zeros((len(cluster_ids), 6))
+        for col, (a, b) in enumerate([(0, 0), (0, 1), (0, 2), (1, 1), (1, 2), (2, 2)]):
+            products = np.bincount(labels, weights=points[:,a] * points[:,b], minlength=len(points))[cluster_ids] / counts[cluster_ids]
+            covariances[:,col] = products - averages[:,a] * averages[:,b]
+
+        clusters = []
+        for indx, cluster_id in enumerate(cluster_ids):
+            cluster = ClusterInfo()
+            cluster.frame_id = msg.header.frame_id
+            cluster.position.x, cluster.position.y, cluster.position.z = averages[indx,:3]
+            cluster.color.r, cluster.color.g, cluster.color.b = averages[indx,3:]
+            cluster.min_z_point.x, cluster.min_z_point.y, cluster.min_z_point.z = min_z_points[indx]
+            cluster.num_points = int(counts[cluster_id])
+            cluster.covariance = covariances[indx].tolist()
+            clusters.append(cluster)
+        self.end_stage("clusters", len(clusters), time_start)
+        return clusters
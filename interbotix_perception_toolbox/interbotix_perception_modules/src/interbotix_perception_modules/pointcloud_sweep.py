@@ -0,0 +1,253 @@
+import yaml
+import itertools
+import collections
+import multiprocessing
+import numpy as np
+from timeit import default_timer
+from interbotix_perception_modules.pointcloud_pipeline import PointCloudPipeline
+
+# Stages of PointCloudPipeline in the order they run
+STAGES = ["raw", "cropped", "downsampled", "no_plane", "no_noise", "clusters"]
+
+# Filter parameters that must be integers
+INT_PARAMS = ["plane_max_iter", "ror_min_neighbors", "cluster_min_size", "cluster_max_size"]
+
+# Pointclouds replayed by each worker process (set by 'init_worker')
+worker_clouds = []
+
+### @brief Load the pointclouds recorded in a rosbag
+### @param bag_path - path to the rosbag file
+### @param topic - topic on which the PointCloud2 messages were recorded
+### @param max_clouds - max number of pointclouds to load (starting from the first one); None to load all of them
+### @return clouds - list of PointCloud2 messages
+def load_pointclouds(bag_path, topic, max_clouds=None):
+    import rosbag
+    clouds = []
+    with rosbag.Bag(bag_path, "r") as bag:
+        for _, msg, _ in bag.read_messages(topics=[topic]):
+            clouds.append(msg)
+            if max_clouds is not None and len(clouds) >= max_clouds:
+                break
+    return clouds
+
+### @brief Load the filter parameters from a YAML file (like the ones written by 'save_params')
+### @param filepath - path to the YAML file
+### @return param_dict - dictionary of the filter parameters
+def load_param_file(filepath):
+    with open(filepath, "r") as yamlfile:
+        return yaml.safe_load(yamlfile)
+
+### @brief Build every combination of a grid of filter parameter values
+### @param base_params - dictionary with every filter parameter; used for the parameters not in 'grid'
+### @param grid - dictionary mapping parameter names to lists of values to try
+### @return param_sets - list of (grid_values, param_dict) tuples where 'grid_values' holds the value of each parameter in 'grid'
+def make_param_grid(base_params, grid):
+    names = sorted(grid.keys())
+    param_sets = []
+    for values in itertools.product(*[grid[name] for name in names]):
+        grid_values = collections.OrderedDict(zip(names, values))
+        param_dict = dict(base_params)
+        param_dict.update(grid_values)
+        for name in INT_PARAMS:
+            param_dict[name] = int(param_dict[name])
+        param_sets.append((grid_values, param_dict))
+    return param_sets
+
+### @brief Stores the pointclouds that a worker process replays
+### @param clouds - list of PointCloud2 messages
+def init_worker(clouds):
+    global worker_clouds
+    worker_clouds = clouds
+
+### @brief Summarize the cluster counts and timings of replaying every pointcloud with one set of filter parameters
+### @param param_set - (grid_values, param_dict) tuple from 'make_param_grid'
+### @param cluster_counts - number of clusters found in each pointcloud
+### @param total_times - time [sec] it took to process each pointcloud
+### @param stage_times - array with one row per pointcloud and one column per stage in STAGES of the time [sec] each stage
+###                      took; None if the per-stage times aren't known
+### @param expected_clusters - number of objects in the recorded scene; None if unknown
+### @return result - dictionary with the 'grid_values' and 'params' that were used, the most common number of clusters
+###                  ('num_clusters'), the fraction of pointclouds that gave 'expected_clusters' clusters (or the most
+###                  common number if None) ('stability'), the mean and max time [sec] to process a pointcloud
+###                  ('mean_time' and 'max_time'), and the mean time [sec] of each stage ('stage_times'; None if unknown)
+def summarize_run(param_set, cluster_counts, total_times, stage_times=None, expected_clusters=None):
+    grid_values, param_dict = param_set
+    counts = np.bincount(cluster_counts) if len(cluster_counts) > 0 else np.zeros(1, dtype=int)
+    num_clusters = int(np.argmax(counts))
+    target = num_clusters if expected_clusters is None else expected_clusters
+    if stage_times is not None:
+        stage_times = collections.OrderedDict(zip(STAGES, stage_times.mean(axis=0) if len(total_times) > 0 else np.zeros(len(STAGES))))
+    return {
+        "grid_values" : grid_values,
+        "params" : param_dict,
+        "num_clusters" : num_clusters,
+        "stability" : float(counts[target]) / max(1, len(cluster_counts)) if target < len(counts) else 0.0,
+        "mean_time" : float(np.mean(total_times)) if len(total_times) > 0 else 0.0,
+        "max_time" : float(np.max(total_times)) if len(total_times) > 0 else 0.0,
+        "stage_times" : stage_times,
+    }
+
+### @brief Replay every pointcloud through the NumPy pipeline with one set of filter parameters
+### @param param_set - (grid_values, param_dict) tuple from 'make_param_grid'
+### @param expected_clusters - number of objects in the recorded scene; None if unknown
+### @param seed - seed for the plane segmentation so that results can be reproduced
+### @return result - see 'summarize_run'
+### @details - the pointclouds are the ones passed to 'init_worker'; note that this measures the NumPy PointCloudPipeline,
+###            whose plane segmentation and neighbor search differ from the PCL ones in the perception_pipeline node
+def evaluate_params(param_set, expected_clusters=None, seed=0):
+    grid_values, param_dict = param_set
+    pipeline = PointCloudPipeline(param_dict, seed)
+    cluster_counts, total_times = [], []
+    stage_times = np.zeros((len(worker_clouds), len(STAGES)))
+    for indx, cloud in enumerate(worker_clouds):
+        cluster_counts.append(len(pipeline.process(cloud)))
+        stage_times[indx] = [pipeline.stage_times.get(stage, 0.0) for stage in STAGES]
+        total_times.append(stage_times[indx].sum())
+    return summarize_run(param_set, cluster_counts, total_times, stage_times, expected_clusters)
+
+### @brief Wrapper around 'evaluate_params' that takes one tuple (for Pool.imap_unordered)
+### @param args - (param_set, expected_clusters, seed) tuple
+### @return result - see 'evaluate_params'
+def evaluate_params_star(args):
+    return evaluate_params(*args)
+
+### @brief Replay recorded pointclouds through the NumPy pipeline for every combination of a grid of filter parameters
+### @param clouds - list of PointCloud2 messages (ex. from 'load_pointclouds')
+### @param base_params - dictionary with every filter parameter; used for the parameters not in 'grid'
+### @param grid - dictionary mapping parameter names to lists of values to try
+### @param expected_clusters - number of objects in the recorded scene; None to rate stability against the most common cluster count
+### @param processes - number of worker processes; None to use one per core
+### @param seed - seed for the plane segmentation so that results can be reproduced
+### @return results - list of results (see 'evaluate_params') ranked best first: parameter sets that find clusters come first,
+###                   then the most stable ones, then the fastest ones
+### @details - each worker process gets its own copy of the pointclouds when the pool starts; the results describe the
+###            NumPy PointCloudPipeline, so use 'sweep_node' to rank parameters by how the deployed C++ node behaves
+def sweep(clouds, base_params, grid, expected_clusters=None, processes=None, seed=0):
+    tasks = [(param_set, expected_clusters, seed) for param_set in make_param_grid(base_params, grid)]
+    pool = multiprocessing.Pool(processes, initializer=init_worker, initargs=(clouds,))
+    try:
+        results = list(pool.imap_unordered(evaluate_params_star, tasks))
+    finally:
+        pool.close()
+        pool.join()
+    results.sort(key=lambda result : (result["num_clusters"] == 0, -result["stability"], result["mean_time"]))
+    return results
+
+### @brief Sends recorded pointclouds to a running perception_pipeline node and waits for the clusters it publishes
+### @param filter_ns - namespace of the perception_pipeline node (ex. 'pc_filter')
+### @param timeout - max time [sec] to wait for the clusters of a pointcloud
+### @details - the pointclouds are published on the topic the node subscribes to (its '~cloud_topic' parameter), so nothing
+###            else (like a camera) should be publishing on it; the node's continuous pipeline is enabled so that every
+###            pointcloud is processed as it arrives
+class NodeReplayer(object):
+    def __init__(self, filter_ns, timeout=5.0):
+        import rospy
+        import threading
+        from sensor_msgs.msg import PointCloud2
+        from std_srvs.srv import SetBool
+        from interbotix_perception_modules.msg import ClusterInfoList
+        from interbotix_perception_modules.srv import FilterParams
+        self.rospy = rospy
+        self.timeout = timeout
+        self.cluster_list = None
+        self.cluster_list_cv = threading.Condition()
+        filter_ns = "/" + filter_ns.strip("/")
+        cloud_topic = rospy.get_param(filter_ns + "/perception_pipeline/cloud_topic", "camera/depth/color/points")
+        if not cloud_topic.startswith("/"):
+            cloud_topic = filter_ns + "/" + cloud_topic
+        rospy.wait_for_service(filter_ns + "/set_filter_params")
+        rospy.wait_for_service(filter_ns + "/enable_pipeline")
+        self.srv_set_filter_params = rospy.ServiceProxy(filter_ns + "/set_filter_params", FilterParams)
+        rospy.ServiceProxy(filter_ns + "/enable_pipeline", SetBool)(True)
+        self.sub_clusters = rospy.Subscriber(filter_ns + "/clusters", ClusterInfoList, self.cluster_list_cb)
+        self.pub_cloud = rospy.Publisher(cloud_topic, PointCloud2, queue_size=1)
+        while self.pub_cloud.get_num_connections() == 0 and not rospy.is_shutdown():
+            rospy.sleep(0.1)
+
+    ### @brief ROS Subscriber Callback function to get the clusters the node found in a pointcloud
+    ### @param msg - ClusterInfoList message stamped with the header of its pointcloud
+    def cluster_list_cb(self, msg):
+        with self.cluster_list_cv:
+            self.cluster_list = msg
+            self.cluster_list_cv.notify_all()
+
+    ### @brief Send one pointcloud to the node and wait for its clusters
+    ### @param cloud - PointCloud2 message
+    ### @return num_clusters, latency - number of clusters found and time [sec] from publishing the pointcloud to receiving
+    ###                                 its clusters; None, None if the clusters didn't arrive within 'timeout'
+    def process(self, cloud):
+        with self.cluster_list_cv:
+            self.cluster_list = None
+        time_start = default_timer()
+        self.pub_cloud.publish(cloud)
+        with self.cluster_list_cv:
+            while (self.cluster_list is None or self.cluster_list.header.stamp != cloud.header.stamp):
+                remaining = self.timeout - (default_timer() - time_start)
+                if remaining <= 0 or self.rospy.is_shutdown():
+                    return None, None
+                self.cluster_list_cv.wait(min(remaining, 0.1))
+            return len(self.cluster_list.clusters), default_timer() - time_start
+
+### @brief Replay recorded pointclouds through a running perception_pipeline node for every combination of a grid of filter parameters
+### @param clouds - list of PointCloud2 messages (ex. from 'load_pointclouds')
+### @param base_params - dictionary with every filter parameter; used for the parameters not in 'grid'
+### @param grid - dictionary mapping parameter names to lists of values to try
+### @param filter_ns - namespace of the perception_pipeline node (ex. 'pc_filter')
+### @param expected_clusters - number of objects in the recorded scene; None to rate stability against the most common cluster count
+### @param timeout - max time [sec] to wait for the clusters of a pointcloud; pointclouds that time out are left out of the results
+### @return results - list of results (see 'summarize_run') ranked the same way as in 'sweep'; 'stage_times' is None since the
+###                   node doesn't report them, and the times include sending the pointcloud to the node and its clusters back
+### @details - must be called from a ROS node; the parameter sets run one after the other since there's only one node
+def sweep_node(clouds, base_params, grid, filter_ns, expected_clusters=None, timeout=5.0):
+    from interbotix_perception_modules.srv import FilterParamsRequest
+    replayer = NodeReplayer(filter_ns, timeout)
+    results = []
+    for param_set in make_param_grid(base_params, grid):
+        request = FilterParamsRequest()
+        for name, value in param_set[1].items():
+            if name in FilterParamsRequest.__slots__:
+                setattr(request, name, value)
+        replayer.srv_set_filter_params(request)
+        cluster_counts, total_times = [], []
+        for cloud in clouds:
+            num_clusters, latency = replayer.process(cloud)
+            if num_clusters is None: continue
+            cluster_counts.append(num_clusters)
+            total_times.append(latency)
+        if len(cluster_counts) < len(clouds):
+            replayer.rospy.logwarn("%d of %d pointclouds timed out with %s." % (len(clouds) - len(cluster_counts), len(clouds), dict(param_set[0])))
+        results.append(summarize_run(param_set, cluster_counts, total_times, None, expected_clusters))
+    results.sort(key=lambda result : (result["num_clusters"] == 0, -result["stability"], result["mean_time"]))
+    return results
+
+### @brief Format sweep results as a text table
+### @param results - list of results returned by 'sweep' or 'sweep_node'
+### @param top - number of results to include; None to include all of them
+### @param source - name of what processed the pointclouds; shown in the title so the timings aren't mistaken for another pipeline's
+### @return table - string with a title and one row per result showing its rank, the grid values, stability, cluster count, and mean times [ms]
+def format_results(results, top=None, source="NumPy PointCloudPipeline"):
+    results = results[:top] if top is not None else results
+    if len(results) == 0:
+        return "No results"
+    names = list(results[0]["grid_values"].keys())
+    stages = STAGES if results[0]["stage_times"] is not None else []
+    header = ["rank"] + names + ["stability", "clusters", "mean [ms]", "max [ms]"] + [stage + " [ms]" for stage in stages]
+    rows = []
+    for rank, result in enumerate(results, 1):
+        row = [str(rank)] + ["%g" % result["grid_values"][name] for name in names]
+        row += ["%.2f" % result["stability"], str(result["num_clusters"]), "%.1f" % (result["mean_time"] * 1000), "%.1f" % (result["max_time"] * 1000)]
+        row += ["%.1f" % (result["stage_times"][stage] * 1000) for stage in stages]
+        rows.append(row)
+    widths = [max(len(row[col]) for row in [header] + rows) for col in range(len(header))]
+    lines = ["Results measured with the " + source + ":"]
+    lines += ["  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in [header] + rows]
+    return "\n".join(lines)
+
+### @brief Save the filter parameters of a result to a YAML file that can be loaded with 'load_params'
+### @param result - one of the results returned by 'sweep'
+### @param filepath - YAML file to write
+### @details - this writes the same format as InterbotixPointCloudInterface.save_params; on a running system,
+###            'set_params(result["params"])' followed by 'save_params()' does the same thing
+def save_result_params(result, filepath):
+    with open(filepath, "w") as yamlfile:
+        yaml.dump(dict(result["params"]), yamlfile, default_flow_style=False)
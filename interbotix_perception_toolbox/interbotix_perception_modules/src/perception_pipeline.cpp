@@ -14,15 +14,17 @@
 #include <pcl/segmentation/extract_clusters.h>
 #include <pcl/kdtree/kdtree.h>
 #include <pcl/common/common.h>
+#include <pcl/common/centroid.h>
 #include <pcl/common/transforms.h>
 #include <pcl_conversions/pcl_conversions.h>
 #include "interbotix_perception_modules/FilterParams.h"
 #include "interbotix_perception_modules/ClusterInfo.h"
+#include "interbotix_perception_modules/ClusterInfoList.h"
 #include "interbotix_perception_modules/ClusterInfoArray.h"
 
 typedef pcl::PointXYZRGB PointT;
 
-ros::Publisher pub_pc_obj, pub_pc_filter, pub_marker_obj, pub_marker_crop;
+ros::Publisher pub_pc_obj, pub_pc_filter, pub_marker_obj, pub_marker_crop, pub_clusters;
 visualization_msgs::Marker marker_obj, marker_crop;
 sensor_msgs::PointCloud2ConstPtr input;
 std::vector<interbotix_perception_modules::ClusterInfo> cluster_info_vector;
@@ -34,7 +36,7 @@ float voxel_leaf_size, plane_dist_thresh, ror_radius_search, cluster_tol;
 int plane_max_iter, ror_min_neighbors, cluster_min_size, cluster_max_size;
 
 // @brief Processes the raw pointcloud and finds the centroids of every cluster
-void perception_pipeline()
+void find_clusters()
 {
   // Convert to pcl point cloud
   pcl::PointCloud<PointT>::Ptr cloud_raw(new pcl::PointCloud<PointT>);
@@ -125,7 +127,6 @@ void perception_pipeline()
   ec.extract(cluster_indices);
 
   int j = 0;
-  cluster_info_vector.clear();
   for (std::vector<pcl::PointIndices>::const_iterator it = cluster_indices.begin(); it != cluster_indices.end(); ++it)
   {
     pcl::PointCloud<PointT>::Ptr cloud_cluster(new pcl::PointCloud<PointT>);
@@ -172,11 +173,39 @@ void perception_pipeline()
     ci_msg.min_z_point.y = min_point.y;
     ci_msg.min_z_point.z = min_point.z;
     ci_msg.num_points = cloud_cluster->size();
+
+    // Save the covariance of the cluster's points so that clients can find its orientation (via PCA)
+    // in whatever frame they need it
+    Eigen::Vector4f xyz_centroid;
+    Eigen::Matrix3f covariance;
+    pcl::compute3DCentroid(*cloud_cluster, xyz_centroid);
+    pcl::computeCovarianceMatrixNormalized(*cloud_cluster, xyz_centroid, covariance);
+    ci_msg.covariance[0] = covariance(0, 0);
+    ci_msg.covariance[1] = covariance(0, 1);
+    ci_msg.covariance[2] = covariance(0, 2);
+    ci_msg.covariance[3] = covariance(1, 1);
+    ci_msg.covariance[4] = covariance(1, 2);
+    ci_msg.covariance[5] = covariance(2, 2);
     cluster_info_vector.push_back(ci_msg);
     j++;
   }
 }
 
+// @brief Runs the pipeline on the latest pointcloud and publishes the clusters found
+// @details - an empty list is published if a filter removes every point so that clients can tell
+//            that the objects are gone (instead of keeping the clusters of an older pointcloud)
+void perception_pipeline()
+{
+  cluster_info_vector.clear();
+  find_clusters();
+
+  // Publish the clusters so that clients can consume them continuously instead of polling the service
+  interbotix_perception_modules::ClusterInfoList cluster_list;
+  cluster_list.header = input->header;
+  cluster_list.clusters = cluster_info_vector;
+  pub_clusters.publish(cluster_list);
+}
+
 // @brief ROS Subscriber Callback function to get the latest pointcloud
 // @param pointcloud - ROS PointCloud2 message containing the latest pointcloud
 void cloud_cb(const sensor_msgs::PointCloud2ConstPtr& pointcloud)
@@ -272,6 +301,7 @@ int main(int argc, char** argv)
   pub_pc_filter = nh.advertise<sensor_msgs::PointCloud2>("pointcloud/filtered", 1);
   pub_marker_obj = nh.advertise<visualization_msgs::Marker>("markers/objects", 50);
   pub_marker_crop = nh.advertise<visualization_msgs::Marker>("markers/crop_box", 1);
+  pub_clusters = nh.advertise<interbotix_perception_modules::ClusterInfoList>("clusters", 1);
 
   // Populate the marker object used to show the centroid of each cluster with values that will never be changed
   marker_obj.type = visualization_msgs::Marker::SPHERE;
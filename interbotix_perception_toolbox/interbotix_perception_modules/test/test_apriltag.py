@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+import threading
+import collections
+import unittest
+from io import BytesIO
+
+import rospy
+import rosunit
+
+from apriltag_ros.msg import AprilTagDetection, AprilTagDetectionArray
+from interbotix_perception_modules.srv import PublishPictureResponse
+from interbotix_perception_modules.apriltag import InterbotixAprilTagInterface
+
+## Unit tests for the in-memory detection path of the AprilTag module
+
+PKG = 'interbotix_perception_modules'
+NAME = 'test_apriltag'
+
+def make_interface():
+    """an InterbotixAprilTagInterface with only the state used by 'detect_tags' (no ROS connections)"""
+    apriltag = InterbotixAprilTagInterface.__new__(InterbotixAprilTagInterface)
+    apriltag.detection_timeout = 0.5
+    apriltag.detections = collections.deque(maxlen=10)
+    apriltag.detections_cv = threading.Condition()
+    apriltag.srv_analyze_image = None                                           # the file-based path must not be used
+    return apriltag
+
+def deserialized_response(stamp):
+    """a PublishPictureResponse as a service client receives it"""
+    buff = BytesIO()
+    PublishPictureResponse(success=True, stamp=stamp).serialize(buff)
+    res = PublishPictureResponse()
+    res.deserialize(buff.getvalue())
+    return res
+
+class AprilTagTest(unittest.TestCase):
+    def setUp(self):
+        # use the wall clock so 'rospy.get_time' works without a ROS node
+        rospy.rostime.set_rostime_initialized(True)
+
+    def test_detect_tags_deserialized_stamp(self):
+        """test detect_tags with the stamp of a deserialized PublishPictureResponse"""
+        stamp = rospy.Time(12, 345)
+        res = deserialized_response(stamp)
+        apriltag = make_interface()
+        msg = AprilTagDetectionArray()
+        msg.header.stamp = stamp
+        msg.detections = [AprilTagDetection(id=[5])]
+        apriltag.tag_detections_cb(msg)
+        detections = apriltag.detect_tags(res.stamp)
+        self.assertEqual(
+            [d.id[0] for d in detections.detections], [5],
+            "detect_tags didn't return the detections stamped with the picture's stamp.")
+
+    def test_detect_tags_timeout(self):
+        """test detect_tags when the detections of a picture never arrive"""
+        apriltag = make_interface()
+        detections = apriltag.detect_tags(deserialized_response(rospy.Time(1)).stamp)
+        self.assertEqual(len(detections.detections), 0, "detect_tags should return no detections after timing out.")
+
+
+if __name__ == "__main__":
+    rosunit.unitrun(
+        package=PKG,
+        test_name=NAME,
+        test=AprilTagTest)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+import unittest
+import collections
+
+import numpy as np
+import rosunit
+
+from sensor_msgs.msg import PointCloud2, PointField
+from interbotix_perception_modules import pointcloud_pipeline as pp
+
+## Unit tests for the pure-NumPy pointcloud pipeline
+
+PKG = 'interbotix_perception_modules'
+NAME = 'test_pointcloud_pipeline'
+
+FILTER_PARAMS = {
+    "x_filter_min" : -0.3, "x_filter_max" : 0.3,
+    "y_filter_min" : -0.3, "y_filter_max" : 0.3,
+    "z_filter_min" : 0.2, "z_filter_max" : 0.8,
+    "voxel_leaf_size" : 0.004,
+    "plane_max_iter" : 50, "plane_dist_thresh" : 0.005,
+    "ror_radius_search" : 0.01, "ror_min_neighbors" : 3,
+    "cluster_tol" : 0.02, "cluster_min_size" : 25, "cluster_max_size" : 5000,
+}
+
+def make_cloud(points, colors, width, point_step=20, row_padding=0):
+    """build a PointCloud2 with 'x', 'y', 'z' at offsets 0-8, 'rgb' at offset 16, and padding between points and rows"""
+    points = np.asarray(points, dtype=np.float32)
+    colors = np.asarray(colors, dtype=np.uint32)
+    height = len(points) // width
+    row_step = point_step * width + row_padding
+    data = np.zeros((height, row_step), dtype=np.uint8)
+    pixels = data[:, :point_step * width].reshape(height, width, point_step)
+    pixels[:, :, 0:12] = points.view(np.uint8).reshape(height, width, 12)
+    pixels[:, :, 16:20] = colors.view(np.uint8).reshape(height, width, 4)
+    msg = PointCloud2()
+    msg.header.frame_id = "camera_depth_optical_frame"
+    msg.height, msg.width = height, width
+    msg.fields = [PointField(name, offset, PointField.FLOAT32, 1) for name, offset in [("x", 0), ("y", 4), ("z", 8), ("rgb", 16)]]
+    msg.is_bigendian = False
+    msg.point_step, msg.row_step = point_step, row_step
+    msg.data = data.tobytes()
+    msg.is_dense = False
+    return msg
+
+def brute_force_neighbors(points, radius):
+    """every ordered pair of distinct points within 'radius' of each other"""
+    dists = np.linalg.norm(points[:, np.newaxis] - points[np.newaxis], axis=2)
+    i, j = np.nonzero((dists <= radius) & ~np.eye(len(points), dtype=bool))
+    return set(zip(i.tolist(), j.tolist()))
+
+def bfs_components(points, radius):
+    """connected components of the neighbor graph as a set of frozensets of point indexes"""
+    neighbors = collections.defaultdict(list)
+    for i, j in brute_force_neighbors(points, radius):
+        neighbors[i].append(j)
+    seen, components = set(), set()
+    for start in range(len(points)):
+        if start in seen: continue
+        seen.add(start)
+        component, queue = [start], collections.deque([start])
+        while queue:
+            for j in neighbors[queue.popleft()]:
+                if j not in seen:
+                    seen.add(j)
+                    component.append(j)
+                    queue.append(j)
+        components.add(frozenset(component))
+    return components
+
+class PointCloudPipelineTest(unittest.TestCase):
+    def test_radius_neighbors(self):
+        """test radius_neighbors against a brute-force search"""
+        rng = np.random.RandomState(0)
+        points = rng.uniform(-0.05, 0.05, (500, 3))
+        i, j = pp.radius_neighbors(points, 0.02)
+        self.assertEqual(
+            set(zip(i.tolist(), j.tolist())),
+            brute_force_neighbors(points, 0.02),
+            "radius_neighbors pairs don't match a brute-force search.")
+
+    def test_euclidean_clusters(self):
+        """test euclidean_clusters against a breadth-first search of the neighbor graph"""
+        rng = np.random.RandomState(1)
+        centers = rng.uniform(-0.2, 0.2, (6, 3))
+        points = np.vstack([center + rng.normal(0, 0.01, (60, 3)) for center in centers])
+        labels, cluster_ids = pp.euclidean_clusters(points, 0.015, 1, len(points))
+        components = set(frozenset(np.nonzero(labels == cluster_id)[0].tolist()) for cluster_id in cluster_ids)
+        self.assertEqual(
+            components, bfs_components(points, 0.015),
+            "euclidean_clusters doesn't match the connected components of the neighbor graph.")
+        sizes = [np.count_nonzero(labels == cluster_id) for cluster_id in cluster_ids]
+        self.assertEqual(sizes, sorted(sizes, reverse=True), "Clusters aren't sorted largest first.")
+
+    def test_pointcloud2_to_array(self):
+        """test pointcloud2_to_array on an organized cloud with padding between points and rows"""
+        rng = np.random.RandomState(2)
+        points = rng.uniform(-1, 1, (12, 3)).astype(np.float32)
+        points[5] = np.nan
+        colors = rng.randint(0, 1 << 24, 12).astype(np.uint32)
+        msg = make_cloud(points, colors, width=4, row_padding=8)
+        cloud = pp.pointcloud2_to_array(msg)
+        self.assertEqual(cloud.shape, (3, 4), "Cloud shape is wrong.")
+        np.testing.assert_array_equal(cloud["x"].reshape(-1), points[:, 0])
+        np.testing.assert_array_equal(cloud["z"].reshape(-1), points[:, 2])
+        valid_points, valid_colors = pp.get_points_and_colors(cloud)
+        valid = np.isfinite(points).all(axis=1)
+        np.testing.assert_array_equal(valid_points, points[valid])
+        np.testing.assert_array_equal(valid_colors[:, 0], (colors[valid] >> 16) & 255)
+        np.testing.assert_array_equal(valid_colors[:, 2], colors[valid] & 255)
+
+    def test_process(self):
+        """test the full pipeline on a table with two boxes on it"""
+        rng = np.random.RandomState(3)
+        table = np.c_[rng.uniform(-0.2, 0.2, 20000), rng.uniform(-0.2, 0.2, 20000), 0.5 + rng.normal(0, 0.001, 20000)]
+        red_box = np.c_[rng.uniform(-0.12, -0.08, 3000), rng.uniform(-0.02, 0.02, 3000), rng.uniform(0.45, 0.49, 3000)]
+        green_box = np.c_[rng.uniform(0.08, 0.12, 3000), rng.uniform(0.03, 0.07, 3000), rng.uniform(0.45, 0.49, 3000)]
+        noise = np.c_[rng.uniform(-0.2, 0.2, 20), rng.uniform(-0.2, 0.2, 20), rng.uniform(0.3, 0.45, 20)]
+        points = np.vstack((table, red_box, green_box, noise))
+        colors = np.zeros(len(points), dtype=np.uint32)
+        colors[20000:23000] = 255 << 16
+        colors[23000:26000] = 255 << 8
+        msg = make_cloud(points, colors, width=len(points))
+
+        pipeline = pp.PointCloudPipeline(FILTER_PARAMS, seed=1)
+        clusters = pipeline.process(msg)
+        self.assertEqual(len(clusters), 2, "Expected one cluster per box.")
+        clusters.sort(key=lambda cluster : cluster.position.x)
+        for cluster, center, channel in [(clusters[0], [-0.1, 0.0, 0.47], "r"), (clusters[1], [0.1, 0.05, 0.47], "g")]:
+            np.testing.assert_allclose([cluster.position.x, cluster.position.y, cluster.position.z], center, atol=0.005)
+            self.assertGreater(getattr(cluster.color, channel), 200, "Cluster color is wrong.")
+            self.assertLess(cluster.min_z_point.z, 0.455, "Cluster min_z_point isn't at the top of the box.")
+            self.assertEqual(cluster.frame_id, msg.header.frame_id)
+        self.assertEqual(set(pipeline.stage_sizes.keys()), set(["raw", "cropped", "downsampled", "no_plane", "no_noise", "clusters"]))
+
+
+if __name__ == "__main__":
+    rosunit.unitrun(
+        package=PKG,
+        test_name=NAME,
+        test=PointCloudPipelineTest)
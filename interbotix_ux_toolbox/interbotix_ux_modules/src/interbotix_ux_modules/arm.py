@@ -2,9 +2,9 @@ import math
 import rospy
 import numpy as np
 import modern_robotics as mr
-from urdf_parser_py.urdf import URDF
 from interbotix_ux_modules import mr_descriptions as mrd
 from interbotix_common_modules import angle_manipulation as ang
+from interbotix_common_modules import urdf_cache
 from interbotix_ux_modules.core import InterbotixRobotUXCore
 from interbotix_ux_modules.gripper import InterbotixGripperUXInterface
 
@@ -52,14 +52,13 @@ class InterbotixArmUXInterface(object):
         rospy.loginfo("Complete!")
 
     ### @brief Get joint limit information from the URDF
+    ### @details - the limits are cached on disk so the URDF only needs to be parsed when it changes
     def get_urdf_limits(self):
-        full_rd_name = "/" + self.core.robot_name + "/robot_description"
-        while rospy.has_param(full_rd_name) != True: pass
-        robot_description = URDF.from_parameter_server(key=full_rd_name)
+        extractor = lambda joints: {name : {"lower" : joints[name]["lower"], "upper" : joints[name]["upper"]} for name in self.core.joint_names}
+        limits = urdf_cache.loadURDFParameters(self.core.robot_name, "ux_arm_limits", extractor)
         for joint in self.core.joint_names:
-            joint_object = next((j for j in robot_description.joints if j.name == joint), None)
-            self.limits[joint]["lower"] = joint_object.limit.lower
-            self.limits[joint]["upper"] = joint_object.limit.upper
+            self.limits[joint]["lower"] = limits[joint]["lower"]
+            self.limits[joint]["upper"] = limits[joint]["upper"]
 
     ### @brief Helper function to publish joint positions
     ### @param positions - desired joint positions
@@ -33,6 +33,11 @@ class InterbotixGripperUXInterface(object):
         self.srv_gripper_move = rospy.ServiceProxy("/" + self.core.robot_name + "/gripper_move", GripperMove)
         self.srv_gripper_config = rospy.ServiceProxy("/" + self.core.robot_name + "/gripper_config", GripperConfig)
         self.srv_gripper_state = rospy.ServiceProxy("/" + self.core.robot_name + "/gripper_state", GripperState)
+        self.grasp_state = "idle"                   # Latest grasp outcome - one of 'idle', 'moving', 'holding', 'empty', 'open', 'stalled', or 'error'
+        self.grasp_pulse_tolerance = 10             # Distance [pulses] from the goal within which the gripper is considered to have reached it
+        self.grasp_still_tolerance = 2              # Change [pulses] between two polls below which the gripper is considered stopped
+        self.grasp_settle_time = 0.06               # Time [sec] the gripper must remain stopped before the grasp is considered settled
+        self.grasp_poll_period = 0.02               # Time [sec] between gripper position polls while waiting for the grasp to settle
         self.config(pulse_vel)
         self.move(pulse)
         rospy.loginfo("Initializing InterbotixGripperUXInterface...")
@@ -40,14 +45,55 @@ class InterbotixGripperUXInterface(object):
 
     ### @brief Move gripper
     ### @param pulse - value from 0 (closed) - 850 (open)
-    ### @param delay - number of seconds to wait before returning control to the user
+    ### @param delay - max number of seconds to wait before returning control to the user
+    ### @param wait_for_settle - if True, returns as soon as the fingers stop moving (or 'delay' seconds pass, whichever comes first);
+    ###                          if False, always waits the full 'delay' seconds
     ### @return ret - error code (0 means all's good)
-    def move(self, pulse, delay=1.0):
+    ### @details - the grasp outcome can be retrieved afterwards with 'get_grasp_state'
+    def move(self, pulse, delay=1.0, wait_for_settle=True):
         resp = self.srv_gripper_move(pulse)
-        if (resp.ret != 0): rospy.loginfo(resp.message)
-        rospy.sleep(delay)
+        if (resp.ret != 0):
+            rospy.loginfo(resp.message)
+            self.grasp_state = "error"
+            return resp.ret
+        self.grasp_state = "moving"
+        if wait_for_settle:
+            self.wait_for_grasp(pulse, delay)
+        else:
+            rospy.sleep(delay)
         return resp.ret
 
+    ### @brief Helper function that polls the gripper position until it stops moving
+    ### @param pulse - goal pulse that was commanded to the gripper
+    ### @param timeout - max number of seconds to wait for the gripper to settle
+    ### @details - the Xarm gripper does not report its effort, so a grasp is classified purely by where the fingers stopped:
+    ###            'open' or 'empty' if they reached the goal, 'holding' if they stopped short while closing, and 'stalled' if they stopped short while opening
+    def wait_for_grasp(self, pulse, timeout):
+        time_start = rospy.get_time()
+        stall_start = None
+        prev_pos = None
+        while (rospy.get_time() - time_start < timeout and not rospy.is_shutdown()):
+            resp = self.srv_gripper_state()
+            if (resp.err_code != 0):
+                rospy.loginfo("Error Num: %d" % resp.err_code)
+                self.grasp_state = "error"
+                return
+            curr_pos = resp.curr_pos
+            time_now = rospy.get_time()
+            if (abs(curr_pos - pulse) <= self.grasp_pulse_tolerance):
+                self.grasp_state = "empty" if pulse <= self.grasp_pulse_tolerance else "open"
+                return
+            if (prev_pos is not None and abs(curr_pos - prev_pos) <= self.grasp_still_tolerance):
+                if stall_start is None:
+                    stall_start = time_now
+                elif (time_now - stall_start >= self.grasp_settle_time):
+                    self.grasp_state = "holding" if pulse < curr_pos else "stalled"
+                    return
+            else:
+                stall_start = None
+            prev_pos = curr_pos
+            rospy.sleep(self.grasp_poll_period)
+
     ### @brief Configure gripper speed
     ### @param pulse_vel - value from 1 (slowest) - 5000 (fastest)
     ### @return ret - error code (0 means all's good)
@@ -66,15 +112,29 @@ class InterbotixGripperUXInterface(object):
         return state
 
     ### @brief Opens the gripper
-    ### @param delay - number of seconds to delay before returning control to the user
+    ### @param delay - max number of seconds to delay before returning control to the user
+    ### @param wait_for_settle - if True, returns as soon as the fingers stop moving instead of always waiting 'delay' seconds
     ### @return ret - error code (0 means all's good)
-    def open(self, delay=1.0):
-        ret = self.move(850, delay)
+    def open(self, delay=1.0, wait_for_settle=True):
+        ret = self.move(850, delay, wait_for_settle)
         return ret
 
     ### @brief Closes the gripper
-    ### @param delay - number of seconds to delay before returning control to the user
+    ### @param delay - max number of seconds to delay before returning control to the user
+    ### @param wait_for_settle - if True, returns as soon as the fingers stop moving instead of always waiting 'delay' seconds
     ### @return ret - error code (0 means all's good)
-    def close(self, delay=1.0):
-        ret = self.move(0, delay)
+    def close(self, delay=1.0, wait_for_settle=True):
+        ret = self.move(0, delay, wait_for_settle)
         return ret
+
+    ### @brief Get the outcome of the latest move command
+    ### @return grasp_state - 'moving' if the gripper had not settled when control was returned, 'holding' if it closed on an object,
+    ###                       'empty' if it closed fully on nothing, 'open' if it reached an opening goal, 'stalled' if it stopped short while opening,
+    ###                       'error' if the gripper reported an error, or 'idle' if never commanded
+    def get_grasp_state(self):
+        return self.grasp_state
+
+    ### @brief Check if the gripper is currently holding an object
+    ### @return <bool> - True if the latest move settled on an object; False otherwise
+    def is_holding(self):
+        return self.grasp_state == "holding"
@@ -1,10 +1,10 @@
 import rospy
-import actionlib
-from geometry_msgs.msg import Twist, Vector3, Pose, PoseStamped, Quaternion
+from geometry_msgs.msg import Twist, Vector3, Pose, PoseStamped
 from nav_msgs.msg import Odometry
-from move_base_msgs.msg import MoveBaseAction, MoveBaseGoal
-from tf.transformations import euler_from_quaternion, quaternion_from_euler
+from tf.transformations import euler_from_quaternion
 from irobot_create_msgs.msg import AudioNote, AudioNoteVector, WheelTicks
+from interbotix_xs_modules.odometry import OdometryHistory, move_closed_loop
+from interbotix_xs_modules.navigation import MoveBaseNavigator, create_target_pose
 
 SOUND_END = AudioNoteVector(
     notes=[
@@ -23,23 +23,25 @@ SOUND_END = AudioNoteVector(
 ### @param use_move_base_action - whether or not Move-Base's Action Server should be used instead
 ###        of the Topic interface; set to `True` to make the 'move_to_pose' function block until
 ###        the robot reaches its goal pose
+### @param odom_history_size - number of odometry messages to keep for 'get_odom_at' and
+###        'get_velocity'
 class InterbotixCreate3Interface(object):
     def __init__(
         self,
         robot_name,
         base_joint_states="/wheel_ticks",
         use_move_base_action=False,
+        odom_history_size=1000,
     ):
         self.robot_name = robot_name
         self.odom = Pose()
+        self.odom_history = OdometryHistory(odom_history_size)
         self.wheel_states = WheelTicks()
         self.use_move_base_action = use_move_base_action
+        self.navigator = None
         if (self.use_move_base_action):
-            self.mb_client = actionlib.SimpleActionClient(
-                ns="/" + self.robot_name + "/move_base",
-                ActionSpec=MoveBaseAction,
-            )
-            self.mb_client.wait_for_server()
+            self.navigator = MoveBaseNavigator("/" + self.robot_name + "/move_base")
+            self.mb_client = self.navigator.client
         # ROS Publisher to command twists to the base
         self.pub_base_command = rospy.Publisher(
             name="/mobile_base/cmd_vel",
@@ -85,28 +87,50 @@ class InterbotixCreate3Interface(object):
         # After the duration has passed, publish a zero Twist
         self.pub_base_command.publish(Twist())
 
+    ### @brief Drive the base straight forward or backward by a given distance using odometry
+    ### @param distance - desired distance [m] to drive; negative values drive backward
+    ### @param max_speed - max speed [m/s]
+    ### @param max_accel - max acceleration [m/s^2]
+    ### @param tolerance - distance [m] from the target at which the move is considered done
+    ### @param stall_timeout - time [sec] without making progress after which the move is aborted
+    ### @return <bool> - `True` if the base reached the target distance; `False` if it stalled
+    def move_distance(self, distance, max_speed=0.2, max_accel=0.3, tolerance=0.005, stall_timeout=1.0):
+        return move_closed_loop(
+            self, distance, turn=False, max_speed=max_speed, max_accel=max_accel, min_speed=0.02,
+            tolerance=tolerance, stall_timeout=stall_timeout
+        )
+
+    ### @brief Turn the base in place by a given angle using odometry
+    ### @param angle - desired angle [rad] to turn; positive values turn counterclockwise
+    ### @param max_speed - max angular speed [rad/s]
+    ### @param max_accel - max angular acceleration [rad/s^2]
+    ### @param tolerance - angle [rad] from the target at which the turn is considered done
+    ### @param stall_timeout - time [sec] without making progress after which the turn is aborted
+    ### @return <bool> - `True` if the base turned by the target angle; `False` if it stalled
+    def turn_by(self, angle, max_speed=1.0, max_accel=1.5, tolerance=0.01, stall_timeout=1.0):
+        return move_closed_loop(
+            self, angle, turn=True, max_speed=max_speed, max_accel=max_accel, min_speed=0.1,
+            tolerance=tolerance, stall_timeout=stall_timeout
+        )
+
     ### @brief Move the base to a given pose in a Map (Nav Stack must be enabled!)
     ### @param x - desired 'x' position [m] w.r.t. the map frame that the robot should achieve
     ### @param y - desired 'y' position [m] w.r.t. the map frame that the robot should achieve
     ### @param yaw - desired yaw [rad] w.r.t. the map frame that the robot should achieve
     ### @param wait - whether the function should wait until the base reaches its goal pose before
     ###        returning
+    ### @param timeout - max time [sec] to wait for the base to reach its goal pose before canceling
+    ###        the goal; `None` to wait forever (only applies if 'wait' is `True`)
     ### @return <bool> - whether the robot successfully reached its goal pose (only applies if
     ###        'wait' is `True`)
     ### @details - note that if 'wait' is `False`, the function will always return `True`.
-    def move_to_pose(self, x, y, yaw, wait=False):
-        target_pose = PoseStamped()
-        target_pose.header.frame_id = "map"
-        target_pose.header.stamp = rospy.Time.now()
-        target_pose.pose.position.x = x
-        target_pose.pose.position.y = y
-        quat = quaternion_from_euler(0, 0, yaw)
-        target_pose.pose.orientation = Quaternion(quat[0], quat[1], quat[2], quat[3])
+    def move_to_pose(self, x, y, yaw, wait=False, timeout=None):
+        target_pose = create_target_pose(x, y, yaw)
         if (wait and self.use_move_base_action):
-            goal = MoveBaseGoal(target_pose)
-            self.mb_client.send_goal(goal)
-            self.mb_client.wait_for_result()
-            if not (self.mb_client.get_state() == actionlib.GoalStatus.SUCCEEDED):
+            goal = self.navigator.send(target_pose)
+            if not goal.wait(timeout):
+                if not goal.done():
+                    goal.cancel()
                 rospy.logerr("Did not successfully reach goal...")
                 return False
         else:
@@ -114,6 +138,33 @@ class InterbotixCreate3Interface(object):
         self.command_audio_vector(SOUND_END)
         return True
 
+    ### @brief Move the base to a given pose in a Map without blocking (Nav Stack must be enabled!)
+    ### @param x - desired 'x' position [m] w.r.t. the map frame that the robot should achieve
+    ### @param y - desired 'y' position [m] w.r.t. the map frame that the robot should achieve
+    ### @param yaw - desired yaw [rad] w.r.t. the map frame that the robot should achieve
+    ### @param queue - `True` to start moving to this pose once the previously sent poses are
+    ###        reached; `False` to preempt them
+    ### @return goal - MoveBaseGoalHandle that can be used to wait for, cancel, or get the progress
+    ###         (distance remaining, ETA) of the goal
+    ### @details - uses Move-Base's Action Server even if 'use_move_base_action' is `False`
+    def move_to_pose_async(self, x, y, yaw, queue=False):
+        if self.navigator is None:
+            self.navigator = MoveBaseNavigator("/" + self.robot_name + "/move_base")
+        goal = self.navigator.send(create_target_pose(x, y, yaw), queue)
+        goal.add_done_callback(self.move_to_pose_done_cb)
+        return goal
+
+    ### @brief Callback for when a goal sent with 'move_to_pose_async' finishes
+    ### @param goal - MoveBaseGoalHandle that finished
+    def move_to_pose_done_cb(self, goal):
+        if goal.state == "succeeded":
+            self.command_audio_vector(SOUND_END)
+
+    ### @brief Cancel every pose sent with 'move_to_pose_async' that hasn't been reached yet
+    def cancel_move_to_pose(self):
+        if self.navigator is not None:
+            self.navigator.cancel_all()
+
     ### @brief Commands a Twist message to the base
     ### @param x - desired speed [m/s] in the 'x' direction (forward/backward)
     ### @param yaw - desired angular speed [rad/s] around the 'z' axis
@@ -140,6 +191,7 @@ class InterbotixCreate3Interface(object):
     ### @param msg - ROS Odometry message from the base
     def base_odom_cb(self, msg):
         self.odom = msg.pose.pose
+        self.odom_history.add_odometry(msg)
 
     ### @brief ROS Callback function get get the wheel joint states
     ### @param msg - WheelTicks message from base
@@ -157,6 +209,23 @@ class InterbotixCreate3Interface(object):
         )
         return [self.odom.position.x, self.odom.position.y, euler_from_quaternion(quat)[2]]
 
+    ### Get the 2D pose of the robot w.r.t. the robot 'odom' frame at a given time
+    ### @param t - time of interest as a rospy.Time or in seconds (ex. the stamp of a camera image)
+    ### @param max_extrapolation - how far [sec] past the latest odometry message the pose may be
+    ###        extrapolated
+    ### @return pose - list containing the [x, y, yaw] of the robot w.r.t. the odom frame; `None`
+    ###         if 't' is not covered by the odometry history
+    def get_odom_at(self, t, max_extrapolation=0.1):
+        if hasattr(t, "to_sec"): t = t.to_sec()
+        return self.odom_history.get_odom_at(t, max_extrapolation)
+
+    ### Get the velocity of the robot averaged over a recent time window
+    ### @param window - length [sec] of the window ending at the latest odometry message
+    ### @return velocity - list containing the [vx, vy, yaw_rate] of the robot w.r.t. its base
+    ###         frame; `None` if there's not enough odometry yet
+    def get_velocity(self, window=0.2):
+        return self.odom_history.get_velocity(window)
+
     ### Get the current wheel positions
     ### @return <list> - 2 element list containing the wheel positions [rad]
     def get_wheel_states(self):
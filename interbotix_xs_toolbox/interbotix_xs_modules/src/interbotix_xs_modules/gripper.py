@@ -1,4 +1,5 @@
 import rospy
+import threading
 from interbotix_xs_msgs.msg import JointSingleCommand
 from interbotix_xs_modules.core import InterbotixRobotXSCore
 
@@ -37,34 +38,86 @@ class InterbotixGripperXSInterface(object):
         self.left_finger_index = self.core.js_index_map[gripper_info.joint_names[0]]
         self.left_finger_lower_limit = gripper_info.joint_lower_limits[0]
         self.left_finger_upper_limit = gripper_info.joint_upper_limits[0]
+        self.gripper_index = self.core.js_index_map[gripper_name]
+        self.grasp_state = "idle"                                       # Latest grasp outcome - one of 'idle', 'moving', 'contact', 'holding', 'empty', 'open', or 'stalled'
+        self.grasp_settled = threading.Event()                          # Set by the 'gripper_state' timer once the fingers stop moving
+        self.grasp_start_time = 0                                       # ROS time [sec] when the latest open/close command was sent
+        self.grasp_stall_time = None                                    # ROS time [sec] when the gripper was first seen stopped after the latest command
+        self.grasp_velocity_threshold = 0.1                             # Gripper speed [rad/s] below which the fingers are considered stopped
+        self.grasp_effort_threshold = 150                               # Gripper effort magnitude [mA] above which a stopped gripper is considered to be squeezing an object
+        self.grasp_min_time = 0.1                                       # Time [sec] after a command during which stall detection is skipped (lets the motor get up to speed)
+        self.grasp_settle_time = 0.06                                   # Time [sec] the gripper must remain stalled before the grasp is considered settled
         tmr_gripper_state = rospy.Timer(rospy.Duration(0.02), self.gripper_state)
         print("Gripper Name: %s\nGripper Pressure: %d%%" % (gripper_name, gripper_pressure * 100))
         print("Initialized InterbotixGripperXSInterface!\n")
 
     ### @brief ROS Timer Callback function to stop the gripper moving past its limits when in PWM mode
+    ###        and to detect when the fingers have settled on an object (or on nothing at all)
     ### @param event [unused] - Timer event message
     def gripper_state(self, event):
         if (self.gripper_moving):
             with self.core.js_mutex:
                 gripper_pos = self.core.joint_states.position[self.left_finger_index]
+                gripper_vel = self.core.joint_states.velocity[self.gripper_index]
+                gripper_effort = self.core.joint_states.effort[self.gripper_index]
             if ((self.gripper_command.cmd > 0 and gripper_pos >= self.left_finger_upper_limit) or
                 (self.gripper_command.cmd < 0 and gripper_pos <= self.left_finger_lower_limit)):
+                self.grasp_state = "open" if self.gripper_command.cmd > 0 else "empty"
                 self.gripper_command.cmd = 0
                 self.core.pub_single.publish(self.gripper_command)
                 self.gripper_moving = False
+                self.grasp_settled.set()
+            elif (not self.grasp_settled.is_set() and rospy.get_time() - self.grasp_start_time >= self.grasp_min_time):
+                self.update_grasp_state(gripper_vel, gripper_effort)
+
+    ### @brief Helper function to classify the grasp from the gripper's velocity and effort while it is moving
+    ### @param gripper_vel - latest gripper velocity [rad/s]
+    ### @param gripper_effort - latest gripper effort [mA] (the 'joint_states' effort is the motor current, whether in 'pwm' or 'current' mode)
+    ### @details - a stopped gripper first reports 'contact'; if it stays stopped for 'grasp_settle_time' seconds,
+    ###            it settles as 'holding' (closing and squeezing an object) or 'stalled' (anything else); the effort
+    ###            command is left on so that an object stays gripped, and the limit check above keeps running in case it slips out
+    def update_grasp_state(self, gripper_vel, gripper_effort):
+        time_now = rospy.get_time()
+        if (abs(gripper_vel) >= self.grasp_velocity_threshold):
+            self.grasp_stall_time = None
+            self.grasp_state = "moving"
+            return
+        if (self.grasp_stall_time is None):
+            self.grasp_stall_time = time_now
+        if (time_now - self.grasp_stall_time < self.grasp_settle_time):
+            self.grasp_state = "contact"
+            return
+        if (self.gripper_command.cmd < 0 and abs(gripper_effort) >= self.grasp_effort_threshold):
+            self.grasp_state = "holding"
+        else:
+            self.grasp_state = "stalled"
+        self.grasp_settled.set()
 
     ### @brief Helper function used to publish effort commands to the gripper (when in 'pwm' or 'current' mode)
     ### @param effort - effort command to send to the gripper motor
-    ### @param delay - number of seconds to wait before returning control to the user
-    def gripper_controller(self, effort, delay):
+    ### @param delay - max number of seconds to wait before returning control to the user
+    ### @param wait_for_settle - if True, returns as soon as the grasp settles (or 'delay' seconds pass, whichever comes first);
+    ###                          if False, always waits the full 'delay' seconds
+    ### @return grasp_state - grasp outcome when control is returned to the user (see 'get_grasp_state')
+    def gripper_controller(self, effort, delay, wait_for_settle=True):
         self.gripper_command.cmd = effort
         with self.core.js_mutex:
             gripper_pos = self.core.joint_states.position[self.left_finger_index]
         if ((self.gripper_command.cmd > 0 and gripper_pos < self.left_finger_upper_limit) or
             (self.gripper_command.cmd < 0 and gripper_pos > self.left_finger_lower_limit)):
+            self.grasp_settled.clear()
+            self.grasp_stall_time = None
+            self.grasp_start_time = rospy.get_time()
+            self.grasp_state = "moving"
             self.core.pub_single.publish(self.gripper_command)
             self.gripper_moving = True
-            rospy.sleep(delay)
+            if wait_for_settle:
+                self.grasp_settled.wait(delay)
+            else:
+                rospy.sleep(delay)
+        else:
+            self.grasp_state = "empty" if effort < 0 else "open"
+        return self.get_grasp_state()
 
     ### @brief Set the amount of pressure that the gripper should use when grasping an object (when in 'effort' control mode)
     ### @param pressure - a scaling factor from 0 to 1 where the pressure increases as the factor increases
@@ -73,11 +126,39 @@ class InterbotixGripperXSInterface(object):
         (self.gripper_pressure_upper_limit - self.gripper_pressure_lower_limit)
 
     ### @brief Opens the gripper (when in 'pwm' control mode)
-    ### @param delay - number of seconds to delay before returning control to the user
-    def open(self, delay=1.0):
-        self.gripper_controller(self.gripper_value, delay)
+    ### @param delay - max number of seconds to delay before returning control to the user
+    ### @param wait_for_settle - if True, returns as soon as the fingers stop moving instead of always waiting 'delay' seconds
+    ### @return grasp_state - grasp outcome when control is returned to the user (see 'get_grasp_state')
+    def open(self, delay=1.0, wait_for_settle=True):
+        return self.gripper_controller(self.gripper_value, delay, wait_for_settle)
 
     ### @brief Closes the gripper (when in 'pwm' control mode)
-    ### @param delay - number of seconds to delay before returning control to the user
-    def close(self, delay=1.0):
-        self.gripper_controller(-self.gripper_value, delay)
+    ### @param delay - max number of seconds to delay before returning control to the user
+    ### @param wait_for_settle - if True, returns as soon as the fingers stop moving instead of always waiting 'delay' seconds
+    ### @return grasp_state - grasp outcome when control is returned to the user (see 'get_grasp_state')
+    def close(self, delay=1.0, wait_for_settle=True):
+        return self.gripper_controller(-self.gripper_value, delay, wait_for_settle)
+
+    ### @brief Set the thresholds used to detect when a grasp has settled
+    ### @param velocity_threshold - gripper speed [rad/s] below which the fingers are considered stopped
+    ### @param effort_threshold - gripper effort magnitude [mA] above which a stopped gripper is considered to be squeezing an object;
+    ###        this is compared against the 'joint_states' effort (motor current), not the PWM/current command, so it should sit
+    ###        between the current the motor draws when closing freely and when squeezing an object
+    ### @param settle_time - time [sec] the gripper must remain stopped before the grasp is considered settled
+    ### @details - note that if any parameter is not set, it retains the value it was set with previously
+    def set_grasp_thresholds(self, velocity_threshold=None, effort_threshold=None, settle_time=None):
+        if velocity_threshold is not None: self.grasp_velocity_threshold = velocity_threshold
+        if effort_threshold is not None: self.grasp_effort_threshold = effort_threshold
+        if settle_time is not None: self.grasp_settle_time = settle_time
+
+    ### @brief Get the outcome of the latest open/close command
+    ### @return grasp_state - 'moving' while the fingers are traveling, 'contact' when they have just stopped,
+    ###                       'holding' if the gripper closed on an object, 'empty' if it closed fully on nothing,
+    ###                       'open' if it opened fully, 'stalled' if it stopped early without squeezing anything, or 'idle' if never commanded
+    def get_grasp_state(self):
+        return self.grasp_state
+
+    ### @brief Check if the gripper is currently holding an object
+    ### @return <bool> - True if the latest close command settled on an object; False otherwise
+    def is_holding(self):
+        return self.grasp_state == "holding"
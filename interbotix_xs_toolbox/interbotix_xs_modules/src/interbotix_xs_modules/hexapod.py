@@ -1,15 +1,18 @@
 import copy
 import math
+import collections
+import threading
 import rospy
 import tf2_ros
 import numpy as np
-from urdf_parser_py.urdf import URDF
 from interbotix_xs_msgs.msg import *
-from geometry_msgs.msg import PoseStamped, Point
-from tf.transformations import quaternion_from_euler
-from geometry_msgs.msg import TransformStamped, Quaternion
+from geometry_msgs.msg import PoseStamped
+from sensor_msgs.msg import JointState
+from trajectory_msgs.msg import JointTrajectory, JointTrajectoryPoint
+from geometry_msgs.msg import TransformStamped
 from interbotix_xs_modules.core import InterbotixRobotXSCore
 import interbotix_common_modules.angle_manipulation as ang
+import interbotix_common_modules.urdf_cache as urdf_cache
 from interbotix_rpi_modules.neopixels import InterbotixRpiPixelInterface
 
 
@@ -77,76 +80,90 @@ class InterbotixHexapodXSInterface(object):
         self.T_sf = np.identity(4)                                              # Odometry transform specifying the 'base_footprint' frame relative to the 'odom' frame
         self.T_fb = np.identity(4)                                              # Body transform specifying the 'base_link' frame relative to the 'base_footprint' frame
         self.T_bc = {}                                                          # Dictionary containing the static transforms of all six 'coxa_link' frames relative to the 'base_link' frame
+        self.gait_tables = collections.OrderedDict()                            # Cache of precompiled gait cycles (see 'compile_gait')
+        self.gait_table_cache_size = 32                                         # Max number of gait cycles to keep in self.gait_tables
+        self.walk_mutex = threading.Lock()                                      # Mutex protecting the commanded walking velocities shared with the walking thread
+        self.walk_thread = None                                                 # Thread running the continuous walking engine (see 'start_walking'); None when not walking
+        self.walk_stop = False                                                  # Set to True to make the walking thread finish its current gait cycle and exit
+        self.walk_velocity = np.zeros(3)                                        # Commanded [vx (m/s), vy (m/s), yaw_rate (rad/s)] of the 'base_footprint' frame while walking
+        self.walk_strides = np.zeros(3)                                         # Blended [x_stride, y_stride, yaw_stride] currently used by the walking thread
+        self.gait_scheduler = None                                              # GaitScheduler timing the most recent gait loop (see 'get_gait_timing')
+        self.gait_max_stretch = 2.0                                             # Max factor by which a gait loop may slow its step period (and 'mp'/'ap') when steps overrun their deadline
+        self.T_cb = {}                                                          # Dictionary containing the inverses of the transforms in self.T_bc (precomputed since they never change)
+        self.R_bc_legs = np.zeros((6, 3, 3))                                    # Rotation parts of self.T_bc stacked in self.leg_list order (used by the batched kinematics)
+        self.p_bc_legs = np.zeros((6, 3))                                       # Translation parts of self.T_bc stacked in self.leg_list order
+        self.R_cb_legs = np.zeros((6, 3, 3))                                    # Rotation parts of self.T_cb stacked in self.leg_list order
+        self.p_cb_legs = np.zeros((6, 3))                                       # Translation parts of self.T_cb stacked in self.leg_list order
         self.coxa_length = None                                                 # Length [meters] of the coxa_link
         self.femur_length = None                                                # Length [meters] of the femur_link
         self.tibia_length = None                                                # Length [meters] of the tibia_link
         self.femur_offset_angle = None                                          # Offset angle [rad] that makes the tibia_link frame coincident with a line shooting out of the coxa_link frame that's parallel to the ground
         self.tibia_offset_angle = None                                          # Offset angle [rad] that makes the foot_link frame coincident with a line shooting out of the coxa_link frame that's parallel to the ground
         self.get_urdf_info()
-        self.pose = PoseStamped()                                               # ROS PoseStamped message to publish self.T_sf to its own topic
-        self.t_sf = TransformStamped()                                          # ROS Transform that holds self.T_sf and is published to the /tf topic
-        self.t_fb = TransformStamped()                                          # ROS Transform that holds self.T_fb and is published to the /tf topic
-        self.br = tf2_ros.TransformBroadcaster()
-        self.initialize_transforms()
+        self.state_publisher = HexapodStatePublisher(self.core.robot_name)     # Publishes self.T_sf and self.T_fb to the /tf topic and self.T_sf to its own topic
         self.info = self.core.srv_get_info("group", "all")
         self.info_index_map = dict(zip(self.info.joint_names, range(len(self.info.joint_names))))           # Map joint names to their positions in the upper/lower and sleep position arrays
         self.hexapod_command = JointGroupCommand(name="all", cmd=[0] * self.info.num_joints)                # ROS Message to command all 18 joints in the hexapod simultaneously
+        self.leg_joint_indexes = np.array([[self.info_index_map[leg + joint] for joint in ["_coxa", "_femur", "_tibia"]] for leg in self.leg_list])    # 6x3 array mapping each leg's coxa, femur, and tibia joints to their positions in self.hexapod_command
+        self.leg_lower_limits = np.array(self.info.joint_lower_limits)[self.leg_joint_indexes]              # 6x3 array of joint lower limits in the same layout as self.leg_joint_indexes
+        self.leg_upper_limits = np.array(self.info.joint_upper_limits)[self.leg_joint_indexes]              # 6x3 array of joint upper limits in the same layout as self.leg_joint_indexes
         self.initialize_start_pose()
-        self.pub_pose = rospy.Publisher("/" + self.core.robot_name + "/pose", PoseStamped, queue_size=1)    # ROS Publisher to publish self.T_sf as a PoseStamped message
-        tmr_transforms = rospy.Timer(rospy.Duration(0.04), self.publish_states)                             # ROS Timer to publish transforms to the /tf and /odom topics at a fixed rate
+        self.contact_detector = GroundContactDetector(self.core, self.leg_list)                             # Detects when each leg's foot touches the ground while walking in rough terrain
         print("Initialized InterbotixHexapodXSInterface!\n")
 
     ### @brief Parses the URDF and populates the appropriate variables with link information
     def get_urdf_info(self):
-        full_rd_name = '/' + self.core.robot_name + '/robot_description'
-        while rospy.has_param(full_rd_name) != True: pass
-        robot_description = URDF.from_parameter_server(key=full_rd_name)
+        params = urdf_cache.loadURDFParameters(self.core.robot_name, "hexapod_kinematics", self.extract_urdf_info)
+        for x, leg in enumerate(self.leg_list):
+            T_bc = np.array(params["T_bc"][leg])
+            self.T_bc[leg] = T_bc
+            self.T_cb[leg] = ang.transInv(T_bc)
+            self.R_bc_legs[x] = T_bc[:3,:3]
+            self.p_bc_legs[x] = T_bc[:3,3]
+            self.R_cb_legs[x] = self.T_cb[leg][:3,:3]
+            self.p_cb_legs[x] = self.T_cb[leg][:3,3]
+        self.coxa_length = params["coxa_length"]
+        self.femur_offset_angle = params["femur_offset_angle"]
+        self.femur_length = params["femur_length"]
+        self.tibia_offset_angle = params["tibia_offset_angle"]
+        self.tibia_length = params["tibia_length"]
+        self.bottom_height = params["bottom_height"]
+        self.home_height = self.bottom_height + 0.05
 
+    ### @brief Derives the hexapod's kinematic parameters from the URDF's joints
+    ### @param joints - joint table returned by 'urdf_cache.getJointTable'
+    ### @return params - dictionary containing the coxa transforms, link lengths, offset angles, and bottom height
+    ### @details - the result is cached on disk by 'get_urdf_info' so the URDF only needs to be parsed when it changes
+    def extract_urdf_info(self, joints):
+        params = {"T_bc" : {}}
         for leg in self.leg_list:
-            joint_object = next((joint for joint in robot_description.joints if joint.name == (leg + "_coxa")), None)
             T_bc = np.identity(4)
-            T_bc[:3,3] = joint_object.origin.xyz
-            T_bc[:3,:3] = ang.eulerAnglesToRotationMatrix(joint_object.origin.rpy)
-            self.T_bc[leg] = T_bc
+            T_bc[:3,3] = joints[leg + "_coxa"]["xyz"]
+            T_bc[:3,:3] = ang.eulerAnglesToRotationMatrix(joints[leg + "_coxa"]["rpy"])
+            params["T_bc"][leg] = T_bc.tolist()
 
-        femur_joint = next((joint for joint in robot_description.joints if joint.name == "left_front_femur"))
-        self.coxa_length = femur_joint.origin.xyz[0]
+        params["coxa_length"] = joints["left_front_femur"]["xyz"][0]
 
-        tibia_joint = next((joint for joint in robot_description.joints if joint.name == "left_front_tibia"))
-        femur_x = tibia_joint.origin.xyz[0]
-        femur_z = tibia_joint.origin.xyz[2]
-        self.femur_offset_angle = abs(math.atan2(femur_z, femur_x))
-        self.femur_length = math.sqrt(femur_x**2 + femur_z**2)
+        femur_x = joints["left_front_tibia"]["xyz"][0]
+        femur_z = joints["left_front_tibia"]["xyz"][2]
+        params["femur_offset_angle"] = abs(math.atan2(femur_z, femur_x))
+        params["femur_length"] = math.sqrt(femur_x**2 + femur_z**2)
 
-        foot_joint = next((joint for joint in robot_description.joints if joint.name == "left_front_foot"))
-        tibia_x = foot_joint.origin.xyz[0]
-        tibia_z = foot_joint.origin.xyz[2]
-        self.tibia_offset_angle = abs(math.atan2(tibia_z, tibia_x)) - self.femur_offset_angle
-        self.tibia_length = math.sqrt(tibia_x**2 + tibia_z**2)
+        tibia_x = joints["left_front_foot"]["xyz"][0]
+        tibia_z = joints["left_front_foot"]["xyz"][2]
+        params["tibia_offset_angle"] = abs(math.atan2(tibia_z, tibia_x)) - params["femur_offset_angle"]
+        params["tibia_length"] = math.sqrt(tibia_x**2 + tibia_z**2)
 
-        bottom_joint = next((joint for joint in robot_description.joints if joint.name == "base_bottom"))
-        self.bottom_height = abs(bottom_joint.origin.xyz[2])
-        self.home_height = self.bottom_height + 0.05
-
-    ### @brief Initializes the static components of the ROS transforms
-    def initialize_transforms(self):
-        self.pose.header.frame_id = self.core.robot_name + "/odom"
-        self.pose.pose.orientation.w = 1.0
-        self.t_sf.header.frame_id = self.core.robot_name + "/odom"
-        self.t_sf.child_frame_id = self.core.robot_name + "/base_footprint"
-        self.t_sf.transform.rotation.w = 1.0
-        self.t_fb.header.frame_id = self.core.robot_name + "/base_footprint"
-        self.t_fb.child_frame_id = self.core.robot_name + "/base_link"
-        self.t_fb.transform.rotation.w = 1.0
+        params["bottom_height"] = abs(joints["base_bottom"]["xyz"][2])
+        return params
 
     ### @brief Uses forward-kinematics to find the initial foot position for each leg relative to the 'base_footprint' frame
     def initialize_start_pose(self):
         self.T_fb[2,3] = self.bottom_height
-        for leg in self.leg_list:
-            theta_1 = self.info.joint_sleep_positions[self.info_index_map[leg + "_coxa"]]
-            theta_2 = self.info.joint_sleep_positions[self.info_index_map[leg + "_femur"]]
-            theta_3 = self.info.joint_sleep_positions[self.info_index_map[leg + "_tibia"]]
-            self.sleep_foot_points[leg] = self.solve_fk([theta_1, theta_2, theta_3], leg)
+        theta = np.array(self.info.joint_sleep_positions)[self.leg_joint_indexes]
+        points = self.solve_fk_legs(theta)
+        for x, leg in enumerate(self.leg_list):
+            self.sleep_foot_points[leg] = list(points[x])
             self.sleep_height = self.bottom_height - self.sleep_foot_points[leg][2]
             self.sleep_foot_points[leg][2] = 0
         self.home_foot_points = copy.deepcopy(self.sleep_foot_points)
@@ -181,7 +198,7 @@ class InterbotixHexapodXSInterface(object):
     ### @return <list, bool> - 3-element list and boolean specifying the required joint angles and if the function was successful respectively
     def solve_ik(self, p_f, leg, mod_value=0):
         p_b = np.dot(ang.transInv(self.T_fb), np.r_[p_f, 1])
-        p_cf = np.dot(ang.transInv(self.T_bc[leg]), p_b)
+        p_cf = np.dot(self.T_cb[leg], p_b)
         theta_1 = math.atan2(p_cf[1], p_cf[0])
 
         R_cfcm = np.identity(3)
@@ -197,18 +214,60 @@ class InterbotixHexapodXSInterface(object):
         except ValueError:
             return [0, 0, 0], False
 
+    ### @brief Performs forward-kinematics on all six legs at once
+    ### @param theta - 6x3 array specifying the coxa, femur, and tibia joint values for each leg (rows follow self.leg_list)
+    ### @return p_f - 6x3 array specifying each leg's foot point relative to the 'base_footprint' frame
+    def solve_fk_legs(self, theta):
+        theta = np.asarray(theta, dtype=float)
+        femur_angle = theta[:,1] + self.femur_offset_angle
+        tibia_angle = femur_angle + theta[:,2] + self.tibia_offset_angle
+        x = self.coxa_length + self.femur_length * np.cos(femur_angle) + self.tibia_length * np.cos(tibia_angle)
+        z = -self.femur_length * np.sin(femur_angle) - self.tibia_length * np.sin(tibia_angle)
+        p_cf = np.column_stack((np.cos(theta[:,0]) * x, np.sin(theta[:,0]) * x, z))
+        p_b = np.einsum("lij,lj->li", self.R_bc_legs, p_cf) + self.p_bc_legs
+        return np.dot(p_b, self.T_fb[:3,:3].T) + self.T_fb[:3,3]
+
+    ### @brief Performs inverse-kinematics on all six legs at once
+    ### @param p_f - 6x3 array specifying each leg's desired foot position relative to the 'base_footprint' frame (rows follow self.leg_list)
+    ### @param mod_value - relative distance value by which to tighten or widen the hexapod stance [m]
+    ### @return <array, array> - 6x3 array of joint angles and a 6-element boolean array specifying which legs were solved successfully;
+    ###                          rows of legs that could not be solved are set to zero
+    def solve_ik_legs(self, p_f, mod_value=0):
+        T_bf = ang.transInv(self.T_fb)
+        p_b = np.dot(np.asarray(p_f, dtype=float), T_bf[:3,:3].T) + T_bf[:3,3]
+        p_cf = np.einsum("lij,lj->li", self.R_cb_legs, p_b) + self.p_cb_legs
+        theta_1 = np.arctan2(p_cf[:,1], p_cf[:,0])
+        femur_x = np.cos(theta_1) * p_cf[:,0] + np.sin(theta_1) * p_cf[:,1] + mod_value - self.coxa_length
+        femur_z = p_cf[:,2]
+        cos_theta_3 = (femur_x**2 + femur_z**2 - self.femur_length**2 - self.tibia_length**2) / (2 * self.femur_length * self.tibia_length)
+        success = np.abs(cos_theta_3) <= 1.0
+        theta_3 = np.arccos(np.clip(cos_theta_3, -1.0, 1.0))
+        theta_2 = -(np.arctan2(femur_z, femur_x) + np.arctan2(self.tibia_length * np.sin(theta_3), self.femur_length + self.tibia_length * np.cos(theta_3)))
+        theta = np.column_stack((theta_1, theta_2 - self.femur_offset_angle, theta_3 - self.tibia_offset_angle))
+        theta[~success] = 0
+        return theta, success
+
+    ### @brief Checks the joint angles of all six legs against their limits
+    ### @param theta - 6x3 array of joint angles (rows follow self.leg_list)
+    ### @return <array> - 6-element boolean array specifying which legs are within their joint limits
+    def check_leg_limits(self, theta):
+        return np.all((self.leg_lower_limits <= theta) & (theta <= self.leg_upper_limits), axis=1)
+
+    ### @brief Stacks a dictionary of foot points into a 6x3 array following self.leg_list
+    ### @param foot_points - dictionary of [x, y, z] foot points keyed by leg name; defaults to self.foot_points
+    ### @return <array> - 6x3 array of foot points
+    def get_foot_array(self, foot_points=None):
+        if foot_points is None: foot_points = self.foot_points
+        return np.array([foot_points[leg] for leg in self.leg_list], dtype=float)
+
     ### @brief Adjusts the hexapod's stance to be wider or narrower
     ### @param mod_value - relative distance value by which to tighten or widen the hexapod stance [m]
     ### @return <bool> - True if function completed successfully; False otherwise
     def modify_stance(self, mod_value):
-        new_foot_points = {}
-        for leg, point in self.foot_points.items():
-            theta_list, success = self.solve_ik(point, leg, mod_value)
-            if success:
-                new_foot_points[leg] = self.solve_fk(theta_list, leg)
-            else:
-                return False
-        self.foot_points = new_foot_points
+        theta, success = self.solve_ik_legs(self.get_foot_array(), mod_value)
+        if not np.all(success): return False
+        points = self.solve_fk_legs(theta)
+        self.foot_points = {leg : list(points[x]) for x, leg in enumerate(self.leg_list)}
         success = self.move_in_world()
         return success
 
@@ -235,27 +294,19 @@ class InterbotixHexapodXSInterface(object):
     ### @details - Message is future dated by 'moving_time' milliseconds since that's
     ###            the amount of time it takes for the motors to move
     def update_tsf_transform(self, moving_time):
-        self.t_sf.transform.translation.x = self.T_sf[0,3]
-        self.t_sf.transform.translation.y = self.T_sf[1,3]
-        rpy = ang.rotationMatrixToEulerAngles(self.T_sf[:3,:3])
-        q = quaternion_from_euler(rpy[0], rpy[1], rpy[2])
-        self.t_sf.transform.rotation = Quaternion(q[0], q[1], q[2], q[3])
-        self.t_sf.header.stamp = rospy.Time.now() + rospy.Duration(moving_time)
-        self.pose.pose.position = Point(self.T_sf[0,3], self.T_sf[1,3], 0)
-        self.pose.pose.orientation = Quaternion(q[0], q[1], q[2], q[3])
-        self.pose.header.stamp = rospy.Time.now() + rospy.Duration(moving_time)
+        self.state_publisher.update_odometry(self.T_sf, moving_time)
 
     ### @brief Update the ROS transform signifying self.T_fb
     ### @details - Message is future dated by 'moving_time' since that's the
     ###            amount of time it takes for the motors to move
     def update_tfb_transform(self, moving_time):
-        self.t_fb.transform.translation.x = self.T_fb[0,3]
-        self.t_fb.transform.translation.y = self.T_fb[1,3]
-        self.t_fb.transform.translation.z = self.T_fb[2,3]
-        rpy = ang.rotationMatrixToEulerAngles(self.T_fb[:3,:3])
-        q = quaternion_from_euler(rpy[0], rpy[1], rpy[2])
-        self.t_fb.transform.rotation = Quaternion(q[0], q[1], q[2], q[3])
-        self.t_fb.header.stamp = rospy.Time.now() + rospy.Duration(moving_time)
+        self.state_publisher.update_body_pose(self.T_fb, moving_time)
+
+    ### @brief Publishes the odometry and body transforms (and the odometry pose) once
+    ### @param event - unused ROS Timer event message (so this can still be used as a ROS Timer callback)
+    ### @details - the 'HexapodStatePublisher' already publishes them continuously; see 'HexapodStatePublisher.publish'
+    def publish_states(self, event=None):
+        self.state_publisher.publish()
 
     ### @brief Updates the ROS message containing the joint commands with new values
     ### @param point - 3-element list specifying the desired foot position (relative to the 'base_footprint' frame) for a given leg
@@ -264,29 +315,23 @@ class InterbotixHexapodXSInterface(object):
     def update_joint_command(self, point, leg):
         theta, success = self.solve_ik(point, leg)
         if not success: return False
-        theta_names = [leg + "_coxa", leg + "_femur", leg + "_tibia"]
-        for x in range(len(theta_names)):
-            if not (self.info.joint_lower_limits[self.info_index_map[theta_names[x]]] <= theta[x] <= self.info.joint_upper_limits[self.info_index_map[theta_names[x]]]):
-                return False
-        self.hexapod_command.cmd[self.info_index_map[leg + "_coxa"]] = theta[0]
-        self.hexapod_command.cmd[self.info_index_map[leg + "_femur"]] = theta[1]
-        self.hexapod_command.cmd[self.info_index_map[leg + "_tibia"]] = theta[2]
+        x = self.leg_list.index(leg)
+        if not np.all((self.leg_lower_limits[x] <= theta) & (theta <= self.leg_upper_limits[x])):
+            return False
+        for indx, value in zip(self.leg_joint_indexes[x], theta):
+            self.hexapod_command.cmd[indx] = value
         return True
 
-    ### @brief ROS Timer callback function that continuously publishes transforms
-    ### @param event - unused ROS Timer event message
-    ### @details - if a transform is not being updated, then wait until the time stamp is no longer in the future
-    ###            before publishing it with the current ROS time (prevents jumps back in time)
-    def publish_states(self, event):
-        time = rospy.Time.now()
-        if self.t_sf.header.stamp < time:
-            self.t_sf.header.stamp = time
-            self.pose.header.stamp = time
-        if self.t_fb.header.stamp < time:
-            self.t_fb.header.stamp = time
-        self.br.sendTransform(self.t_sf)
-        self.br.sendTransform(self.t_fb)
-        self.pub_pose.publish(self.pose)
+    ### @brief Updates the ROS message containing the joint commands for all six legs at once
+    ### @param points - 6x3 array specifying the desired foot positions (relative to the 'base_footprint' frame) for each leg (rows follow self.leg_list)
+    ### @return <bool> - True if every leg could be solved within its joint limits; False otherwise (the message is left untouched)
+    def update_joint_commands(self, points):
+        theta, success = self.solve_ik_legs(points)
+        if not np.all(success & self.check_leg_limits(theta)):
+            return False
+        for indx, value in zip(self.leg_joint_indexes.flat, theta.flat):
+            self.hexapod_command.cmd[indx] = value
+        return True
 
     ### @brief Helper function to command the 'Profile_Velocity' and 'Profile_Acceleration' motor registers
     ### @param group - name of the leg to control (or 'all' for all legs)
@@ -323,10 +368,9 @@ class InterbotixHexapodXSInterface(object):
         target_point = np.add(point, p_f_inc)
         theta, success = self.solve_ik(target_point, leg)
         if not success: return False
-        theta_names = [leg + "_coxa", leg + "_femur", leg + "_tibia"]
-        for x in range(len(theta_names)):
-            if not (self.info.joint_lower_limits[self.info_index_map[theta_names[x]]] <= theta[x] <= self.info.joint_upper_limits[self.info_index_map[theta_names[x]]]):
-                return False
+        x = self.leg_list.index(leg)
+        if not np.all((self.leg_lower_limits[x] <= theta) & (theta <= self.leg_upper_limits[x])):
+            return False
         command = JointGroupCommand(name=leg, cmd=theta)
         self.core.pub_group.publish(command)
         self.foot_points[leg] = list(target_point)
@@ -356,11 +400,10 @@ class InterbotixHexapodXSInterface(object):
         if pitch is not None: rpy[1] = pitch
         if yaw is not None: rpy[2] = yaw
         self.T_fb[:3,:3] = ang.eulerAnglesToRotationMatrix(rpy)
-        for leg, point in self.foot_points.items():
-            success = self.update_joint_command(point, leg)
-            if not success:
-                self.T_fb = T_fb
-                return False
+        success = self.update_joint_commands(self.get_foot_array())
+        if not success:
+            self.T_fb = T_fb
+            return False
         self.core.pub_group.publish(self.hexapod_command)
         self.update_tfb_transform(moving_time)
         if blocking: rospy.sleep(moving_time)
@@ -377,46 +420,333 @@ class InterbotixHexapodXSInterface(object):
     ### @param ap - time [sec] that each joint should spend accelerating per step
     ### @param num_cycles - number of gait cycles to complete before exiting
     ### @param cycle_freq - frequency at which the gait cycle should run; defaults to 'num_steps'
+    ### @param use_gait_table - set to True to play the gait back from a precompiled (and cached) joint-space table instead of solving it step by step (see 'compile_gait')
+    ### @param use_trajectory - set to True to send all cycles to the robot as a single JointTrajectoryCommand so that step timing is handled by the xs_sdk node;
+    ###                         implies 'use_gait_table'
     ### @return <bool> - True if function completed successfully; False otherwise
-    def move_in_world(self, x_stride=0, y_stride=0, yaw_stride=0, max_foot_height=0.04, num_steps=20.0, gait_type="tripod", mp=0.150, ap=0.075, num_cycles=1, cycle_freq=None):
+    def move_in_world(self, x_stride=0, y_stride=0, yaw_stride=0, max_foot_height=0.04, num_steps=20.0, gait_type="tripod", mp=0.150, ap=0.075, num_cycles=1, cycle_freq=None, use_gait_table=False, use_trajectory=False):
+        if use_gait_table or use_trajectory:
+            return self.play_gait(x_stride, y_stride, yaw_stride, max_foot_height, num_steps, gait_type, mp, ap, num_cycles, cycle_freq, use_trajectory)
         self.set_trajectory_time("all", mp, ap)
         self.num_steps = num_steps
         num_steps_in_cycle = self.num_steps * self.gait_factors[gait_type]/2.0
         if cycle_freq is None: cycle_freq = num_steps
-        rate = rospy.Rate(cycle_freq)
+        scheduler = self.start_gait_scheduler(cycle_freq)
+        moving_time = mp
         for cycle in range(num_cycles):
             self.step_cntr = 1
             self.inc_prev = 0
             while (self.step_cntr <= num_steps_in_cycle and not rospy.is_shutdown()):
-                inc = 1/self.gait_factors[gait_type] * 0.5*(1 + math.sin(2*np.pi*(self.step_cntr/self.num_steps) - np.pi/2))
-                foot_height = max_foot_height * 0.5*(1 + math.sin(4*np.pi*(self.step_cntr/self.num_steps) - np.pi/2))
-
-                success = False
-                if gait_type == "tripod":
-                    success = self.tripod_gait(x_stride, y_stride, yaw_stride, inc, foot_height)
-                elif gait_type == "ripple":
-                    success = self.ripple_gait(x_stride, y_stride, yaw_stride, inc, foot_height)
-                elif gait_type == "wave":
-                    success = self.wave_gait(x_stride, y_stride, yaw_stride, inc, foot_height)
+                success, T_step = self.gait_step(x_stride, y_stride, yaw_stride, max_foot_height, gait_type)
                 if not success:
                     self.reset_hexapod()
                     return False
-
-                aug_inc = abs(inc - self.inc_prev)
-                temp_point = [aug_inc * x_stride, aug_inc * y_stride, 0]
-                world_point = np.dot(self.T_sf[:3,:3], temp_point)
-                self.T_sf[:3,3] += world_point
-                rpy = ang.rotationMatrixToEulerAngles(self.T_sf[:3,:3])
-                rpy[2] += aug_inc * yaw_stride
-                self.T_sf[:3,:3] = ang.eulerAnglesToRotationMatrix(rpy)
+                self.T_sf = np.dot(self.T_sf, T_step)
                 self.core.pub_group.publish(self.hexapod_command)
-                self.update_tsf_transform(mp)
+                self.update_tsf_transform(moving_time)
+                scheduler.sleep()
+                moving_time = self.adapt_trajectory_time(scheduler, mp, ap)
+        return True
+
+    ### @brief Computes the joint commands for the next step of a gait cycle and advances the gait counters
+    ### @param x_stride - desired positive/negative distance to cover in a gait cycle relative to the base_footprint's X-axis
+    ### @param y_stride - desired positive/negative distance to cover in a gait cycle relative to the base_footprint's Y-axis
+    ### @param yaw_stride - desired positive/negative distance to cover in a gait cycle around the base_footprint's Z-axis
+    ### @param max_foot_height - max height [meters] that a leg's foot will be lifted during the 'swing' phase
+    ### @param gait_type - desired gait to use
+    ### @return <bool, 4x4 matrix> - True if the step was solved successfully (False otherwise) and the transform of the 'base_footprint' frame
+    ###                              after the step relative to where it was before the step
+    ### @details - self.num_steps, self.step_cntr, and self.inc_prev must be set up by the caller at the start of each cycle
+    def gait_step(self, x_stride, y_stride, yaw_stride, max_foot_height, gait_type):
+        inc = 1/self.gait_factors[gait_type] * 0.5*(1 + math.sin(2*np.pi*(self.step_cntr/self.num_steps) - np.pi/2))
+        foot_height = max_foot_height * 0.5*(1 + math.sin(4*np.pi*(self.step_cntr/self.num_steps) - np.pi/2))
+
+        success = False
+        if gait_type == "tripod":
+            success = self.tripod_gait(x_stride, y_stride, yaw_stride, inc, foot_height)
+        elif gait_type == "ripple":
+            success = self.ripple_gait(x_stride, y_stride, yaw_stride, inc, foot_height)
+        elif gait_type == "wave":
+            success = self.wave_gait(x_stride, y_stride, yaw_stride, inc, foot_height)
+        if not success:
+            return False, np.identity(4)
+
+        aug_inc = abs(inc - self.inc_prev)
+        T_step = np.identity(4)
+        T_step[:2,:2] = ang.yawToRotationMatrix(aug_inc * yaw_stride)
+        T_step[:2,3] = [aug_inc * x_stride, aug_inc * y_stride]
+        self.inc_prev = inc
+        self.step_cntr += 1.0
+        return True, T_step
+
+    ### @brief Get a snapshot of the counters that the ripple and wave gaits carry from one step (and cycle) to the next
+    ### @return <dict> - copy of the gait state
+    def get_gait_state(self):
+        return {"period_cntr" : self.period_cntr, "ripple_leg_pairs" : list(self.ripple_leg_pairs), "ripple_incs" : dict(self.ripple_incs),
+                "wave_legs" : list(self.wave_legs), "wave_incs" : dict(self.wave_incs)}
+
+    ### @brief Restore the gait counters from a snapshot taken with 'get_gait_state'
+    ### @param gait_state - dictionary returned by 'get_gait_state'
+    def set_gait_state(self, gait_state):
+        self.period_cntr = gait_state["period_cntr"]
+        self.ripple_leg_pairs = list(gait_state["ripple_leg_pairs"])
+        self.ripple_incs = dict(gait_state["ripple_incs"])
+        self.wave_legs = list(gait_state["wave_legs"])
+        self.wave_incs = dict(gait_state["wave_incs"])
+
+    ### @brief Precomputes the joint commands for one full gait cycle starting from the current foot points, body pose, and gait state
+    ### @param x_stride - desired positive/negative distance to cover in a gait cycle relative to the base_footprint's X-axis
+    ### @param y_stride - desired positive/negative distance to cover in a gait cycle relative to the base_footprint's Y-axis
+    ### @param yaw_stride - desired positive/negative distance to cover in a gait cycle around the base_footprint's Z-axis
+    ### @param max_foot_height - max height [meters] that a leg's foot will be lifted during the 'swing' phase
+    ### @param num_steps - number of steps to complete one wave in the first sinusoid function
+    ### @param gait_type - desired gait to use
+    ### @return gait_table - dictionary with the keys 'commands' (NxJ array of joint commands, one row per step), 'steps' (Nx4x4 array of
+    ###                      per-step 'base_footprint' transforms), and 'end_state' (gait state after the cycle); None if any step could not be solved
+    ### @details - tables are cached (see 'self.gait_table_cache_size') so repeated cycles with the same inputs cost nothing to compute;
+    ###            compiling does not change the hexapod's state or command anything
+    def compile_gait(self, x_stride, y_stride, yaw_stride, max_foot_height=0.04, num_steps=20.0, gait_type="tripod"):
+        gait_state = self.get_gait_state()
+        key = (gait_type, x_stride, y_stride, yaw_stride, max_foot_height, num_steps, self.get_foot_array().tobytes(), self.T_fb.tobytes(),
+               gait_state["period_cntr"], tuple(gait_state["ripple_leg_pairs"]), tuple(sorted(gait_state["ripple_incs"].items())),
+               tuple(gait_state["wave_legs"]), tuple(sorted(gait_state["wave_incs"].items())))
+        if key in self.gait_tables:
+            return self.gait_tables[key]
+
+        saved = (self.num_steps, self.step_cntr, self.inc_prev, list(self.hexapod_command.cmd))
+        self.num_steps = num_steps
+        self.step_cntr = 1
+        self.inc_prev = 0
+        num_steps_in_cycle = int(num_steps * self.gait_factors[gait_type]/2.0)
+        commands = np.zeros((num_steps_in_cycle, len(self.hexapod_command.cmd)))
+        steps = np.zeros((num_steps_in_cycle, 4, 4))
+        gait_table = None
+        for x in range(num_steps_in_cycle):
+            success, steps[x] = self.gait_step(x_stride, y_stride, yaw_stride, max_foot_height, gait_type)
+            if not success: break
+            commands[x] = self.hexapod_command.cmd
+        else:
+            gait_table = {"commands" : commands, "steps" : steps, "end_state" : self.get_gait_state()}
+        self.num_steps, self.step_cntr, self.inc_prev, self.hexapod_command.cmd = saved
+        self.set_gait_state(gait_state)
+
+        if gait_table is not None:
+            if len(self.gait_tables) >= self.gait_table_cache_size:
+                self.gait_tables.popitem(last=False)
+            self.gait_tables[key] = gait_table
+        return gait_table
+
+    ### @brief Move the hexapod 'base_footprint' frame relative to the 'odom' frame using precompiled gait tables
+    ### @param x_stride - desired positive/negative distance to cover in a gait cycle relative to the base_footprint's X-axis
+    ### @param y_stride - desired positive/negative distance to cover in a gait cycle relative to the base_footprint's Y-axis
+    ### @param yaw_stride - desired positive/negative distance to cover in a gait cycle around the base_footprint's Z-axis
+    ### @param max_foot_height - max height [meters] that a leg's foot will be lifted during the 'swing' phase
+    ### @param num_steps - number of steps to complete one wave in the first sinusoid function
+    ### @param gait_type - desired gait to use
+    ### @param mp - time [sec] that each joint should spend moving per step
+    ### @param ap - time [sec] that each joint should spend accelerating per step
+    ### @param num_cycles - number of gait cycles to complete before exiting
+    ### @param cycle_freq - frequency at which the gait cycle should run; defaults to 'num_steps'
+    ### @param use_trajectory - if True, all cycles are sent as one JointTrajectoryCommand; otherwise, each table row is published at 'cycle_freq'
+    ### @return <bool> - True if function completed successfully; False otherwise
+    def play_gait(self, x_stride=0, y_stride=0, yaw_stride=0, max_foot_height=0.04, num_steps=20.0, gait_type="tripod", mp=0.150, ap=0.075, num_cycles=1, cycle_freq=None, use_trajectory=False):
+        if cycle_freq is None: cycle_freq = num_steps
+        tables = []
+        for cycle in range(num_cycles):
+            gait_table = self.compile_gait(x_stride, y_stride, yaw_stride, max_foot_height, num_steps, gait_type)
+            if gait_table is None:
+                self.reset_hexapod()
+                return False
+            tables.append(gait_table)
+            self.set_gait_state(gait_table["end_state"])
+        self.set_trajectory_time("all", mp, ap)
+        self.num_steps = num_steps
+        if use_trajectory:
+            commands = np.concatenate([gait_table["commands"] for gait_table in tables])
+            traj = JointTrajectory()
+            for x in range(len(commands)):
+                traj.points.append(JointTrajectoryPoint(positions=commands[x].tolist(), time_from_start=rospy.Duration.from_sec(x / float(cycle_freq))))
+            self.core.pub_traj.publish(JointTrajectoryCommand("group", "all", traj))
+        # the xs_sdk node times a trajectory itself, so the step period can only be stretched when publishing row by row
+        scheduler = self.start_gait_scheduler(cycle_freq, adapt=not use_trajectory)
+        moving_time = mp
+        for gait_table in tables:
+            for x in range(len(gait_table["commands"])):
+                if rospy.is_shutdown(): return False
+                self.hexapod_command.cmd = gait_table["commands"][x].tolist()
+                if not use_trajectory:
+                    self.core.pub_group.publish(self.hexapod_command)
+                self.T_sf = np.dot(self.T_sf, gait_table["steps"][x])
+                self.update_tsf_transform(moving_time)
+                scheduler.sleep()
+                if not use_trajectory:
+                    moving_time = self.adapt_trajectory_time(scheduler, mp, ap)
+        return True
 
-                self.inc_prev = inc
-                self.step_cntr += 1.0
-                rate.sleep()
+    ### @brief Starts a walking thread that keeps the gait running until 'stop_walking' is called; velocities are set with 'set_walk_velocity'
+    ### @param gait_type - desired gait to use
+    ### @param max_foot_height - max height [meters] that a leg's foot will be lifted during the 'swing' phase
+    ### @param num_steps - number of steps to complete one wave in the first sinusoid function
+    ### @param cycle_freq - frequency at which the gait steps should run; defaults to 'num_steps'
+    ### @param mp - time [sec] that each joint should spend moving per step
+    ### @param ap - time [sec] that each joint should spend accelerating per step
+    ### @param stride_blend - fraction [0 - 1] of the difference between the commanded and current strides that is applied every gait cycle
+    ### @return <bool> - True if the walking thread was started; False if it was already running
+    ### @details - the gait phase carries over between cycles and velocity changes. Since the gaits place each foot at an offset of
+    ###            'inc * stride' from its foot point, the strides only change at cycle boundaries (blended towards the commanded velocities)
+    ###            and the foot points are shifted at the same time so that feet on the ground don't slip. If a step can't be solved, the
+    ###            strides are halved (again shifting the foot points) and stay reduced until the next cycle boundary; the walk ends instead
+    ###            if it was asked to stop or if even tiny strides can't be solved. When the commanded velocity is zero, the hexapod finishes
+    ###            its current cycle and then stands still until commanded again.
+    def start_walking(self, gait_type="tripod", max_foot_height=0.04, num_steps=20.0, cycle_freq=None, mp=0.150, ap=0.075, stride_blend=0.5):
+        if self.is_walking():
+            rospy.logwarn("The hexapod is already walking.")
+            return False
+        if cycle_freq is None: cycle_freq = num_steps
+        self.set_trajectory_time("all", mp, ap)
+        self.num_steps = num_steps
+        self.step_cntr = 1
+        self.inc_prev = 0
+        self.walk_strides = np.zeros(3)
+        with self.walk_mutex:
+            self.walk_velocity = np.zeros(3)
+            self.walk_stop = False
+        self.walk_thread = threading.Thread(target=self.walk, args=(gait_type, max_foot_height, cycle_freq, mp, ap, stride_blend))
+        self.walk_thread.daemon = True
+        self.walk_thread.start()
         return True
 
+    ### @brief Set the velocities that the walking thread should move the 'base_footprint' frame at
+    ### @param vx - desired velocity [m/s] along the base_footprint's X-axis
+    ### @param vy - desired velocity [m/s] along the base_footprint's Y-axis
+    ### @param yaw_rate - desired angular velocity [rad/s] around the base_footprint's Z-axis
+    def set_walk_velocity(self, vx=0, vy=0, yaw_rate=0):
+        with self.walk_mutex:
+            self.walk_velocity = np.array([vx, vy, yaw_rate], dtype=float)
+
+    ### @brief Brings the hexapod to a stop and ends the walking thread
+    ### @param blocking - whether the function should wait until the hexapod has stopped before returning control to the user
+    def stop_walking(self, blocking=True):
+        if self.walk_thread is None: return
+        with self.walk_mutex:
+            self.walk_velocity = np.zeros(3)
+            self.walk_stop = True
+        if blocking:
+            self.walk_thread.join()
+            self.walk_thread = None
+
+    ### @brief Check whether the walking thread is running
+    ### @return <bool> - True if the hexapod is walking; False otherwise
+    def is_walking(self):
+        if self.walk_thread is not None and not self.walk_thread.is_alive():
+            self.walk_thread = None
+        return self.walk_thread is not None
+
+    ### @brief Walking thread started by 'start_walking'; see that function for a description of the parameters
+    def walk(self, gait_type, max_foot_height, cycle_freq, mp, ap, stride_blend):
+        num_steps_in_cycle = self.num_steps * self.gait_factors[gait_type]/2.0
+        scheduler = self.start_gait_scheduler(cycle_freq)
+        moving_time = mp
+        stride_reduced = False                                                  # True while retrying a step that couldn't be solved
+        while not rospy.is_shutdown():
+            if self.step_cntr == 1 and not stride_reduced:
+                # every gait cycle covers exactly one stride, so a velocity maps to a stride by the cycle's nominal duration;
+                # a stretched step period then slows the walk down instead of lengthening the strides
+                cycle_time = num_steps_in_cycle * scheduler.nominal_period
+                with self.walk_mutex:
+                    target = self.walk_velocity * cycle_time
+                    stop = self.walk_stop
+                strides = np.zeros(3) if stop else self.walk_strides + stride_blend * (target - self.walk_strides)
+                strides[abs(target - strides) < 1e-3] = target[abs(target - strides) < 1e-3]
+                self.set_walk_strides(strides, gait_type)
+                if not np.any(strides):
+                    if stop: break
+                    scheduler.sleep()
+                    continue
+            gait_state = self.get_gait_state()
+            success, T_step = self.gait_step(self.walk_strides[0], self.walk_strides[1], self.walk_strides[2], max_foot_height, gait_type)
+            if not success:
+                self.set_gait_state(gait_state)
+                with self.walk_mutex:
+                    stop = self.walk_stop
+                if stop or np.all(abs(self.walk_strides) < 1e-4):
+                    if not stop: rospy.logerr("Could not solve the next gait step even with a tiny stride. Stopping the walk.")
+                    break
+                rospy.logwarn_throttle(1, "Could not solve the next gait step. Reducing the stride.")
+                self.set_walk_strides(self.walk_strides * 0.5, gait_type)
+                stride_reduced = True
+                scheduler.sleep()
+                continue
+            stride_reduced = False
+            self.T_sf = np.dot(self.T_sf, T_step)
+            self.core.pub_group.publish(self.hexapod_command)
+            self.update_tsf_transform(moving_time)
+            if self.step_cntr > num_steps_in_cycle:
+                self.step_cntr = 1
+                self.inc_prev = 0
+            scheduler.sleep()
+            moving_time = self.adapt_trajectory_time(scheduler, mp, ap)
+
+    ### @brief Changes the strides used by the walking thread without moving any feet
+    ### @param strides - new [x_stride, y_stride, yaw_stride]
+    ### @param gait_type - gait that is running
+    ### @details - the foot points are shifted so that 'foot point + inc * stride' (see 'offset_foot_points') stays where it was for every leg
+    def set_walk_strides(self, strides, gait_type):
+        incs = self.get_leg_incs(gait_type)
+        old, new = self.walk_strides, strides
+        points = self.offset_foot_points(incs * old[2], np.column_stack((incs * old[0], incs * old[1], np.zeros(6))))
+        points[:,0] -= incs * new[0]
+        points[:,1] -= incs * new[1]
+        c, s = np.cos(-incs * new[2]), np.sin(-incs * new[2])
+        points[:,0], points[:,1] = c * points[:,0] - s * points[:,1], s * points[:,0] + c * points[:,1]
+        self.foot_points = {leg : list(points[x]) for x, leg in enumerate(self.leg_list)}
+        self.walk_strides = np.array(strides, dtype=float)
+
+    ### @brief Get the fraction of a stride that each foot is currently offset by (the 'inc' used by the last gait step)
+    ### @param gait_type - gait that is running
+    ### @return <array> - 6-element array of per-leg increments (rows follow self.leg_list)
+    def get_leg_incs(self, gait_type):
+        if gait_type == "tripod":
+            return np.array([-self.inc_prev if leg in ["right_front", "right_back", "left_middle"] else self.inc_prev for leg in self.leg_list])
+        if gait_type == "ripple":
+            pairs = {leg : pair for pair, legs in self.ripple_legs.items() for leg in legs}
+            return np.array([self.ripple_incs[pairs[leg]] for leg in self.leg_list], dtype=float)
+        return np.array([self.wave_incs[leg] for leg in self.leg_list], dtype=float)
+
+    ### @brief Creates the GaitScheduler that times the next gait loop and keeps it around for 'get_gait_timing'
+    ### @param cycle_freq - frequency [Hz] at which the gait steps should run
+    ### @param adapt - True if the step period may be stretched (up to 'self.gait_max_stretch') when steps overrun their deadline
+    ### @return scheduler - the new GaitScheduler
+    def start_gait_scheduler(self, cycle_freq, adapt=True):
+        self.gait_scheduler = GaitScheduler(cycle_freq, self.gait_max_stretch if adapt else 1.0)
+        return self.gait_scheduler
+
+    ### @brief Stretches the servo moving/accel times by the same factor the scheduler stretched the step period by
+    ### @param scheduler - GaitScheduler timing the gait loop
+    ### @param mp - nominal time [sec] that each joint should spend moving per step
+    ### @param ap - nominal time [sec] that each joint should spend accelerating per step
+    ### @return moving_time - time [sec] that each joint now spends moving per step
+    ### @details - 'set_trajectory_time' only calls the motor register services when the times actually change
+    def adapt_trajectory_time(self, scheduler, mp, ap):
+        scale = scheduler.get_timing_scale()
+        self.set_trajectory_time("all", mp * scale, ap * scale)
+        return mp * scale
+
+    ### @brief Get the timing statistics of the most recent (or currently running) gait loop
+    ### @return <dict> - see 'GaitScheduler.get_stats'; None if no gait loop has run yet
+    def get_gait_timing(self):
+        if self.gait_scheduler is None: return None
+        return self.gait_scheduler.get_stats()
+
+    ### @brief Rotates (around the 'z' axis) and then translates every foot point relative to the 'base_footprint' frame
+    ### @param yaws - 6-element array of yaw angles [rad] to rotate each foot point by (rows follow self.leg_list)
+    ### @param offsets - 6x3 array of translations [m] to add to each rotated foot point
+    ### @return <array> - 6x3 array of the new foot points
+    def offset_foot_points(self, yaws, offsets):
+        points = self.get_foot_array()
+        c, s = np.cos(yaws), np.sin(yaws)
+        return np.column_stack((c * points[:,0] - s * points[:,1], s * points[:,0] + c * points[:,1], points[:,2])) + offsets
+
     ### @brief Makes the hexapod walk using a tripod gait
     ### @param x_stride - desired positive/negative distance to cover in a gait cycle relative to the base_footprint's X-axis
     ### @param y_stride - desired positive/negative distance to cover in a gait cycle relative to the base_footprint's Y-axis
@@ -425,24 +755,13 @@ class InterbotixHexapodXSInterface(object):
     ### @param foot_height - output from the 'second' sinusoidal function (as described in the Notes above) that describes the desired 'z' position for a given leg's foot
     ### @return <bool> - True if function completed successfully; False otherwise
     def tripod_gait(self, x_stride, y_stride, yaw_stride, inc, foot_height):
-        x_inc = inc * x_stride
-        y_inc = inc * y_stride
-        yaw_inc = inc * yaw_stride
-
-        for leg in self.leg_list:
-            new_point = []
-            T_osc = np.identity(4)
-            if (leg == "right_front" or leg == "right_back" or leg == "left_middle"):
-                T_osc[:3,:3] = ang.eulerAnglesToRotationMatrix([0, 0, -yaw_inc])
-                p_f = [-x_inc, -y_inc, 0 if self.step_cntr < self.num_steps/2.0 else foot_height]
-            else:
-                T_osc[:3,:3] = ang.eulerAnglesToRotationMatrix([0, 0, yaw_inc])
-                p_f = [x_inc, y_inc, 0 if self.step_cntr > self.num_steps/2.0 else foot_height]
-            T_osc[:3,3] = p_f
-            new_point = np.dot(T_osc, np.r_[self.foot_points[leg], 1])
-            success = self.update_joint_command(new_point[:3], leg)
-            if not success: return False
-        return True
+        # +1 for legs in the set that swings during the first period, -1 for the other set
+        signs = np.array([-1.0 if leg in ["right_front", "right_back", "left_middle"] else 1.0 for leg in self.leg_list])
+        z_first = 0 if self.step_cntr > self.num_steps/2.0 else foot_height
+        z_second = 0 if self.step_cntr < self.num_steps/2.0 else foot_height
+        offsets = np.column_stack((signs * inc * x_stride, signs * inc * y_stride, np.where(signs > 0, z_first, z_second)))
+        new_points = self.offset_foot_points(signs * inc * yaw_stride, offsets)
+        return self.update_joint_commands(new_points)
 
     ### @brief Makes the hexapod walk using a ripple gait
     ### @param x_stride - desired positive/negative distance to cover in a gait cycle relative to the base_footprint's X-axis
@@ -452,29 +771,26 @@ class InterbotixHexapodXSInterface(object):
     ### @param foot_height - output from the 'second' sinusoidal function (as described in the Notes above) that describes the desired 'z' position for a given leg's foot
     ### @return <bool> - True if function completed successfully; False otherwise
     def ripple_gait(self, x_stride, y_stride, yaw_stride, inc, foot_height):
+        leg_incs = {}
+        leg_heights = {}
         for pair in self.ripple_leg_pairs:
             z_inc = 0
-            new_point = []
-            T_osc = np.identity(4)
             if pair != self.ripple_leg_pairs[0]:
                 self.ripple_incs[pair] -= abs(inc - self.inc_prev)
             else:
                 self.ripple_incs[pair] += abs(inc - self.inc_prev) * 2.0
                 z_inc = foot_height
-            x_inc = self.ripple_incs[pair] * x_stride
-            y_inc = self.ripple_incs[pair] * y_stride
-            yaw_inc = self.ripple_incs[pair] * yaw_stride
-            p_f = [x_inc, y_inc, z_inc]
-            T_osc[:3,3] = p_f
-            T_osc[:3,:3] = ang.eulerAnglesToRotationMatrix([0, 0, yaw_inc])
             for leg in self.ripple_legs[pair]:
-                new_point = np.dot(T_osc, np.r_[self.foot_points[leg], 1])
-                success = self.update_joint_command(new_point[:3], leg)
-                if not success:
-                    self.ripple_leg_pairs = ["first", "second", "third"]
-                    self.ripple_incs = {p:0 for p in self.ripple_leg_pairs}
-                    self.period_cntr = 0
-                    return False
+                leg_incs[leg] = self.ripple_incs[pair]
+                leg_heights[leg] = z_inc
+        incs = np.array([leg_incs[leg] for leg in self.leg_list])
+        heights = np.array([leg_heights[leg] for leg in self.leg_list])
+        new_points = self.offset_foot_points(incs * yaw_stride, np.column_stack((incs * x_stride, incs * y_stride, heights)))
+        if not self.update_joint_commands(new_points):
+            self.ripple_leg_pairs = ["first", "second", "third"]
+            self.ripple_incs = {p:0 for p in self.ripple_leg_pairs}
+            self.period_cntr = 0
+            return False
         self.period_cntr += 1.0
         if (self.period_cntr == self.num_steps/2.0):
             old_pair = self.ripple_leg_pairs.pop(0)
@@ -490,28 +806,23 @@ class InterbotixHexapodXSInterface(object):
     ### @param foot_height - output from the 'second' sinusoidal function (as described in the Notes above) that describes the desired 'z' position for a given leg's foot
     ### @return <bool> - True if function completed successfully; False otherwise
     def wave_gait(self, x_stride, y_stride, yaw_stride, inc, foot_height):
+        leg_heights = {}
         for leg in self.wave_legs:
             z_inc = 0
-            new_point = []
-            T_osc = np.identity(4)
             if leg != self.wave_legs[0]:
                 self.wave_incs[leg] -= abs(inc - self.inc_prev)
             else:
                 self.wave_incs[leg] += abs(inc - self.inc_prev) * 5.0
                 z_inc = foot_height
-            x_inc = self.wave_incs[leg] * x_stride
-            y_inc = self.wave_incs[leg] * y_stride
-            yaw_inc = self.wave_incs[leg] * yaw_stride
-            p_f = [x_inc, y_inc, z_inc]
-            T_osc[:3,3] = p_f
-            T_osc[:3,:3] = ang.eulerAnglesToRotationMatrix([0, 0, yaw_inc])
-            new_point = np.dot(T_osc, np.r_[self.foot_points[leg], 1])
-            success = self.update_joint_command(new_point[:3], leg)
-            if not success:
-                self.wave_legs = ["right_front", "left_front", "right_middle", "left_middle", "right_back", "left_back"]
-                self.wave_incs = {l:0 for l in self.wave_legs}
-                self.period_cntr = 0
-                return False
+            leg_heights[leg] = z_inc
+        incs = np.array([self.wave_incs[leg] for leg in self.leg_list])
+        heights = np.array([leg_heights[leg] for leg in self.leg_list])
+        new_points = self.offset_foot_points(incs * yaw_stride, np.column_stack((incs * x_stride, incs * y_stride, heights)))
+        if not self.update_joint_commands(new_points):
+            self.wave_legs = ["right_front", "left_front", "right_middle", "left_middle", "right_back", "left_back"]
+            self.wave_incs = {l:0 for l in self.wave_legs}
+            self.period_cntr = 0
+            return False
         self.period_cntr += 1.0
         if (self.period_cntr == self.num_steps/2.0):
             old_leg = self.wave_legs.pop(0)
@@ -529,13 +840,16 @@ class InterbotixHexapodXSInterface(object):
     ### @param mp - time [sec] that each joint should spend moving per step in num_swing_steps
     ### @param ap - time [sec] that each joint should spend moving per step in num_swing_steps
     ### @param leg_down_inc - length [meters] that a leg moves down every iteration
-    ### @param threshold - the femur motor current [mA] above 0 that is considered a 'ground touch' for the leg
+    ### @param threshold - the (filtered) femur motor current [mA] above 0 that is considered a 'ground touch' for the leg
+    ### @param contact_filter - weight [0 - 1] given to each new femur current reading by the contact detector's low-pass filter
+    ### @param contact_debounce - number of consecutive joint state messages above 'threshold' needed to register a 'ground touch'
+    ### @param contact_blind_time - time [sec] after a leg starts moving down during which 'ground touches' are ignored (current spikes as the leg starts moving)
     ### @param reset_foot_points - set to True to reset 'self.foot_points' to 'self.home_foot_points' before moving the hexapod
     ### @param reset_height - if resetting foot points, this sets the 'z' value of self.T_fb
     ### @param num_cycles - number of gait cycles to complete before exiting
     ### @param cycle_freq - frequency at which the gait cycle should run
     ### @return <bool> - True if function completed successfully; False otherwise
-    def move_in_world_rough(self, x_stride=0, y_stride=0, yaw_stride=0, max_foot_height=0.02, leg_up_time=0.5, num_swing_steps=10.0, mp=0.150, ap=0.075, leg_down_inc=0.001, threshold=70, reset_foot_points=False, reset_height=0.12, num_cycles=1, cycle_freq=20.0):
+    def move_in_world_rough(self, x_stride=0, y_stride=0, yaw_stride=0, max_foot_height=0.02, leg_up_time=0.5, num_swing_steps=10.0, mp=0.150, ap=0.075, leg_down_inc=0.001, threshold=70, reset_foot_points=False, reset_height=0.12, num_cycles=1, cycle_freq=20.0, contact_filter=0.5, contact_debounce=2, contact_blind_time=0.6):
 
         if reset_foot_points:
             self.foot_points = copy.deepcopy(self.home_foot_points)
@@ -545,7 +859,8 @@ class InterbotixHexapodXSInterface(object):
         first_set = ["left_front", "left_back", "right_middle"]
         second_set = ["right_front", "right_back", "left_middle"]
         sets = [first_set, second_set]
-        rate = rospy.Rate(cycle_freq)
+        scheduler = self.start_gait_scheduler(cycle_freq)
+        moving_time = mp
         for x in range(num_cycles):
             for set in sets:
                 # Move all legs in a set up to 'max_foot_height'
@@ -559,29 +874,20 @@ class InterbotixHexapodXSInterface(object):
                 time_start = rospy.get_time()
 
                 # Move all legs in the XY plane according to the 'stride' parameters
-                self.set_trajectory_time("all", mp, ap)
+                self.adapt_trajectory_time(scheduler, mp, ap)
                 time_diff = leg_up_time - (rospy.get_time() - time_start)
                 if time_diff > 0: rospy.sleep(time_diff)
+                scheduler.reset()
                 inc_prev = 0
                 for step in range(1, int(num_swing_steps) + 1):
                     inc = 0.25*(1 + math.sin(np.pi*(step/num_swing_steps) - np.pi/2))
-                    x_inc = inc * x_stride
-                    y_inc = inc * y_stride
-                    yaw_inc = inc * yaw_stride
-                    for leg, point in self.foot_points.items():
-                        T_osc = np.identity(4)
-                        if leg not in set:
-                            T_osc[:3,:3] = ang.eulerAnglesToRotationMatrix([0, 0, -yaw_inc])
-                            p_f = [-x_inc, -y_inc, 0]
-                        else:
-                            T_osc[:3,:3] = ang.eulerAnglesToRotationMatrix([0, 0, yaw_inc])
-                            p_f = [x_inc, y_inc, 0]
-                        T_osc[:3,3] = p_f
-                        new_point = np.dot(T_osc, np.r_[self.foot_points[leg], 1])
-                        success = self.update_joint_command(new_point[:3], leg)
-                        if not success: return False
-                        if step == num_swing_steps:
-                            self.foot_points[leg] = list(new_point[:3])
+                    signs = np.array([1.0 if leg in set else -1.0 for leg in self.leg_list])
+                    offsets = np.column_stack((signs * inc * x_stride, signs * inc * y_stride, np.zeros(6)))
+                    new_points = self.offset_foot_points(signs * inc * yaw_stride, offsets)
+                    success = self.update_joint_commands(new_points)
+                    if not success: return False
+                    if step == num_swing_steps:
+                        self.foot_points = {leg : list(new_points[x]) for x, leg in enumerate(self.leg_list)}
                     aug_inc = abs(inc - inc_prev)
                     temp_point = [aug_inc * x_stride, aug_inc * y_stride, 0]
                     world_point = np.dot(self.T_sf[:3,:3], temp_point)
@@ -590,34 +896,31 @@ class InterbotixHexapodXSInterface(object):
                     rpy[2] += aug_inc * yaw_stride
                     self.T_sf[:3,:3] = ang.eulerAnglesToRotationMatrix(rpy)
                     self.core.pub_group.publish(self.hexapod_command)
-                    self.update_tsf_transform(mp)
+                    self.update_tsf_transform(moving_time)
                     inc_prev = inc
-                    rate.sleep()
+                    scheduler.sleep()
+                    moving_time = self.adapt_trajectory_time(scheduler, mp, ap)
 
                 # Move all legs in a set down until 'ground touch' is achieved
-                all_feet_grounded = False
+                self.contact_detector.arm(set, threshold, contact_filter, contact_debounce, contact_blind_time)
+                descending_legs = list(set)
                 current_foot_height = max_foot_height
-                time_start = rospy.get_time()
-                while not all_feet_grounded:
-                    all_feet_grounded = True
+                while (len(descending_legs) > 0 and not rospy.is_shutdown()):
                     current_foot_height -= leg_down_inc
-                    for leg in set:
-                        if (rospy.get_time() <= time_start + 0.6):
-                            new_point = np.r_[self.foot_points[leg][:2], current_foot_height]
-                            success = self.update_joint_command(new_point, leg)
-                            if not success: continue
-                            self.foot_points[leg][2] = current_foot_height
-                            all_feet_grounded = False
-                        elif (rospy.get_time() > time_start + 0.6):
-                            joint_effort = self.core.joint_states.effort[self.core.js_index_map[leg + "_femur"]]
-                            if (joint_effort < threshold):
-                                new_point = np.r_[self.foot_points[leg][:2], current_foot_height]
-                                success = self.update_joint_command(new_point, leg)
-                                if not success: continue
-                                self.foot_points[leg][2] = current_foot_height
-                                all_feet_grounded = False
+                    for leg in list(descending_legs):
+                        new_point = np.r_[self.foot_points[leg][:2], current_foot_height]
+                        if self.contact_detector.in_contact(leg) or not self.update_joint_command(new_point, leg):
+                            descending_legs.remove(leg)
+                            continue
+                        self.foot_points[leg][2] = current_foot_height
                     self.core.pub_group.publish(self.hexapod_command)
-                    rate.sleep()
+                    # a 'ground touch' in the middle of a step stops that leg right away (at its current height) instead of after the step
+                    while (len(descending_legs) > 0 and scheduler.wait(self.contact_detector.contact_event)):
+                        self.contact_detector.contact_event.clear()
+                        for leg in [leg for leg in descending_legs if self.contact_detector.in_contact(leg)]:
+                            descending_legs.remove(leg)
+                    scheduler.sleep()
+                self.contact_detector.disarm()
         return True
 
     ### @brief Get current odometry
@@ -662,3 +965,248 @@ class InterbotixHexapodXSInterface(object):
 
     def set_home_height(self, height):
         self.home_height = height
+
+
+### @brief Fixed-rate loop timer for the gait loops that measures how long each step takes against its deadline
+### @param freq - nominal frequency [Hz] at which the steps should run
+### @param max_stretch - max factor by which the step period may be stretched when steps overrun their deadline (1.0 disables stretching)
+### @details - unlike rospy.Rate, a step that overruns its deadline does not make the following steps run back to back to catch up;
+###            instead, the next deadline is measured from the overrun and the period is stretched (then slowly relaxed back
+###            towards nominal once steps fit again) so that the gait keeps a steady, if slower, pace
+class GaitScheduler(object):
+    def __init__(self, freq, max_stretch=2.0):
+        self.nominal_period = 1.0 / freq                                        # Step period [sec] requested by the user
+        self.period = self.nominal_period                                       # Step period [sec] currently in use
+        self.max_stretch = max_stretch
+        self.scale = 1.0                                                        # Stretch factor last reported by 'get_timing_scale'
+        self.steps = 0                                                          # Number of steps timed so far
+        self.overruns = 0                                                       # Number of steps that missed their deadline
+        self.worst_latency = 0.0                                                # Longest time [sec] spent computing a step
+        self.total_latency = 0.0                                                # Sum of the time [sec] spent computing every step
+        self.wait_time = 0.0                                                    # Time [sec] spent in 'wait' during the current step (not counted as latency)
+        self.reset()
+
+    ### @brief Restart the step timing from now; call after deliberately blocking (ex. waiting for a leg to lift) so the wait isn't counted as step latency
+    def reset(self):
+        self.step_start = rospy.get_time()
+        self.deadline = self.step_start + self.period
+        self.wait_time = 0.0
+
+    ### @brief Waits until either 'event' is set or the current step's deadline is reached, without ending the step
+    ### @param event - threading.Event to wait on
+    ### @return <bool> - True if the event was set before the deadline; False otherwise
+    def wait(self, event):
+        time_start = rospy.get_time()
+        timeout = self.deadline - time_start
+        is_set = event.wait(timeout) if timeout > 0 else event.is_set()
+        self.wait_time += rospy.get_time() - time_start
+        return is_set
+
+    ### @brief Ends the current step - records its latency and sleeps until its deadline (or returns immediately if the deadline was missed)
+    def sleep(self):
+        now = rospy.get_time()
+        latency = now - self.step_start - self.wait_time
+        self.wait_time = 0.0
+        self.steps += 1
+        self.total_latency += latency
+        self.worst_latency = max(self.worst_latency, latency)
+        if now > self.deadline:
+            self.overruns += 1
+            self.period = min(self.period * 1.25, self.nominal_period * self.max_stretch)
+            rospy.logwarn_throttle(1, "Gait step took %.1f ms; the deadline is %.1f ms." % (latency * 1000, (self.deadline - self.step_start) * 1000))
+            wake_time = now
+        else:
+            if (latency < 0.5 * self.period):
+                self.period = max(self.period * 0.95, self.nominal_period)
+            rospy.sleep(self.deadline - now)
+            wake_time = self.deadline
+        self.step_start = rospy.get_time()
+        self.deadline = wake_time + self.period
+
+    ### @brief Get the factor by which the step period is currently stretched
+    ### @param hysteresis - minimum change in the stretch factor before a new value is reported (avoids constantly rewriting servo registers)
+    ### @return scale - stretch factor (1.0 when running at the nominal frequency)
+    def get_timing_scale(self, hysteresis=0.1):
+        scale = self.period / self.nominal_period
+        if (abs(scale - self.scale) > hysteresis or scale == 1.0):
+            self.scale = scale
+        return self.scale
+
+    ### @brief Get the timing statistics collected so far
+    ### @return <dict> - 'steps', 'overruns', 'worst_latency' [sec], 'mean_latency' [sec], 'period' [sec] currently in use, and 'nominal_period' [sec]
+    def get_stats(self):
+        mean_latency = self.total_latency / self.steps if self.steps > 0 else 0.0
+        return {"steps" : self.steps, "overruns" : self.overruns, "worst_latency" : self.worst_latency, "mean_latency" : mean_latency,
+                "period" : self.period, "nominal_period" : self.nominal_period}
+
+
+### @brief Detects when a hexapod's feet touch the ground by watching the femur motor currents in the joint state stream
+### @param core - reference to the InterbotixRobotXSCore class containing the joint state information
+### @param leg_list - names of the legs to watch
+### @details - a leg must be 'armed' before its contacts are detected; each femur current is low-pass filtered and a contact is only
+###            registered after 'debounce' consecutive filtered readings above the threshold. Contacts are signaled through 'contact_event'
+###            (and per leg through 'in_contact') as soon as the joint state message that triggered them arrives. The detector only
+###            listens to the joint states while armed; rospy shares the core's existing 'joint_states' connection, so arming is cheap.
+class GroundContactDetector(object):
+    def __init__(self, core, leg_list):
+        self.core = core
+        self.femur_indexes = {leg : self.core.js_index_map[leg + "_femur"] for leg in leg_list}    # Positions of each leg's femur joint in the JointState message
+        self.mutex = threading.Lock()
+        self.armed_legs = {}                                                    # Dictionary mapping each armed leg to its filtered current and number of consecutive readings above the threshold
+        self.contacts = {leg : threading.Event() for leg in leg_list}            # Per-leg events that are set when the leg touches the ground
+        self.contact_event = threading.Event()                                  # Event set whenever any armed leg touches the ground
+        self.threshold = 70
+        self.alpha = 0.5
+        self.debounce = 2
+        self.blind_time_end = 0
+        self.sub_joint_states = None
+
+    ### @brief Start watching the given legs for contacts
+    ### @param legs - list of legs to watch
+    ### @param threshold - filtered femur current [mA] above which a leg is considered to be touching the ground
+    ### @param alpha - weight [0 - 1] given to each new reading by the low-pass filter
+    ### @param debounce - number of consecutive filtered readings above 'threshold' needed to register a contact
+    ### @param blind_time - time [sec] after arming during which contacts are ignored (readings are still filtered)
+    def arm(self, legs, threshold=70, alpha=0.5, debounce=2, blind_time=0.6):
+        with self.mutex:
+            self.threshold = threshold
+            self.alpha = alpha
+            self.debounce = debounce
+            self.blind_time_end = rospy.get_time() + blind_time
+            for leg in legs:
+                self.contacts[leg].clear()
+                self.armed_legs[leg] = {"effort" : None, "count" : 0}
+            self.contact_event.clear()
+            if self.sub_joint_states is None:
+                self.sub_joint_states = rospy.Subscriber(self.core.sub_joint_states.name, JointState, self.joint_state_cb)
+
+    ### @brief Stop watching all legs
+    def disarm(self):
+        with self.mutex:
+            self.armed_legs = {}
+            if self.sub_joint_states is not None:
+                self.sub_joint_states.unregister()
+                self.sub_joint_states = None
+
+    ### @brief Check whether a leg has touched the ground since it was last armed
+    ### @param leg - name of the leg
+    ### @return <bool> - True if the leg is touching the ground; False otherwise
+    def in_contact(self, leg):
+        return self.contacts[leg].is_set()
+
+    ### @brief ROS Subscriber Callback function that filters the femur currents of the armed legs and registers contacts
+    ### @param msg - JointState message
+    def joint_state_cb(self, msg):
+        if len(self.armed_legs) == 0 or len(msg.effort) == 0: return
+        with self.mutex:
+            blind = rospy.get_time() < self.blind_time_end
+            for leg in list(self.armed_legs.keys()):
+                state = self.armed_legs[leg]
+                effort = msg.effort[self.femur_indexes[leg]]
+                if state["effort"] is None:
+                    state["effort"] = effort
+                else:
+                    state["effort"] += self.alpha * (effort - state["effort"])
+                if blind: continue
+                state["count"] = state["count"] + 1 if state["effort"] >= self.threshold else 0
+                if state["count"] >= self.debounce:
+                    del self.armed_legs[leg]
+                    self.contacts[leg].set()
+                    self.contact_event.set()
+
+
+### @brief Publishes the hexapod's odometry and body transforms to the /tf topic and its odometry to the '<robot_name>/pose' topic
+### @param robot_name - namespace of the hexapod
+### @param active_rate - frequency [Hz] at which to publish while the hexapod is moving
+### @param idle_rate - frequency [Hz] at which to publish once the hexapod has stopped moving
+### @param idle_timeout - time [sec] after the last update before switching to 'idle_rate'
+### @details - the messages are allocated once and updated in place; both transforms go out in a single 'sendTransform' call.
+###            An update wakes the publishing thread so the first message after a pause is never delayed, but messages still
+###            go out at most at 'active_rate'.
+###            If a transform is not being updated, its stamp is held until it's no longer in the future
+###            before publishing it with the current ROS time (prevents jumps back in time)
+class HexapodStatePublisher(object):
+    def __init__(self, robot_name, active_rate=25.0, idle_rate=5.0, idle_timeout=1.0):
+        self.active_period = 1.0 / active_rate
+        self.idle_period = 1.0 / idle_rate
+        self.idle_timeout = idle_timeout
+        self.mutex = threading.Lock()
+        self.wake_event = threading.Event()
+        self.last_update = rospy.get_time()                                    # Time [sec] after which the transforms stop changing
+        self.pose = PoseStamped()                                               # ROS PoseStamped message to publish T_sf to its own topic
+        self.pose.header.frame_id = robot_name + "/odom"
+        self.pose.pose.orientation.w = 1.0
+        self.t_sf = TransformStamped()                                          # ROS Transform that holds T_sf and is published to the /tf topic
+        self.t_sf.header.frame_id = robot_name + "/odom"
+        self.t_sf.child_frame_id = robot_name + "/base_footprint"
+        self.t_sf.transform.rotation.w = 1.0
+        self.t_fb = TransformStamped()                                          # ROS Transform that holds T_fb and is published to the /tf topic
+        self.t_fb.header.frame_id = robot_name + "/base_footprint"
+        self.t_fb.child_frame_id = robot_name + "/base_link"
+        self.t_fb.transform.rotation.w = 1.0
+        self.transforms = [self.t_sf, self.t_fb]
+        self.br = tf2_ros.TransformBroadcaster()
+        self.pub_pose = rospy.Publisher("/" + robot_name + "/pose", PoseStamped, queue_size=1)
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    ### @brief Update the transform from the 'odom' frame to the 'base_footprint' frame
+    ### @param T_sf - 4x4 odometry transform
+    ### @param moving_time - time [sec] it takes for each motor to move a step; the messages are future dated by this amount
+    def update_odometry(self, T_sf, moving_time):
+        q = ang.rotationMatrixToQuaternion(T_sf[:3,:3])
+        stamp = rospy.Time.now() + rospy.Duration(moving_time)
+        with self.mutex:
+            translation, rotation = self.t_sf.transform.translation, self.t_sf.transform.rotation
+            translation.x, translation.y = T_sf[0,3], T_sf[1,3]
+            rotation.x, rotation.y, rotation.z, rotation.w = q
+            self.t_sf.header.stamp = stamp
+            position, orientation = self.pose.pose.position, self.pose.pose.orientation
+            position.x, position.y = T_sf[0,3], T_sf[1,3]
+            orientation.x, orientation.y, orientation.z, orientation.w = q
+            self.pose.header.stamp = stamp
+            self.last_update = max(self.last_update, stamp.to_sec())
+        self.wake_event.set()
+
+    ### @brief Update the transform from the 'base_footprint' frame to the 'base_link' frame
+    ### @param T_fb - 4x4 body transform
+    ### @param moving_time - time [sec] it takes for each motor to move; the message is future dated by this amount
+    def update_body_pose(self, T_fb, moving_time):
+        q = ang.rotationMatrixToQuaternion(T_fb[:3,:3])
+        stamp = rospy.Time.now() + rospy.Duration(moving_time)
+        with self.mutex:
+            translation, rotation = self.t_fb.transform.translation, self.t_fb.transform.rotation
+            translation.x, translation.y, translation.z = T_fb[0,3], T_fb[1,3], T_fb[2,3]
+            rotation.x, rotation.y, rotation.z, rotation.w = q
+            self.t_fb.header.stamp = stamp
+            self.last_update = max(self.last_update, stamp.to_sec())
+        self.wake_event.set()
+
+    ### @brief Publishes the transforms and pose once
+    def publish(self):
+        time = rospy.Time.now()
+        with self.mutex:
+            if self.t_sf.header.stamp < time:
+                self.t_sf.header.stamp = time
+                self.pose.header.stamp = time
+            if self.t_fb.header.stamp < time:
+                self.t_fb.header.stamp = time
+            self.br.sendTransform(self.transforms)
+            self.pub_pose.publish(self.pose)
+
+    ### @brief Publishing thread - publishes at 'active_rate' while the transforms are changing and at 'idle_rate' otherwise
+    ### @details - an update cuts an idle wait short, but never brings the next publish closer than 'active_period' to the last one
+    def run(self):
+        while not rospy.is_shutdown():
+            self.publish()
+            time_publish = rospy.get_time()
+            idle = time_publish > self.last_update + self.idle_timeout
+            time_next = time_publish + (self.idle_period if idle else self.active_period)
+            while not rospy.is_shutdown():
+                time_now = rospy.get_time()
+                if time_now >= time_next:
+                    break
+                if self.wake_event.wait(time_next - time_now):
+                    self.wake_event.clear()
+                    time_next = min(time_next, time_publish + self.active_period)
@@ -1,12 +1,15 @@
 import rospy
 import actionlib
+import threading
 from std_msgs.msg import Empty
 from kobuki_msgs.msg import Sound, AutoDockingAction, AutoDockingGoal
-from geometry_msgs.msg import Twist, Vector3, PoseStamped, Pose, Quaternion
+from actionlib_msgs.msg import GoalStatus
+from geometry_msgs.msg import Twist, Vector3, PoseStamped, Pose
 from sensor_msgs.msg import JointState
 from nav_msgs.msg import Odometry
-from move_base_msgs.msg import MoveBaseAction, MoveBaseGoal
-from tf.transformations import euler_from_quaternion, quaternion_from_euler
+from tf.transformations import euler_from_quaternion
+from interbotix_xs_modules.odometry import OdometryHistory, move_closed_loop
+from interbotix_xs_modules.navigation import MoveBaseNavigator, create_target_pose, connect_action_client, wait_for_event
 
 
 ### @brief Definition of the Interbotix Kobuki Module
@@ -16,23 +19,39 @@ from tf.transformations import euler_from_quaternion, quaternion_from_euler
 ### @param use_move_base_action - whether or not Move-Base's Action Server should be used instead
 ###        of the Topic interface; set to `True` to make the 'move_to_pose' function block until
 ###        the robot reaches its goal pose
+### @param odom_history_size - number of odometry messages to keep for 'get_odom_at' and
+###        'get_velocity'
 class InterbotixKobukiInterface(object):
     def __init__(
         self,
         robot_name,
         base_joint_states,
         use_move_base_action=False,
+        odom_history_size=1000,
     ):
         self.robot_name = robot_name
         self.odom = Pose()
+        self.odom_history = OdometryHistory(odom_history_size)
         self.wheel_states = None
         self.use_move_base_action = use_move_base_action
+        # Long-lived action clients for Move-Base and auto-docking; both connect in the background
+        self.navigator = None
         if (self.use_move_base_action):
-            self.mb_client = actionlib.SimpleActionClient(
-                "/" + self.robot_name + "/move_base",
-                MoveBaseAction
-            )
-            self.mb_client.wait_for_server()
+            self.navigator = MoveBaseNavigator("/" + self.robot_name + "/move_base")
+            self.mb_client = self.navigator.client
+        self.ad_client = actionlib.SimpleActionClient(
+            "/" + self.robot_name + "/dock_drive_action",
+            AutoDockingAction
+        )
+        self.ad_connected = threading.Event()
+        self.dock_handle = None
+        rospy.on_shutdown(self.ad_client.cancel_goal)
+        ad_connect_thread = threading.Thread(
+            target=connect_action_client,
+            args=(self.ad_client, self.ad_connected)
+        )
+        ad_connect_thread.daemon = True
+        ad_connect_thread.start()
         # ROS Publisher to command twists to the base
         self.pub_base_command = rospy.Publisher(
             "/" + self.robot_name + "/mobile_base/commands/velocity",
@@ -82,28 +101,50 @@ class InterbotixKobukiInterface(object):
             r.sleep()
         self.pub_base_command.publish(Twist())
 
+    ### @brief Drive the base straight forward or backward by a given distance using odometry
+    ### @param distance - desired distance [m] to drive; negative values drive backward
+    ### @param max_speed - max speed [m/s]
+    ### @param max_accel - max acceleration [m/s^2]
+    ### @param tolerance - distance [m] from the target at which the move is considered done
+    ### @param stall_timeout - time [sec] without making progress after which the move is aborted
+    ### @return <bool> - `True` if the base reached the target distance; `False` if it stalled
+    def move_distance(self, distance, max_speed=0.2, max_accel=0.3, tolerance=0.005, stall_timeout=1.0):
+        return move_closed_loop(
+            self, distance, turn=False, max_speed=max_speed, max_accel=max_accel, min_speed=0.02,
+            tolerance=tolerance, stall_timeout=stall_timeout
+        )
+
+    ### @brief Turn the base in place by a given angle using odometry
+    ### @param angle - desired angle [rad] to turn; positive values turn counterclockwise
+    ### @param max_speed - max angular speed [rad/s]
+    ### @param max_accel - max angular acceleration [rad/s^2]
+    ### @param tolerance - angle [rad] from the target at which the turn is considered done
+    ### @param stall_timeout - time [sec] without making progress after which the turn is aborted
+    ### @return <bool> - `True` if the base turned by the target angle; `False` if it stalled
+    def turn_by(self, angle, max_speed=1.0, max_accel=1.5, tolerance=0.01, stall_timeout=1.0):
+        return move_closed_loop(
+            self, angle, turn=True, max_speed=max_speed, max_accel=max_accel, min_speed=0.1,
+            tolerance=tolerance, stall_timeout=stall_timeout
+        )
+
     ### @brief Move the base to a given pose in a Map (Nav Stack must be enabled!)
     ### @param x - desired 'x' position [m] w.r.t. the map frame that the robot should achieve
     ### @param y - desired 'y' position [m] w.r.t. the map frame that the robot should achieve
     ### @param yaw - desired yaw [rad] w.r.t. the map frame that the robot should achieve
     ### @param wait - whether the function should wait until the base reaches its goal pose before
     ###        returning
+    ### @param timeout - max time [sec] to wait for the base to reach its goal pose before canceling
+    ###        the goal; `None` to wait forever (only applies if 'wait' is `True`)
     ### @return <bool> - whether the robot successfully reached its goal pose (only applies if
     ###        'wait' is `True`)
     ### @details - note that if 'wait' is `False`, the function will always return `True`.
-    def move_to_pose(self, x, y, yaw, wait=False):
-        target_pose = PoseStamped()
-        target_pose.header.frame_id = "map"
-        target_pose.header.stamp = rospy.Time.now()
-        target_pose.pose.position.x = x
-        target_pose.pose.position.y = y
-        quat = quaternion_from_euler(0, 0, yaw)
-        target_pose.pose.orientation = Quaternion(quat[0], quat[1], quat[2], quat[3])
+    def move_to_pose(self, x, y, yaw, wait=False, timeout=None):
+        target_pose = create_target_pose(x, y, yaw)
         if (wait and self.use_move_base_action):
-            goal = MoveBaseGoal(target_pose)
-            self.mb_client.send_goal(goal)
-            self.mb_client.wait_for_result()
-            if not (self.mb_client.get_state() == actionlib.GoalStatus.SUCCEEDED):
+            goal = self.navigator.send(target_pose)
+            if not goal.wait(timeout):
+                if not goal.done():
+                    goal.cancel()
                 rospy.logerr("Did not successfully reach goal...")
                 return False
         else:
@@ -111,6 +152,41 @@ class InterbotixKobukiInterface(object):
         self.pub_base_sound.publish(Sound.CLEANINGEND)
         return True
 
+    ### @brief Move the base to a given pose in a Map without blocking (Nav Stack must be enabled!)
+    ### @param x - desired 'x' position [m] w.r.t. the map frame that the robot should achieve
+    ### @param y - desired 'y' position [m] w.r.t. the map frame that the robot should achieve
+    ### @param yaw - desired yaw [rad] w.r.t. the map frame that the robot should achieve
+    ### @param queue - `True` to start moving to this pose once the previously sent poses are
+    ###        reached; `False` to preempt them
+    ### @return goal - MoveBaseGoalHandle that can be used to wait for, cancel, or get the progress
+    ###         (distance remaining, ETA) of the goal
+    ### @details - uses Move-Base's Action Server even if 'use_move_base_action' is `False`
+    def move_to_pose_async(self, x, y, yaw, queue=False):
+        goal = self.get_navigator().send(create_target_pose(x, y, yaw), queue)
+        goal.add_done_callback(self.move_to_pose_done_cb)
+        return goal
+
+    ### @brief Callback for when a goal sent with 'move_to_pose_async' finishes
+    ### @param goal - MoveBaseGoalHandle that finished
+    def move_to_pose_done_cb(self, goal):
+        if goal.state == "succeeded":
+            self.pub_base_sound.publish(Sound.CLEANINGEND)
+
+    ### @brief Cancel every pose sent with 'move_to_pose_async' that hasn't been reached yet
+    def cancel_move_to_pose(self):
+        if self.navigator is not None:
+            self.navigator.cancel_all()
+
+    ### @brief Get the Move-Base navigator
+    ### @return navigator - MoveBaseNavigator for the base's Move-Base Action Server
+    ### @details - built at init if 'use_move_base_action' is `True`; otherwise built (and connected
+    ###            in the background) the first time it's needed
+    def get_navigator(self):
+        if self.navigator is None:
+            self.navigator = MoveBaseNavigator("/" + self.robot_name + "/move_base")
+            self.mb_client = self.navigator.client
+        return self.navigator
+
     ### @brief Commands a Twist message to the base
     ### @param x - desired speed [m/s] in the 'x' direction (forward/backward)
     ### @param yaw - desired angular speed [rad/s] around the 'z' axis
@@ -122,6 +198,7 @@ class InterbotixKobukiInterface(object):
     ### @param msg - ROS Odometry message from the base
     def base_odom_cb(self, msg):
         self.odom = msg.pose.pose
+        self.odom_history.add_odometry(msg)
 
     ### @brief ROS Callback function get get the wheel joint states
     ### @param msg - ROS JointState message from base
@@ -129,42 +206,31 @@ class InterbotixKobukiInterface(object):
         self.wheel_states = msg
 
     ### @brief Call action to automatically dock the base to charging station dock
+    ### @param timeout - max time [sec] to wait for the base to dock (including connecting to the
+    ###        auto_dock Action Server) before giving up
+    ### @return <bool> - `True` if docking was successful; `False` otherwise
     ### @details - must be near enough to dock to see IR signals (~1 meter in front)
-    def auto_dock(self):
+    def auto_dock(self, timeout=120.0):
         rospy.loginfo("Attempting to autonomously dock to charging station.\n")
-        try:
-            # set docking action client
-            ad_client = actionlib.SimpleActionClient(
-                "/" + self.robot_name + "/dock_drive_action",
-                AutoDockingAction
-            )
-
-            # connect to Action Server
-            rospy.loginfo("Waiting for auto_dock Action Server...")
-            while not ad_client.wait_for_server(timeout=rospy.Duration(secs=5)):
-                if rospy.is_shutdown(): return False
-            rospy.loginfo("Found auto_dock Action Server")
-
-            # set docking goal
-            ad_goal = AutoDockingGoal()
-            ad_client.send_goal(ad_goal)
-            rospy.on_shutdown(ad_client.cancel_goal)
+        success = self.auto_dock_async(timeout).wait()
+        if success:
+            rospy.loginfo("Docking Successful.")
+        else:
+            rospy.loginfo("Docking Unsuccessful.")
+        return success
 
-            rospy.loginfo("Attempting to dock...")
-            # run action and wait 120 seconds for result
-            ad_client.wait_for_result(rospy.Duration(secs=120))
-            if ad_client.get_result():
-                rospy.loginfo("Docking Successful.")
-            else:
-                rospy.loginfo("Docking Unsuccessful.")
-
-        # catch interrupts
-        except rospy.ROSInterruptException():
-            rospy.logerr("Docking interrupted by user.")
-            ad_client.cancel_goal()
-        except Exception:
-            rospy.logerr("Docking interrupted unexpectedly.")
-            ad_client.cancel_goal()
+    ### @brief Call action to automatically dock the base to charging station dock without blocking
+    ### @param timeout - max time [sec] for the base to dock (including connecting to the auto_dock
+    ###        Action Server) before the attempt is canceled
+    ### @return handle - KobukiDockingHandle that can be used to wait for, cancel, or get the
+    ###         progress of the docking attempt
+    ### @details - must be near enough to dock to see IR signals (~1 meter in front); a new attempt
+    ###            cancels the previous one if it's still running
+    def auto_dock_async(self, timeout=120.0):
+        if self.dock_handle is not None and not self.dock_handle.done():
+            self.dock_handle.cancel()
+        self.dock_handle = KobukiDockingHandle(self.ad_client, self.ad_connected, timeout)
+        return self.dock_handle
 
     ### Get the 2D pose of the robot w.r.t. the robot 'odom' frame
     ### @return pose - list containing the [x, y, yaw] of the robot w.r.t. the odom frame
@@ -177,6 +243,23 @@ class InterbotixKobukiInterface(object):
         )
         return [self.odom.position.x, self.odom.position.y, euler_from_quaternion(quat)[2]]
 
+    ### Get the 2D pose of the robot w.r.t. the robot 'odom' frame at a given time
+    ### @param t - time of interest as a rospy.Time or in seconds (ex. the stamp of a camera image)
+    ### @param max_extrapolation - how far [sec] past the latest odometry message the pose may be
+    ###        extrapolated
+    ### @return pose - list containing the [x, y, yaw] of the robot w.r.t. the odom frame; `None`
+    ###         if 't' is not covered by the odometry history
+    def get_odom_at(self, t, max_extrapolation=0.1):
+        if hasattr(t, "to_sec"): t = t.to_sec()
+        return self.odom_history.get_odom_at(t, max_extrapolation)
+
+    ### Get the velocity of the robot averaged over a recent time window
+    ### @param window - length [sec] of the window ending at the latest odometry message
+    ### @return velocity - list containing the [vx, vy, yaw_rate] of the robot w.r.t. its base
+    ###         frame; `None` if there's not enough odometry yet
+    def get_velocity(self, window=0.2):
+        return self.odom_history.get_velocity(window)
+
     ### Get the current wheel positions
     ### @return <list> - 2 element list containing the wheel positions [rad]
     def get_wheel_states(self):
@@ -186,3 +269,92 @@ class InterbotixKobukiInterface(object):
     def reset_odom(self):
         self.pub_base_reset.publish(Empty())
         self.pub_base_sound.publish(Sound(value=Sound.CLEANINGEND))
+
+
+### @brief Runs one auto-docking attempt in the background and reports on its progress
+### @param ad_client - SimpleActionClient for the auto_dock Action Server
+### @param connected - threading.Event that is set once 'ad_client' is connected
+### @param timeout - max time [sec] for the attempt before it's canceled
+### @details - 'state' is one of 'connecting', 'active', 'succeeded', 'failed', 'timed_out', or 'canceled'
+class KobukiDockingHandle(object):
+    def __init__(self, ad_client, connected, timeout):
+        self.ad_client = ad_client
+        self.connected = connected
+        self.timeout = timeout
+        self.state = "connecting"
+        self.dock_state = ""                                                    # Latest docking state reported by the Action Server's feedback
+        self.dock_text = ""                                                     # Latest description reported by the Action Server's feedback
+        self.start_time = rospy.get_time()
+        self.finished = threading.Event()
+        self.goal_done = threading.Event()
+        self.mutex = threading.Lock()
+        thread = threading.Thread(target=self.run)
+        thread.daemon = True
+        thread.start()
+
+    ### @brief Check whether the docking attempt is finished (in any way)
+    ### @return <bool> - `True` if the attempt is over
+    def done(self):
+        return self.finished.is_set()
+
+    ### @brief Wait for the docking attempt to finish
+    ### @param timeout - max time [sec] to wait; `None` to wait until the attempt finishes or times out
+    ### @return <bool> - `True` if the base docked; `False` otherwise
+    def wait(self, timeout=None):
+        return wait_for_event(self.finished, timeout) and self.state == "succeeded"
+
+    ### @brief Cancel the docking attempt
+    def cancel(self):
+        if self.finish("canceled"):
+            self.ad_client.cancel_goal()
+
+    ### @brief Get the progress of the docking attempt
+    ### @return <dict> - 'state', 'dock_state' and 'text' (from the Action Server's feedback),
+    ###         'elapsed' [sec], and 'time_remaining' [sec] before the attempt times out
+    def get_progress(self):
+        elapsed = rospy.get_time() - self.start_time
+        return {
+            "state": self.state,
+            "dock_state": self.dock_state,
+            "text": self.dock_text,
+            "elapsed": elapsed,
+            "time_remaining": max(0.0, self.timeout - elapsed)
+        }
+
+    ### @brief Marks the attempt as finished
+    ### @param state - final state of the attempt
+    ### @return <bool> - `True` if the attempt wasn't already finished
+    def finish(self, state):
+        with self.mutex:
+            if self.done(): return False
+            self.state = state
+            self.finished.set()
+            return True
+
+    ### @brief Background thread that sends the docking goal and enforces the timeout
+    def run(self):
+        rospy.loginfo("Waiting for auto_dock Action Server...")
+        if not wait_for_event(self.connected, self.timeout):
+            self.finish("timed_out")
+            return
+        with self.mutex:
+            if self.done(): return
+            self.state = "active"
+            rospy.loginfo("Attempting to dock...")
+            self.ad_client.send_goal(AutoDockingGoal(), done_cb=self.done_cb, feedback_cb=self.feedback_cb)
+        time_remaining = self.timeout - (rospy.get_time() - self.start_time)
+        if not wait_for_event(self.goal_done, time_remaining) and self.finish("timed_out"):
+            self.ad_client.cancel_goal()
+
+    ### @brief Action client callback for AutoDockingFeedback messages
+    ### @param feedback - AutoDockingFeedback message
+    def feedback_cb(self, feedback):
+        self.dock_state = feedback.state
+        self.dock_text = feedback.text
+
+    ### @brief Action client callback for when the docking goal finishes
+    ### @param state - actionlib GoalStatus of the goal
+    ### @param result - AutoDockingResult message
+    def done_cb(self, state, result):
+        self.goal_done.set()
+        self.finish("succeeded" if state == GoalStatus.SUCCEEDED else "failed")
@@ -1,4 +1,6 @@
+import time
 import rospy
+import threading
 from interbotix_xs_modules.core import InterbotixRobotXSCore
 from interbotix_xs_modules.arm import InterbotixArmXSInterface
 from interbotix_xs_modules.turret import InterbotixTurretXSInterface
@@ -29,6 +31,9 @@ from interbotix_perception_modules.armtag import InterbotixArmTagInterface
 ### @param use_move_base_action - whether or not Move-Base's Action Server should be used instead
 ###        of the Topic interface; set to `True` to make the 'move_to_pose' function block until
 ###        the robot reaches its goal pose
+### @param prewarm - subsystems ('camera', 'base', 'pcl', 'arm', 'gripper', or 'armtag') to build in
+###        background threads right away; set to `True` to build all of them. Subsystems are otherwise
+###        only built the first time they're accessed (ex. `locobot.arm`); see 'get_startup_times'
 class InterbotixLocobotXS(object):
     def __init__(
         self,
@@ -41,60 +46,109 @@ class InterbotixLocobotXS(object):
         init_node=True,
         dxl_joint_states="dynamixel/joint_states",
         base_joint_states="mobile_base/joint_states",
-        use_move_base_action=False
+        use_move_base_action=False,
+        prewarm=None
     ):
         # Create DYNAMIXEL core interface
+        time_start = time.time()
         self.dxl = InterbotixRobotXSCore(
             robot_model=robot_model,
             robot_name=robot_name,
             init_node=init_node,
             joint_state_topic=dxl_joint_states
         )
+        self.startup_times = {"dxl": time.time() - time_start}
+        # Map each subsystem to the function that builds it; subsystems are built on first access
+        self.component_factories = {}
+        self.component_mutexes = {}
         # Create turret interface for the camera
-        self.camera = InterbotixTurretXSInterface(
+        self.add_component("camera", lambda: InterbotixTurretXSInterface(
             core=self.dxl,
             group_name=turret_group_name
-        )
+        ))
         # Create mobile base interface if using base
         if rospy.has_param("/" + robot_name + "/use_base") and rospy.get_param("/" + robot_name + "/use_base"):
             base_type = rospy.get_param("/" + robot_name + "/base_type", "create3")
             if base_type == "kobuki":
-                from interbotix_xs_modules.kobuki import InterbotixKobukiInterface
-                self.base = InterbotixKobukiInterface(
-                    robot_name=robot_name,
-                    base_joint_states=base_joint_states,
-                    use_move_base_action=use_move_base_action
-                )
+                def create_base():
+                    from interbotix_xs_modules.kobuki import InterbotixKobukiInterface
+                    return InterbotixKobukiInterface(
+                        robot_name=robot_name,
+                        base_joint_states=base_joint_states,
+                        use_move_base_action=use_move_base_action
+                    )
             elif base_type == "create3":
-                from interbotix_xs_modules.create3 import InterbotixCreate3Interface
-                self.base = InterbotixCreate3Interface(
-                    robot_name=robot_name,
-                    base_joint_states="/mobile_base/wheel_ticks",
-                    use_move_base_action=use_move_base_action
-                )
+                def create_base():
+                    from interbotix_xs_modules.create3 import InterbotixCreate3Interface
+                    return InterbotixCreate3Interface(
+                        robot_name=robot_name,
+                        base_joint_states="/mobile_base/wheel_ticks",
+                        use_move_base_action=use_move_base_action
+                    )
             else:
                 raise ValueError(
                     "Parameter " + "'/" + robot_name + "/base_type' is an invalid value: was '"
                     + base_type + "' but must be 'kobuki' or 'create3'."
                 )
+            self.add_component("base", create_base)
         # Create PointCloud Interface if using perception
         if rospy.has_param("/" + robot_name + "/use_perception") and rospy.get_param("/" + robot_name + "/use_perception"):
-            self.pcl = InterbotixPointCloudInterface(
+            self.add_component("pcl", lambda: InterbotixPointCloudInterface(
                 filter_ns=robot_name + "/pc_filter",
                 init_node=False
-            )
+            ))
         # Create Arm and Gripper interfaces if LoCoBot has an arm (if arm_model was specified)
         if arm_model is not None:
-            self.arm = InterbotixArmXSInterface(
+            self.add_component("arm", lambda: InterbotixArmXSInterface(
                 core=self.dxl,
                 robot_model=arm_model,
                 group_name=arm_group_name
-            )
-            self.gripper = InterbotixGripperXSInterface(self.dxl, gripper_name)
+            ))
+            self.add_component("gripper", lambda: InterbotixGripperXSInterface(self.dxl, gripper_name))
             # Create ArmTag interface if using armtag
             if rospy.has_param("/" + robot_name + "/use_armtag") and rospy.get_param("/" + robot_name + "/use_armtag"):
-                self.armtag = InterbotixArmTagInterface(
+                self.add_component("armtag", lambda: InterbotixArmTagInterface(
                     armtag_ns=robot_name + "/armtag",
                     apriltag_ns=robot_name + "/apriltag",
                     init_node=False
-                )
+                ))
+        # Build the requested subsystems in the background so they're ready by the time they're used
+        if prewarm is True:
+            prewarm = list(self.component_factories.keys())
+        for name in (prewarm or []):
+            if name not in self.component_factories:
+                continue
+            thread = threading.Thread(target=self.get_component, args=(name,))
+            thread.daemon = True
+            thread.start()
+
+    ### @brief Registers a subsystem that should be built the first time it's accessed
+    ### @param name - attribute name of the subsystem (ex. 'arm')
+    ### @param factory - function that takes no arguments and returns the subsystem
+    def add_component(self, name, factory):
+        self.component_factories[name] = factory
+        self.component_mutexes[name] = threading.Lock()
+
+    ### @brief Get a subsystem, building it first if it hasn't been built yet
+    ### @param name - attribute name of the subsystem (ex. 'arm')
+    ### @return component - the subsystem
+    ### @details - safe to call from several threads at once; the subsystem is only built once
+    def get_component(self, name):
+        with self.component_mutexes[name]:
+            if name not in self.__dict__:
+                time_start = time.time()
+                component = self.component_factories[name]()
+                self.startup_times[name] = time.time() - time_start
+                setattr(self, name, component)
+        return self.__dict__[name]
+
+    ### @brief Get how long each subsystem took to build
+    ### @return <dict> - subsystem names mapped to their build times [sec]; subsystems that haven't been built yet are left out
+    def get_startup_times(self):
+        return dict(self.startup_times)
+
+    # Only called when regular attribute lookup fails, i.e. for subsystems that haven't been built yet
+    def __getattr__(self, name):
+        if name in self.__dict__.get("component_factories", {}):
+            return self.get_component(name)
+        raise AttributeError("'%s' object has no attribute '%s'" % (type(self).__name__, name))
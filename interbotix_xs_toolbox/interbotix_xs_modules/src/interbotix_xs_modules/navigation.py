@@ -0,0 +1,240 @@
+import math
+import time
+import rospy
+import actionlib
+import threading
+from actionlib_msgs.msg import GoalStatus
+from geometry_msgs.msg import PoseStamped, Quaternion
+from move_base_msgs.msg import MoveBaseAction, MoveBaseGoal
+from tf.transformations import quaternion_from_euler
+
+### @brief Create a 2D goal pose
+### @param x - desired 'x' position [m] w.r.t. 'frame_id'
+### @param y - desired 'y' position [m] w.r.t. 'frame_id'
+### @param yaw - desired yaw [rad] w.r.t. 'frame_id'
+### @param frame_id - frame that the pose is expressed in
+### @return target_pose - PoseStamped message stamped with the current time
+def create_target_pose(x, y, yaw, frame_id="map"):
+    target_pose = PoseStamped()
+    target_pose.header.frame_id = frame_id
+    target_pose.header.stamp = rospy.Time.now()
+    target_pose.pose.position.x = x
+    target_pose.pose.position.y = y
+    quat = quaternion_from_euler(0, 0, yaw)
+    target_pose.pose.orientation = Quaternion(quat[0], quat[1], quat[2], quat[3])
+    return target_pose
+
+### @brief Connects an action client to its Action Server; meant to run in a background thread
+### @param client - SimpleActionClient to connect
+### @param connected - threading.Event to set once connected
+### @param connected_cb - function (without arguments) to call once connected; `None` to skip
+### @param max_period - longest time [sec] between connection checks
+### @details - checks briefly and backs off between checks (0.1 sec doubling up to 'max_period') so
+###            a client whose Action Server never comes up costs almost nothing
+def connect_action_client(client, connected, connected_cb=None, max_period=2.0):
+    period = 0.1
+    while not rospy.is_shutdown():
+        if client.wait_for_server(timeout=rospy.Duration(0.05)):
+            connected.set()
+            if connected_cb is not None:
+                connected_cb()
+            return
+        time.sleep(period)
+        period = min(2 * period, max_period)
+
+### @brief Wait for an event while staying responsive to ROS shutting down
+### @param event - threading.Event to wait for
+### @param timeout - max time [sec] to wait; `None` to wait forever
+### @return <bool> - `True` if the event was set; `False` otherwise
+def wait_for_event(event, timeout=None):
+    time_end = None if timeout is None else rospy.get_time() + timeout
+    while not event.wait(0.1):
+        if rospy.is_shutdown() or (time_end is not None and rospy.get_time() > time_end):
+            return False
+    return True
+
+### @brief Handle to a goal sent (or queued) through a MoveBaseNavigator; works like a future
+### @param navigator - MoveBaseNavigator that owns the goal
+### @param target_pose - PoseStamped goal pose
+### @details - 'state' is one of 'queued', 'active', 'succeeded', 'aborted', 'preempted' (replaced
+###            by a newer goal), 'canceled', or 'rejected'
+class MoveBaseGoalHandle(object):
+    def __init__(self, navigator, target_pose):
+        self.navigator = navigator
+        self.target_pose = target_pose
+        self.state = "queued"
+        self.result = None
+        self.finished = threading.Event()
+        self.done_callbacks = []
+        self.start_time = None
+        self.distance_remaining = None                                          # Straight-line distance [m] from the latest feedback pose to the goal
+        self.speed = None                                                       # Filtered speed [m/s] at which the distance to the goal shrinks
+        self.feedback_time = None
+
+    ### @brief Check whether the goal is finished (in any way)
+    ### @return <bool> - `True` if the goal is no longer queued or active
+    def done(self):
+        return self.finished.is_set()
+
+    ### @brief Wait for the goal to finish
+    ### @param timeout - max time [sec] to wait; `None` to wait forever
+    ### @return <bool> - `True` if the base reached the goal; `False` otherwise (including timing out)
+    def wait(self, timeout=None):
+        return wait_for_event(self.finished, timeout) and self.state == "succeeded"
+
+    ### @brief Cancel the goal, whether it's queued or active
+    def cancel(self):
+        self.navigator.cancel(self)
+
+    ### @brief Register a function to call once the goal finishes
+    ### @param callback - function that takes this handle as its only argument; called right away if
+    ###        the goal is already finished
+    def add_done_callback(self, callback):
+        with self.navigator.mutex:
+            if not self.done():
+                self.done_callbacks.append(callback)
+                return
+        callback(self)
+
+    ### @brief Get the progress towards the goal
+    ### @return <dict> - 'state', 'distance_remaining' [m] (`None` before the first feedback), and
+    ###         'eta' [sec] (`None` until the base's speed towards the goal is known)
+    def get_progress(self):
+        eta = None
+        if self.distance_remaining is not None and self.speed is not None and self.speed > 0.01:
+            eta = self.distance_remaining / self.speed
+        return {"state" : self.state, "distance_remaining" : self.distance_remaining, "eta" : eta}
+
+    ### @brief Updates the progress from a MoveBaseFeedback message
+    ### @param feedback - MoveBaseFeedback message
+    def feedback_cb(self, feedback):
+        position, target = feedback.base_position.pose.position, self.target_pose.pose.position
+        distance = math.hypot(target.x - position.x, target.y - position.y)
+        time = rospy.get_time()
+        if self.distance_remaining is not None and time > self.feedback_time:
+            speed = (self.distance_remaining - distance) / (time - self.feedback_time)
+            self.speed = speed if self.speed is None else self.speed + 0.2 * (speed - self.speed)
+        self.distance_remaining = distance
+        self.feedback_time = time
+
+    ### @brief Marks the goal as finished and runs the done callbacks
+    ### @param state - final state of the goal
+    ### @param result - MoveBaseResult message (if any)
+    def finish(self, state, result=None):
+        with self.navigator.mutex:
+            if self.done(): return
+            self.state = state
+            self.result = result
+            self.finished.set()
+            callbacks, self.done_callbacks = self.done_callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+
+### @brief Sends goals to a Move-Base Action Server without blocking, with optional queuing
+### @param action_ns - namespace of the Move-Base Action Server (ex. '/locobot/move_base')
+### @details - sending a goal preempts the active goal and cancels any queued goals unless 'queue'
+###            is `True`, in which case the goal starts as soon as the ones before it finish; the
+###            client connects to the Action Server in the background and goals sent before it's
+###            connected are held until it is
+class MoveBaseNavigator(object):
+    def __init__(self, action_ns):
+        self.client = actionlib.SimpleActionClient(action_ns, MoveBaseAction)
+        self.mutex = threading.RLock()
+        self.active_goal = None
+        self.queued_goals = []
+        self.connected = threading.Event()
+        rospy.on_shutdown(self.client.cancel_goal)
+        connect_thread = threading.Thread(target=connect_action_client, args=(self.client, self.connected, self.connected_cb))
+        connect_thread.daemon = True
+        connect_thread.start()
+
+    ### @brief Wait for the client to connect to the Action Server
+    ### @param timeout - max time [sec] to wait; `None` to wait forever
+    ### @return <bool> - `True` if connected; `False` otherwise
+    def wait_for_server(self, timeout=None):
+        return wait_for_event(self.connected, timeout)
+
+    ### @brief Starts the goal that was held while the client was connecting (if any)
+    def connected_cb(self):
+        with self.mutex:
+            if self.active_goal is None:
+                self.start_next()
+
+    ### @brief Send or queue a goal
+    ### @param target_pose - PoseStamped goal pose
+    ### @param queue - `True` to start the goal after the active and queued goals finish; `False` to
+    ###        replace them
+    ### @return goal - MoveBaseGoalHandle to track or cancel the goal
+    def send(self, target_pose, queue=False):
+        goal = MoveBaseGoalHandle(self, target_pose)
+        with self.mutex:
+            if queue and (self.active_goal is not None or len(self.queued_goals) > 0):
+                self.queued_goals.append(goal)
+                return goal
+            replaced = self.queued_goals + ([self.active_goal] if self.active_goal is not None else [])
+            self.queued_goals = []
+            if self.connected.is_set():
+                self.start(goal)
+            else:
+                self.active_goal = None
+                self.queued_goals.append(goal)
+        for old_goal in replaced:
+            old_goal.finish("preempted")
+        return goal
+
+    ### @brief Cancel a queued or active goal
+    ### @param goal - MoveBaseGoalHandle returned by 'send'
+    def cancel(self, goal):
+        with self.mutex:
+            if goal in self.queued_goals:
+                self.queued_goals.remove(goal)
+            elif goal is self.active_goal:
+                self.client.cancel_goal()
+                self.active_goal = None
+                self.start_next()
+            else:
+                return
+        goal.finish("canceled")
+
+    ### @brief Cancel the active goal and every queued goal
+    def cancel_all(self):
+        # cancel the queued goals first so that canceling the active goal doesn't start one of them
+        with self.mutex:
+            goals = self.queued_goals + ([self.active_goal] if self.active_goal is not None else [])
+        for goal in goals:
+            self.cancel(goal)
+
+    ### @brief Sends a goal to the Action Server; must be called with 'self.mutex' held
+    ### @param goal - MoveBaseGoalHandle to start
+    def start(self, goal):
+        self.active_goal = goal
+        goal.state = "active"
+        goal.start_time = rospy.get_time()
+        self.client.send_goal(
+            MoveBaseGoal(goal.target_pose),
+            done_cb=lambda state, result: self.done_cb(goal, state, result),
+            feedback_cb=goal.feedback_cb
+        )
+
+    ### @brief Starts the next queued goal (if any); must be called with 'self.mutex' held
+    def start_next(self):
+        if len(self.queued_goals) > 0 and self.connected.is_set():
+            self.start(self.queued_goals.pop(0))
+
+    ### @brief Action client callback for when a goal finishes
+    ### @param goal - MoveBaseGoalHandle that finished
+    ### @param state - actionlib GoalStatus of the goal
+    ### @param result - MoveBaseResult message
+    def done_cb(self, goal, state, result):
+        states = {
+            GoalStatus.SUCCEEDED: "succeeded",
+            GoalStatus.PREEMPTED: "canceled",
+            GoalStatus.RECALLED: "canceled",
+            GoalStatus.REJECTED: "rejected",
+        }
+        with self.mutex:
+            if goal is not self.active_goal: return
+            self.active_goal = None
+            self.start_next()
+        goal.finish(states.get(state, "aborted"), result)
@@ -0,0 +1,159 @@
+import math
+import rospy
+import threading
+import numpy as np
+
+### @brief Fixed-size history of a mobile base's 2D odometry that can be queried by time
+### @param size - max number of odometry samples to keep; the oldest samples are overwritten first
+### @details - samples are stored in a preallocated ring buffer as rows of
+###            [stamp, x, y, yaw, vx, vy, yaw_rate] where the pose is w.r.t. the odom frame and the
+###            twist is w.r.t. the base frame (as in a nav_msgs/Odometry message)
+class OdometryHistory(object):
+    STAMP, X, Y, YAW, VX, VY, YAW_RATE = range(7)
+
+    def __init__(self, size=1000):
+        self.data = np.zeros((size, 7))
+        self.size = size
+        self.index = 0                                                          # Row that the next sample will be written to
+        self.count = 0                                                          # Number of valid rows in self.data
+        self.mutex = threading.Lock()
+
+    ### @brief Add a sample from a nav_msgs/Odometry message
+    ### @param msg - ROS Odometry message
+    def add_odometry(self, msg):
+        q = msg.pose.pose.orientation
+        yaw = math.atan2(2.0 * (q.w * q.z + q.x * q.y), 1.0 - 2.0 * (q.y * q.y + q.z * q.z))
+        self.add(msg.header.stamp.to_sec(), msg.pose.pose.position.x, msg.pose.pose.position.y, yaw,
+                 msg.twist.twist.linear.x, msg.twist.twist.linear.y, msg.twist.twist.angular.z)
+
+    ### @brief Add a sample; samples are expected in chronological order
+    ### @param stamp - time [sec] of the sample
+    ### @param x - 'x' position [m] w.r.t. the odom frame
+    ### @param y - 'y' position [m] w.r.t. the odom frame
+    ### @param yaw - yaw [rad] w.r.t. the odom frame
+    ### @param vx - forward speed [m/s] w.r.t. the base frame
+    ### @param vy - sideways speed [m/s] w.r.t. the base frame
+    ### @param yaw_rate - angular speed [rad/s] around the 'z' axis
+    def add(self, stamp, x, y, yaw, vx=0, vy=0, yaw_rate=0):
+        with self.mutex:
+            self.data[self.index] = [stamp, x, y, yaw, vx, vy, yaw_rate]
+            self.index = (self.index + 1) % self.size
+            self.count = min(self.count + 1, self.size)
+
+    ### @brief Get a copy of the stored samples in chronological order
+    ### @param start - only include samples at or after this time [sec]; None to start at the oldest sample
+    ### @param end - only include samples at or before this time [sec]; None to end at the newest sample
+    ### @return <array> - Nx7 array with rows of [stamp, x, y, yaw, vx, vy, yaw_rate]
+    def get_history(self, start=None, end=None):
+        with self.mutex:
+            if self.count < self.size:
+                history = self.data[:self.count].copy()
+            else:
+                history = np.concatenate((self.data[self.index:], self.data[:self.index]))
+        if start is not None:
+            history = history[history[:,self.STAMP] >= start]
+        if end is not None:
+            history = history[history[:,self.STAMP] <= end]
+        return history
+
+    ### @brief Get the 2D pose of the base at a given time
+    ### @param t - time [sec] of interest
+    ### @param max_extrapolation - how far [sec] past the newest sample the pose may be extrapolated using its twist
+    ### @return <list> - [x, y, yaw] w.r.t. the odom frame; None if 't' is older than the oldest sample
+    ###         or newer than the newest sample by more than 'max_extrapolation'
+    ### @details - poses between samples are linearly interpolated (yaw along the shortest arc)
+    def get_odom_at(self, t, max_extrapolation=0.1):
+        history = self.get_history()
+        if len(history) == 0 or t < history[0,self.STAMP]: return None
+        if t >= history[-1,self.STAMP]:
+            stamp, x, y, yaw, vx, vy, yaw_rate = history[-1]
+            dt = t - stamp
+            if dt > max_extrapolation: return None
+            c, s = math.cos(yaw), math.sin(yaw)
+            return [x + (c * vx - s * vy) * dt, y + (s * vx + c * vy) * dt, self.wrap_angle(yaw + yaw_rate * dt)]
+        i = np.searchsorted(history[:,self.STAMP], t, side="right")
+        before, after = history[i - 1], history[i]
+        span = after[self.STAMP] - before[self.STAMP]
+        ratio = (t - before[self.STAMP]) / span if span > 0 else 0.0
+        x = before[self.X] + ratio * (after[self.X] - before[self.X])
+        y = before[self.Y] + ratio * (after[self.Y] - before[self.Y])
+        yaw = before[self.YAW] + ratio * self.wrap_angle(after[self.YAW] - before[self.YAW])
+        return [x, y, self.wrap_angle(yaw)]
+
+    ### @brief Estimate the velocity of the base over a recent time window
+    ### @param window - length [sec] of the window ending at the newest sample
+    ### @return <list> - [vx, vy, yaw_rate] w.r.t. the base frame (at the newest sample); None if the
+    ###         window holds less than two samples
+    ### @details - the velocities are the least-squares slopes of the odometry poses over the window,
+    ###            which smooths out the noise in the reported twists
+    def get_velocity(self, window=0.2):
+        history = self.get_history()
+        if len(history) == 0: return None
+        history = history[history[:,self.STAMP] >= history[-1,self.STAMP] - window]
+        if len(history) < 2: return None
+        t = history[:,self.STAMP] - history[-1,self.STAMP]
+        if np.ptp(t) == 0: return None
+        vel_x = np.polyfit(t, history[:,self.X], 1)[0]
+        vel_y = np.polyfit(t, history[:,self.Y], 1)[0]
+        yaw_rate = np.polyfit(t, np.unwrap(history[:,self.YAW]), 1)[0]
+        c, s = math.cos(history[-1,self.YAW]), math.sin(history[-1,self.YAW])
+        return [c * vel_x + s * vel_y, -s * vel_x + c * vel_y, yaw_rate]
+
+    ### @brief Wrap an angle to the range [-pi, pi)
+    ### @param angle - angle [rad] to wrap
+    ### @return <float> - the wrapped angle [rad]
+    @staticmethod
+    def wrap_angle(angle):
+        return (angle + math.pi) % (2 * math.pi) - math.pi
+
+
+### @brief Drives a mobile base a given distance straight ahead or turns it by a given angle using odometry feedback
+### @param base - base interface providing 'get_odom()' and 'command_velocity(x, yaw)' (ex. InterbotixKobukiInterface)
+### @param target - signed distance [m] to drive if 'turn' is False; signed angle [rad] to turn otherwise
+### @param turn - True to turn in place; False to drive straight
+### @param max_speed - max speed [m/s or rad/s]
+### @param max_accel - max acceleration and deceleration [m/s^2 or rad/s^2]
+### @param min_speed - min speed [m/s or rad/s] commanded until the target is reached (overcomes the motors' deadband)
+### @param tolerance - distance [m] or angle [rad] from the target at which the move is considered done
+### @param rate - frequency [Hz] at which the controller runs
+### @param stall_timeout - time [sec] without making progress after which the move is aborted
+### @return <bool> - True if the target was reached; False if the base stalled or ROS shut down
+### @details - the speed follows a trapezoidal profile that brakes at 'max_accel' so that it reaches
+###            the target at 'min_speed'; progress is measured along the heading the base had at the
+###            start (or as the accumulated yaw change when turning)
+def move_closed_loop(base, target, turn=False, max_speed=0.2, max_accel=0.3, min_speed=0.02, tolerance=0.005, rate=20, stall_timeout=1.0):
+    x_start, y_start, yaw_start = base.get_odom()
+    yaw_prev = yaw_start
+    progress = 0.0
+    speed = 0.0
+    dt = 1.0 / rate
+    stall_progress = progress
+    stall_time = rospy.get_time()
+    r = rospy.Rate(rate)
+    success = False
+    while not rospy.is_shutdown():
+        x, y, yaw = base.get_odom()
+        if turn:
+            progress += OdometryHistory.wrap_angle(yaw - yaw_prev)
+            yaw_prev = yaw
+        else:
+            progress = (x - x_start) * math.cos(yaw_start) + (y - y_start) * math.sin(yaw_start)
+        remaining = target - progress
+        if abs(remaining) <= tolerance:
+            success = True
+            break
+        if abs(progress - stall_progress) > tolerance:
+            stall_progress = progress
+            stall_time = rospy.get_time()
+        elif rospy.get_time() - stall_time > stall_timeout:
+            rospy.logwarn("Base stalled with %.3f left to go." % remaining)
+            break
+        desired_speed = math.copysign(max(min(max_speed, math.sqrt(2 * max_accel * abs(remaining))), min_speed), remaining)
+        speed += max(-max_accel * dt, min(max_accel * dt, desired_speed - speed))
+        if turn:
+            base.command_velocity(yaw=speed)
+        else:
+            base.command_velocity(x=speed)
+        r.sleep()
+    base.command_velocity()
+    return success
@@ -1,4 +1,6 @@
+import math
 import rospy
+import threading
 from interbotix_xs_msgs.msg import *
 from interbotix_xs_modules.core import InterbotixRobotXSCore
 
@@ -42,6 +44,12 @@ class InterbotixTurretXSInterface(object):
                      self.tilt_name : {"command" : tilt_position, "profile_type" : tilt_profile_type, "profile_velocity" : tilt_profile_velocity, "profile_acceleration" : tilt_profile_acceleration, "lower_limit" : tilt_limits[0], "upper_limit" : tilt_limits[1]}}
         self.change_profile(self.pan_name, pan_profile_type, pan_profile_velocity, pan_profile_acceleration)
         self.change_profile(self.tilt_name, tilt_profile_type, tilt_profile_velocity, tilt_profile_acceleration)
+        self.track_mutex = threading.Lock()                                     # Protects the tracking filters which are updated by the user and read by the tracking timer
+        self.track_filters = {self.pan_name : ConstantVelocityFilter(), self.tilt_name : ConstantVelocityFilter()}
+        self.track_timer = None                                                 # ROS Timer that streams tracking commands; None when not tracking
+        self.track_lookahead = 0                                                # Time [sec] into the future that the target is predicted when streaming commands
+        self.track_timeout = 0                                                  # Time [sec] after the latest target that prediction stops (the turret holds its position)
+        self.track_saved_profiles = {}                                          # Profile settings to restore when tracking stops
         print("Turret Group Name: %s\nPan Name: %s, Profile Type: %s, Profile Velocity: %.1f, Profile Acceleration: %.1f\nTilt Name: %s, Profile Type: %s, Profile Velocity: %.1f, Profile Acceleration: %.1f" \
         % (group_name, self.pan_name, pan_profile_type, pan_profile_velocity, pan_profile_acceleration, self.tilt_name, tilt_profile_type, tilt_profile_velocity, tilt_profile_acceleration))
         print("Initialized InterbotixTurretXSInterface!\n")
@@ -167,3 +175,208 @@ class InterbotixTurretXSInterface(object):
     ### @return list of last commanded positions [rad]
     def get_joint_commands(self):
         return [self.info[self.pan_name]["command"], self.info[self.tilt_name]["command"]]
+
+    ### @brief Starts streaming pan/tilt commands at a fixed rate to follow a moving target
+    ### @param rate - frequency [Hz] at which to command the turret
+    ### @param lookahead - time [sec] into the future the target should be predicted to make up for motor and camera latency
+    ### @param alpha - position gain of the constant-velocity filter (0 - 1); higher values trust new targets more
+    ### @param beta - velocity gain of the constant-velocity filter (0 - 1); higher values react faster to changes in target speed
+    ### @param timeout - if no new target is given for this many seconds, the turret stops extrapolating and holds the last estimate
+    ### @param moving_time - if both joints use the 'time' profile, each command is given this many seconds to complete; defaults to two periods of 'rate'
+    ### @details - the profile registers are only written once here (and restored in 'stop_tracking') so that no service calls are made while tracking;
+    ###            feed targets with 'track_point' or 'track_pan_tilt'
+    def start_tracking(self, rate=20.0, lookahead=0.1, alpha=0.5, beta=0.1, timeout=0.5, moving_time=None):
+        self.stop_tracking()
+        if moving_time is None: moving_time = 2.0 / rate
+        for name in [self.pan_name, self.tilt_name]:
+            self.track_saved_profiles[name] = [self.info[name]["profile_velocity"], self.info[name]["profile_acceleration"]]
+            if (self.info[name]["profile_type"] == "time"):
+                self.set_trajectory_profile(name, moving_time, moving_time / 2.0)
+        time_now = rospy.get_time()
+        with self.track_mutex:
+            self.track_lookahead = lookahead
+            self.track_timeout = timeout
+            for name, track_filter in self.track_filters.items():
+                track_filter.reset(self.info[name]["command"], time_now, alpha, beta)
+        self.track_timer = rospy.Timer(rospy.Duration(1.0 / rate), self.tracking_cb)
+
+    ### @brief Stops streaming tracking commands and restores the profile settings used before tracking started
+    def stop_tracking(self):
+        if self.track_timer is None: return
+        self.track_timer.shutdown()
+        self.track_timer = None
+        for name, profile in self.track_saved_profiles.items():
+            self.set_trajectory_profile(name, profile[0], profile[1])
+        self.track_saved_profiles = {}
+
+    ### @brief Check if the turret is currently tracking a target
+    ### @return <bool> - True if tracking; False otherwise
+    def is_tracking(self):
+        return self.track_timer is not None
+
+    ### @brief Feed a new pan/tilt target to the tracker
+    ### @param pan_position - desired pan position [rad]
+    ### @param tilt_position - desired tilt position [rad]
+    ### @param stamp - time [sec] at which the target was observed (ex. the image stamp); defaults to the current ROS time
+    def track_pan_tilt(self, pan_position, tilt_position, stamp=None):
+        if stamp is None: stamp = rospy.get_time()
+        with self.track_mutex:
+            self.track_filters[self.pan_name].update(pan_position, stamp)
+            self.track_filters[self.tilt_name].update(tilt_position, stamp)
+
+    ### @brief Feed a new 3D target to the tracker
+    ### @param x - 'x' position [m] of the target
+    ### @param y - 'y' position [m] of the target
+    ### @param z - 'z' position [m] of the target
+    ### @param stamp - time [sec] at which the target was observed (ex. the image stamp); defaults to the current ROS time
+    ### @details - the point should be expressed w.r.t. a frame located where the pan and tilt axes intersect, with its axes
+    ###            aligned to the turret's home pose ('x' forward, 'z' up); positive tilt points the camera down
+    def track_point(self, x, y, z, stamp=None):
+        pan_position = math.atan2(y, x)
+        tilt_position = math.atan2(-z, math.sqrt(x**2 + y**2))
+        self.track_pan_tilt(pan_position, tilt_position, stamp)
+
+    ### @brief ROS Timer Callback function that streams the predicted target to the turret
+    ### @param event [unused] - Timer event message
+    def tracking_cb(self, event):
+        time_now = rospy.get_time()
+        commands = []
+        with self.track_mutex:
+            for name in [self.pan_name, self.tilt_name]:
+                track_filter = self.track_filters[name]
+                horizon = min(time_now - track_filter.stamp, self.track_timeout) + self.track_lookahead
+                position = track_filter.predict(track_filter.stamp + horizon)
+                position = max(self.info[name]["lower_limit"], min(position, self.info[name]["upper_limit"]))
+                commands.append(position)
+        self.core.pub_group.publish(JointGroupCommand(self.group_name, commands))
+        self.info[self.pan_name]["command"] = commands[0]
+        self.info[self.tilt_name]["command"] = commands[1]
+
+    ### @brief Builds a serpentine raster of pan/tilt poses (each tilt row is swept in the opposite direction of the previous one to minimize travel)
+    ### @param pan_min - first pan position [rad] of the raster
+    ### @param pan_max - last pan position [rad] of the raster
+    ### @param pan_steps - number of pan positions per row
+    ### @param tilt_min - first tilt position [rad] of the raster
+    ### @param tilt_max - last tilt position [rad] of the raster
+    ### @param tilt_steps - number of tilt rows
+    ### @return poses - list of [pan, tilt] positions [rad]
+    def get_raster_poses(self, pan_min, pan_max, pan_steps, tilt_min, tilt_max, tilt_steps):
+        pans = [pan_min + (pan_max - pan_min) * i / float(max(pan_steps - 1, 1)) for i in range(pan_steps)]
+        tilts = [tilt_min + (tilt_max - tilt_min) * i / float(max(tilt_steps - 1, 1)) for i in range(tilt_steps)]
+        poses = []
+        for row, tilt in enumerate(tilts):
+            row_pans = pans if row % 2 == 0 else pans[::-1]
+            poses.extend([[pan, tilt] for pan in row_pans])
+        return poses
+
+    ### @brief Waits until both turret joints reach their goal positions and stop moving
+    ### @param tolerance - max distance [rad] from the goal for a joint to be considered there
+    ### @param velocity_tolerance - max speed [rad/s] for a joint to be considered stopped
+    ### @param timeout - max number of seconds to wait
+    ### @return <bool> - True if the turret settled; False if the timeout was reached
+    def wait_until_settled(self, tolerance=0.01, velocity_tolerance=0.05, timeout=3.0):
+        names = [self.pan_name, self.tilt_name]
+        indexes = [self.core.js_index_map[name] for name in names]
+        time_end = rospy.get_time() + timeout
+        r = rospy.Rate(100)
+        while (rospy.get_time() < time_end and not rospy.is_shutdown()):
+            with self.core.js_mutex:
+                positions = [self.core.joint_states.position[i] for i in indexes]
+                velocities = [self.core.joint_states.velocity[i] for i in indexes]
+            if all(abs(positions[i] - self.info[names[i]]["command"]) <= tolerance and abs(velocities[i]) <= velocity_tolerance for i in range(len(names))):
+                return True
+            r.sleep()
+        return False
+
+    ### @brief Visits a list of pan/tilt poses, capturing a frame at each and processing the previous frame while the turret moves to the next pose
+    ### @param poses - list of [pan, tilt] positions [rad] to visit (see 'get_raster_poses')
+    ### @param capture - function taking no arguments that grabs a frame (ex. lambda: apriltag.snap_image(...)); it should be quick since the turret waits on it
+    ### @param process - optional function taking the value returned by 'capture' and returning a result (ex. apriltag.detect_tags); it runs in a
+    ###                  background thread while the turret moves to the next pose
+    ### @param tolerance - max distance [rad] from a pose for the turret to be considered there before capturing
+    ### @param velocity_tolerance - max speed [rad/s] for the turret to be considered stopped before capturing
+    ### @param settle_timeout - max number of seconds to wait for the turret to settle at each pose; defaults to the longest profile time plus 0.5 seconds
+    ### @return frames - list of dictionaries (one per pose visited) with the keys 'pose' (commanded [pan, tilt]), 'joint_positions' (measured [pan, tilt]
+    ###                  at capture time), 'stamp' (joint state stamp at capture time), 'settled' (whether the turret settled before capturing),
+    ###                  'frame' (value returned by 'capture'), and 'result' (value returned by 'process' or None)
+    ### @details - poses outside the joint limits are skipped; the profile registers are not changed
+    def scan(self, poses, capture, process=None, tolerance=0.01, velocity_tolerance=0.05, settle_timeout=None):
+        if settle_timeout is None:
+            settle_timeout = max(self.info[self.pan_name]["profile_velocity"], self.info[self.tilt_name]["profile_velocity"]) + 0.5
+        indexes = [self.core.js_index_map[self.pan_name], self.core.js_index_map[self.tilt_name]]
+        frames = []
+        worker = None
+        for pose in poses:
+            if not (self.info[self.pan_name]["lower_limit"] <= pose[0] <= self.info[self.pan_name]["upper_limit"] and
+                    self.info[self.tilt_name]["lower_limit"] <= pose[1] <= self.info[self.tilt_name]["upper_limit"]):
+                rospy.logwarn("Skipping scan pose [%.3f, %.3f] since it is outside the limits." % (pose[0], pose[1]))
+                continue
+            self.core.pub_group.publish(JointGroupCommand(self.group_name, [pose[0], pose[1]]))
+            self.info[self.pan_name]["command"] = pose[0]
+            self.info[self.tilt_name]["command"] = pose[1]
+            settled = self.wait_until_settled(tolerance, velocity_tolerance, settle_timeout)
+            with self.core.js_mutex:
+                joint_positions = [self.core.joint_states.position[i] for i in indexes]
+                stamp = self.core.joint_states.header.stamp
+            scan_frame = {"pose" : list(pose), "joint_positions" : joint_positions, "stamp" : stamp, "settled" : settled, "frame" : capture(), "result" : None}
+            frames.append(scan_frame)
+            if worker is not None:
+                worker.join()
+            if process is not None:
+                worker = threading.Thread(target=self.process_scan_frame, args=(process, scan_frame))
+                worker.start()
+            if rospy.is_shutdown(): break
+        if worker is not None:
+            worker.join()
+        return frames
+
+    ### @brief Helper function that runs the user's processing function on a captured scan frame
+    ### @param process - processing function given to 'scan'
+    ### @param scan_frame - dictionary describing the captured frame; its 'result' key is filled in
+    def process_scan_frame(self, process, scan_frame):
+        try:
+            scan_frame["result"] = process(scan_frame["frame"])
+        except Exception as e:
+            rospy.logerr("Failed to process the scan frame captured at [%.3f, %.3f]: %s" % (scan_frame["pose"][0], scan_frame["pose"][1], e))
+
+### @brief Alpha-beta (constant-velocity) filter used to smooth and predict a single joint target
+### @param alpha - position gain (0 - 1)
+### @param beta - velocity gain (0 - 1)
+class ConstantVelocityFilter(object):
+    def __init__(self, alpha=0.5, beta=0.1):
+        self.alpha = alpha
+        self.beta = beta
+        self.position = 0.0                                                     # Filtered position at time 'self.stamp'
+        self.velocity = 0.0                                                     # Filtered velocity [units/sec]
+        self.stamp = 0.0                                                        # Time [sec] of the latest update
+
+    ### @brief Resets the filter to a stationary state
+    ### @param position - initial position
+    ### @param stamp - initial time [sec]
+    ### @param alpha - new position gain; keeps the previous value if not specified
+    ### @param beta - new velocity gain; keeps the previous value if not specified
+    def reset(self, position, stamp, alpha=None, beta=None):
+        if alpha is not None: self.alpha = alpha
+        if beta is not None: self.beta = beta
+        self.position = position
+        self.velocity = 0.0
+        self.stamp = stamp
+
+    ### @brief Corrects the filter with a new measurement
+    ### @param measurement - measured position
+    ### @param stamp - time [sec] at which the measurement was taken
+    ### @details - measurements older than the latest update are ignored
+    def update(self, measurement, stamp):
+        dt = stamp - self.stamp
+        if dt <= 0: return
+        predicted = self.position + self.velocity * dt
+        residual = measurement - predicted
+        self.position = predicted + self.alpha * residual
+        self.velocity += self.beta * residual / dt
+        self.stamp = stamp
+
+    ### @brief Predicts the position at a given time assuming constant velocity
+    ### @param stamp - time [sec] at which to predict the position
+    ### @return position - predicted position
+    def predict(self, stamp):
+        return self.position + self.velocity * (stamp - self.stamp)